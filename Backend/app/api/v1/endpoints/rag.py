@@ -1,17 +1,19 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi.responses import JSONResponse
 from app.models.request import Request
 from app.models.response import Response, ProductionResponse, HealthResponse
 from app.services.preprocessors.unified_processor import UnifiedDocumentProcessor
+from app.services.preprocessors.document_identity import DocumentIdentityResolver
 from app.services.retrievers.retrieval_service import RetrievalService
 from app.services.retrievers.structure_aware_retrieval_service import TrueStructureAwareRetrievalService
 from app.services.vector_stores.vector_store_factory import VectorStoreFactory
+from app.services.vector_stores.store_stats import StoreStatsMonitor
 from app.services.logging.supabase_logger import supabase_logger
 from app.providers.factory import LLMProviderFactory
 from app.config.settings import settings
 from app.services.pipelines.pipeline_manager import PipelineManager
 import time
 import uuid
-import hashlib
 from typing import Union, Optional
 
 router = APIRouter()
@@ -29,6 +31,15 @@ document_processor = UnifiedDocumentProcessor(
     chunk_overlap=settings.CHUNK_OVERLAP
 )
 
+# Documents are identified by a hash of their bytes, with conditional re-fetches per URL
+document_identity = DocumentIdentityResolver(
+    index_path=settings.DOCUMENT_IDENTITY_INDEX_PATH,
+    timeout=settings.DOCUMENT_FETCH_TIMEOUT_SECONDS,
+    ttl_seconds=settings.DOCUMENT_IDENTITY_TTL_SECONDS,
+    max_entries=settings.DOCUMENT_IDENTITY_MAX_URLS,
+    max_age_seconds=settings.DOCUMENT_IDENTITY_MAX_AGE_SECONDS
+)
+
 # Initialize both retrieval services for different pipeline types
 traditional_retrieval_service = RetrievalService(
     vector_store=vector_store,
@@ -40,6 +51,12 @@ structure_aware_retrieval_service = TrueStructureAwareRetrievalService(
     llm_provider=llm_provider
 )
 
+# Health endpoints read counts refreshed in the background, never the database per probe
+stats_monitor = StoreStatsMonitor(
+    vector_store=vector_store,
+    refresh_seconds=settings.HEALTH_STATS_REFRESH_SECONDS
+)
+
 async def log_request_background(
     document_url: str,
     questions: list,
@@ -70,7 +87,8 @@ async def run_rag(
     background_tasks: BackgroundTasks):
     start_time = time.time()
     
-    document_id = hashlib.sha256(request.documents.encode()).hexdigest()[:16]
+    document = await document_identity.resolve(request.documents)
+    document_id = document.document_id
     answers = []
     document_metadata = {}
     raw_response = {}
@@ -93,7 +111,8 @@ async def run_rag(
             document_processor=document_processor,
             traditional_retrieval_service=traditional_retrieval_service,
             structure_aware_retrieval_service=structure_aware_retrieval_service,
-            settings=settings
+            settings=settings,
+            document=document
         )
 
         processing_time = time.time() - start_time
@@ -159,24 +178,38 @@ async def run_rag(
         raise HTTPException(status_code=500, detail=error_message)
 
 
+def _stats_response() -> HealthResponse:
+    stats_monitor.ensure_started()
+    if stats_monitor.last_error:
+        status = f"unhealthy: {stats_monitor.last_error}"
+    elif stats_monitor.refreshed_at is None:
+        status = "starting"
+    else:
+        status = "healthy"
+    
+    return HealthResponse(
+        status=status,
+        vector_store=vector_store.store_type,
+        llm_provider=llm_provider.provider_name,
+        **stats_monitor.snapshot()
+    )
+
+
+@router.get("/health/live")
+async def liveness_check():
+    """Process is up and serving requests; touches nothing external"""
+    return {"status": "alive"}
+
+
+@router.get("/health/ready", response_model=HealthResponse)
+async def readiness_check():
+    """503 until store stats have been refreshed once, or while the last refresh is failing"""
+    response = _stats_response()
+    if not stats_monitor.ready:
+        return JSONResponse(status_code=503, content=response.model_dump())
+    return response
+
+
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
-    try:
-        if hasattr(vector_store, 'aget_document_count'):
-            doc_count = await vector_store.aget_document_count()
-        else:
-            doc_count = vector_store.get_document_count()
-        
-        return HealthResponse(
-            status="healthy",
-            vector_store=vector_store.store_type,
-            llm_provider=llm_provider.provider_name,
-            document_count=doc_count
-        )
-        
-    except Exception as e:
-        return HealthResponse(
-            status=f"unhealthy: {str(e)}",
-            vector_store=vector_store.store_type,
-            llm_provider=llm_provider.provider_name
-        )
+    return _stats_response()
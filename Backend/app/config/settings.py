@@ -14,6 +14,16 @@ class Settings(BaseSettings):
     # Vector Store Configuration 
     DEFAULT_VECTOR_STORE: str = os.getenv("DEFAULT_VECTOR_STORE", "supabase")
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"  # Reuse embeddings of previously seen text across ingestions
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")  # SQLite file holding cached embeddings
+    EMBEDDING_CACHE_MAX_ENTRIES: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "0"))  # Prune least recently used vectors past this (0 = unlimited)
+    QUERY_EMBEDDING_CACHE_SIZE: int = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))  # In-process LRU of question embeddings
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "0"))  # Re-embed cached questions after this long (0 = never)
+    EMBEDDING_BATCH_MAX_TOKENS: int = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "50000"))  # Token budget per embedding request during ingestion
+    EMBEDDING_BATCH_MAX_SIZE: int = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "256"))  # Max chunks per embedding request
+    EMBEDDING_MAX_CONCURRENCY: int = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))  # Embedding requests in flight; halved on 429s
+    EMBEDDING_MAX_RETRIES: int = int(os.getenv("EMBEDDING_MAX_RETRIES", "6"))  # Rate-limited retries per batch
+    SQLITE_VECTOR_STORE_PATH: str = os.getenv("SQLITE_VECTOR_STORE_PATH", "vector_store.db")
     
     # LLM Providers
     DEFAULT_LLM_PROVIDER: str = os.getenv("DEFAULT_LLM_PROVIDER", "openai")
@@ -53,15 +63,47 @@ class Settings(BaseSettings):
     SUPABASE_SERVICE_KEY: str = os.getenv("SUPABASE_SERVICE_KEY")
     SUPABASE_TABLE_NAME: str = os.getenv("SUPABASE_TABLE_NAME", "documents")
     SUPABASE_QUERY_NAME: str = os.getenv("SUPABASE_QUERY_NAME", "match_documents")
+    SUPABASE_HTTP_MAX_CONNECTIONS: int = int(os.getenv("SUPABASE_HTTP_MAX_CONNECTIONS", "20"))  # Pooled keep-alive connections for async calls
+    SUPABASE_HTTP_MAX_CONCURRENCY: int = int(os.getenv("SUPABASE_HTTP_MAX_CONCURRENCY", "16"))  # Async requests in flight at once
+    SUPABASE_HTTP_TIMEOUT_SECONDS: float = float(os.getenv("SUPABASE_HTTP_TIMEOUT_SECONDS", "15"))  # Per-request timeout for async calls
+    SUPABASE_LOCAL_MIRROR: bool = os.getenv("SUPABASE_LOCAL_MIRROR", "false").lower() == "true"  # Serve document-scoped searches from a local copy
+    SUPABASE_MIRROR_MAX_DOCUMENTS: int = int(os.getenv("SUPABASE_MIRROR_MAX_DOCUMENTS", "8"))  # LRU bound on mirrored documents
+    SUPABASE_MIRROR_TTL_SECONDS: int = int(os.getenv("SUPABASE_MIRROR_TTL_SECONDS", "300"))  # Refetch a mirrored document after this long (0 = only on re-ingest)
+    SUPABASE_REGISTRY_TABLE_NAME: str = os.getenv("SUPABASE_REGISTRY_TABLE_NAME", "document_registry")  # One row per fully ingested document
+    SUPABASE_REGISTRY_TTL_SECONDS: int = int(os.getenv("SUPABASE_REGISTRY_TTL_SECONDS", "300"))  # Local registry cache lifetime (0 = until evicted)
+    SUPABASE_REGISTRY_NEGATIVE_TTL_SECONDS: int = int(os.getenv("SUPABASE_REGISTRY_NEGATIVE_TTL_SECONDS", "30"))  # How long a "not ingested" answer is cached
     ENABLE_REQUEST_LOGGING: bool = os.getenv("ENABLE_REQUEST_LOGGING", "true").lower() == "true"
+    HEALTH_STATS_REFRESH_SECONDS: int = int(os.getenv("HEALTH_STATS_REFRESH_SECONDS", "60"))  # Background refresh interval for /rag/health document counts
 
     # Processing Configuration
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
+    DOCUMENT_IDENTITY_INDEX_PATH: str = os.getenv("DOCUMENT_IDENTITY_INDEX_PATH", "document_identity_index.json")  # URL -> content hash map with ETag/Last-Modified
+    DOCUMENT_FETCH_TIMEOUT_SECONDS: float = float(os.getenv("DOCUMENT_FETCH_TIMEOUT_SECONDS", "60"))  # Download timeout when hashing document content
+    DOCUMENT_IDENTITY_TTL_SECONDS: int = int(os.getenv("DOCUMENT_IDENTITY_TTL_SECONDS", "3600"))  # Reuse the content hash of a URL sent without ETag/Last-Modified for this long without re-fetching (0 = always re-fetch)
+    DOCUMENT_IDENTITY_MAX_URLS: int = int(os.getenv("DOCUMENT_IDENTITY_MAX_URLS", "10000"))  # Most recently checked URLs kept in the index
+    DOCUMENT_IDENTITY_MAX_AGE_SECONDS: int = int(os.getenv("DOCUMENT_IDENTITY_MAX_AGE_SECONDS", str(30 * 24 * 3600)))  # Drop URLs not checked for this long (0 = never)
+
+    # Retrieval Configuration
+    MMR_LAMBDA_MULT: float = float(os.getenv("MMR_LAMBDA_MULT", "0.7"))  # 1.0 = pure relevance, 0.0 = pure diversity
 
     # Caching Configuration
     ENABLE_CACHING: bool = True  # Enable/disable caching
     CACHE_MIN_CHUNKS: int = 0  # Only cache docs with >0 chunks
+    INMEMORY_MAX_RESIDENT_DOCUMENTS: int = int(os.getenv("INMEMORY_MAX_RESIDENT_DOCUMENTS", "32"))  # LRU bound on documents kept loaded in memory
+    INMEMORY_VECTOR_QUANTIZATION: str = os.getenv("INMEMORY_VECTOR_QUANTIZATION", "none")  # none, float16 or int8 first-pass codes
+    INMEMORY_RESCORE_FACTOR: int = int(os.getenv("INMEMORY_RESCORE_FACTOR", "4"))  # Quantized search rescores k * factor candidates
+    INMEMORY_COMPACTION_TOMBSTONE_RATIO: float = float(os.getenv("INMEMORY_COMPACTION_TOMBSTONE_RATIO", "0.2"))  # Compact a partition once this fraction of its rows is deleted (0 = never)
+    VECTOR_ANN_INDEX: str = os.getenv("VECTOR_ANN_INDEX", "none")  # ivf, annoy or none
+    VECTOR_ANN_MIN_ROWS: int = int(os.getenv("VECTOR_ANN_MIN_ROWS", "20000"))  # Partitions smaller than this use exact search
+    VECTOR_ANN_NPROBE: int = int(os.getenv("VECTOR_ANN_NPROBE", "8"))  # IVF lists scanned per query; higher = better recall
+    VECTOR_ANN_TREES: int = int(os.getenv("VECTOR_ANN_TREES", "10"))  # Annoy trees built per index
+    VECTOR_ANN_SEARCH_K: int = int(os.getenv("VECTOR_ANN_SEARCH_K", "-1"))  # Annoy nodes inspected per query (-1 = default)
+    VECTOR_CACHE_COMPACTION_SEGMENTS: int = int(os.getenv("VECTOR_CACHE_COMPACTION_SEGMENTS", "8"))  # Merge a cache entry's segments once this many accumulate
+    VECTOR_CACHE_MAX_BYTES: int = int(os.getenv("VECTOR_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))  # Disk budget for vector_store_cache (0 = unlimited)
+    VECTOR_CACHE_MAX_AGE_SECONDS: int = int(os.getenv("VECTOR_CACHE_MAX_AGE_SECONDS", str(30 * 24 * 3600)))  # Drop entries older than this (0 = never)
+    VECTOR_CACHE_COLD_AFTER_SECONDS: int = int(os.getenv("VECTOR_CACHE_COLD_AFTER_SECONDS", str(7 * 24 * 3600)))  # Compress entries idle this long (0 = never)
+    VECTOR_CACHE_ZSTD_LEVEL: int = int(os.getenv("VECTOR_CACHE_ZSTD_LEVEL", "10"))  # zstd level for cold entries
 
 
     class Config:
@@ -1,7 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.router import api_router
+from app.api.v1.endpoints.rag import stats_monitor, document_identity
 from app.config.settings import settings
+from app.services.vector_stores.vector_store_factory import VectorStoreFactory
 import asyncio
 import platform
 
@@ -25,6 +27,13 @@ async def startup_event():
     print("Starting  API Server...")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stats_monitor.stop()
+    await document_identity.flush()
+    await VectorStoreFactory.aclose_all()
+
+
 @app.get("/")
 async def root():
     return {
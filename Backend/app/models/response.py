@@ -17,3 +17,7 @@ class HealthResponse(BaseModel):
     vector_store: str
     llm_provider: str
     document_count: Optional[int] = None
+    cache_stats: Optional[Dict] = None
+    stats_refreshed_at: Optional[str] = None
+    stats_age_seconds: Optional[float] = None
+    stats_error: Optional[str] = None
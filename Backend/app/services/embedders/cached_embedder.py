@@ -0,0 +1,193 @@
+from typing import List, Optional, Union, Dict
+from pathlib import Path
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+import numpy as np
+from .base_embedder import BaseEmbedder
+
+
+class CachedEmbedder(BaseEmbedder):
+    """
+    Persistent embedding cache in front of another embedder.
+
+    Vectors are stored in a SQLite file as float32 blobs keyed by
+    (model, dimensions, sha256 of the normalized text), so boilerplate clauses,
+    repeated table rows and re-uploaded documents are embedded once across
+    ingestions and restarts. Duplicates within one call are sent once as well,
+    and only misses reach the wrapped embedder. Text is normalized to Unicode
+    NFC with runs of whitespace collapsed before hashing.
+
+    With `max_entries` set, the least recently used vectors are pruned after
+    inserts. Hit ratio and the text bytes not sent to the provider are
+    reported by get_stats().
+    """
+
+    LOOKUP_BATCH = 500
+
+    def __init__(self, embedder: BaseEmbedder, db_path: str = "embedding_cache.db", max_entries: int = 0):
+        self.embedder = embedder
+        self.db_path = db_path
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    dimensions INTEGER NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used_at REAL NOT NULL,
+                    PRIMARY KEY (model, dimensions, text_hash)
+                );
+                CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used_at);
+                """
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    @classmethod
+    def text_hash(cls, text: str) -> str:
+        return hashlib.sha256(cls.normalize(text).encode()).hexdigest()
+
+    def _lookup(self, hashes: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(hashes), self.LOOKUP_BATCH):
+                batch = hashes[start:start + self.LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                key = (self.model_name, self.dimension)
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})",
+                    (*key, *batch)
+                ).fetchall()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used_at = ? WHERE model = ? AND dimensions = ? AND text_hash IN ({','.join('?' * len(rows))})",
+                        (now, *key, *[row[0] for row in rows])
+                    )
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+            self._conn.commit()
+        return found
+
+    def _store(self, vectors: Dict[str, List[float]]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, dimensions, text_hash, vector, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (self.model_name, self.dimension, text_hash, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for text_hash, vector in vectors.items()
+                ]
+            )
+            if self.max_entries > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+
+    def lookup(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached vectors for `texts`, None where missing, so callers can send only the misses to embed()"""
+        hashes = [self.text_hash(text) for text in texts]
+        try:
+            found = self._lookup(list(dict.fromkeys(hashes)))
+        except Exception as e:
+            print(f"Error reading embedding cache: {e}")
+            found = {}
+
+        vectors = [found.get(text_hash) for text_hash in hashes]
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                if vector is not None:
+                    self.hits += 1
+                    self.bytes_saved += len(text.encode())
+        return vectors
+
+    def embed(self, texts: Union[str, List[str]]) -> List[List[float]]:
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            return []
+
+        hashes = [self.text_hash(text) for text in texts]
+        try:
+            vectors = self._lookup(list(dict.fromkeys(hashes)))
+        except Exception as e:
+            print(f"Error reading embedding cache: {e}")
+            vectors = {}
+
+        # One provider call for the distinct texts that are not cached yet
+        pending: Dict[str, str] = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in vectors and text_hash not in pending:
+                pending[text_hash] = text
+        if pending:
+            embedded = dict(zip(pending, self.embedder.embed(list(pending.values()))))
+            vectors.update(embedded)
+            try:
+                self._store(embedded)
+            except Exception as e:
+                print(f"Error writing embedding cache: {e}")
+
+        # Repeats of a text sent in this call count as hits, like cached ones
+        hits, saved = 0, 0
+        for text, text_hash in zip(texts, hashes):
+            if pending.pop(text_hash, None) is None:
+                hits += 1
+                saved += len(text.encode())
+        with self._lock:
+            self.hits += hits
+            self.misses += len(texts) - hits
+            self.bytes_saved += saved
+
+        return [vectors[text_hash] for text_hash in hashes]
+
+    @property
+    def uncached(self) -> BaseEmbedder:
+        """The wrapped embedder, for one-off texts such as questions that should not fill the cache"""
+        return self.embedder
+
+    @property
+    def dimension(self) -> int:
+        return self.embedder.dimension
+
+    @property
+    def model_name(self) -> str:
+        return self.embedder.model_name
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        try:
+            with self._lock:
+                entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            size_mb = round(Path(self.db_path).stat().st_size / (1024 * 1024), 2)
+        except Exception as e:
+            print(f"Error reading embedding cache stats: {e}")
+            entries, size_mb = None, None
+        return {
+            "db_path": self.db_path,
+            "entries": entries,
+            "size_mb": size_mb,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "bytes_saved": self.bytes_saved,
+        }
@@ -1,6 +1,8 @@
 from typing import Optional, Dict, Any
 from .base_embedder import BaseEmbedder
 from .openai_embedder import OpenAIEmbedder
+from .cached_embedder import CachedEmbedder
+from app.config.settings import settings
 
 
 def get_embedding_model(
@@ -11,7 +13,7 @@ def get_embedding_model(
     name = name.lower().strip()
     
     if name in ["text-embedding-3-small", "text-embedding-3-large", "text-embedding-ada-002"]:
-        return OpenAIEmbedder(model=name, api_key=api_key)
+        embedder = OpenAIEmbedder(model=name, api_key=api_key)
     
     else:
         supported_models = [
@@ -24,3 +26,11 @@ def get_embedding_model(
             f"Unsupported embedding model: {name}. "
             f"Supported models: {', '.join(supported_models)}"
         )
+    
+    if settings.EMBEDDING_CACHE_ENABLED:
+        return CachedEmbedder(
+            embedder,
+            db_path=settings.EMBEDDING_CACHE_PATH,
+            max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES
+        )
+    return embedder
@@ -0,0 +1,172 @@
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import random
+from langchain_core.embeddings import Embeddings
+import tiktoken
+
+
+class EmbeddingScheduler:
+    """
+    Embeds many texts as token-packed batches with several requests in flight.
+
+    Texts already in the embedding cache are filled in first and repeated
+    texts are embedded once, so only distinct misses are packed. They are
+    packed in order into batches of at most `max_batch_tokens`
+    tokens and `max_batch_size` inputs, counted with the model's tiktoken
+    encoding (or ~4 characters per token if it cannot be loaded); a text over
+    the token budget goes out alone. Up to `max_concurrency` batches run at
+    once, and results are returned in input order. On a 429 the allowed
+    concurrency is halved and the batch retried after an exponential, jittered
+    delay (or the server's Retry-After); it grows back by one after a run of
+    successful batches. That concurrency state belongs to one aembed() call,
+    so concurrent ingestions sharing a scheduler do not resize each other's
+    limits; `max_concurrency` bounds each call, not the process.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "text-embedding-3-small",
+        max_batch_tokens: int = 50000,
+        max_batch_size: int = 256,
+        max_concurrency: int = 4,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0
+    ):
+        self.max_batch_tokens = max(1, max_batch_tokens)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.model_name = model_name
+        self._encoding = None
+        self._encoding_loaded = False
+
+        self.rate_limited = 0
+        self.cache_hits = 0
+
+    @property
+    def encoding(self) -> Optional["tiktoken.Encoding"]:
+        # Loaded on first use: tiktoken may need to download the BPE file
+        if not self._encoding_loaded:
+            self._encoding_loaded = True
+            try:
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model_name)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                print(f"Warning: tiktoken encoding unavailable, estimating tokens from text length: {e}")
+        return self._encoding
+
+    def count_tokens(self, text: str) -> int:
+        if self.encoding is None:
+            return len(text) // 4 + 1
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def pack(self, texts: List[str]) -> List[Tuple[int, int]]:
+        """[start, end) ranges of consecutive texts that fit the token and size budgets"""
+        batches: List[Tuple[int, int]] = []
+        start, tokens = 0, 0
+        for i, text in enumerate(texts):
+            text_tokens = self.count_tokens(text)
+            if i > start and (tokens + text_tokens > self.max_batch_tokens or i - start >= self.max_batch_size):
+                batches.append((start, i))
+                start, tokens = i, 0
+            tokens += text_tokens
+        if start < len(texts):
+            batches.append((start, len(texts)))
+        return batches
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        """Seconds to wait if `error` is a rate limit response, else None"""
+        response = getattr(error, "response", None)
+        status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+        if status != 429 and type(error).__name__ != "RateLimitError":
+            return None
+        try:
+            return float(response.headers.get("retry-after"))
+        except (AttributeError, TypeError, ValueError):
+            return 0.0
+
+    async def aembed(self, embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        if hasattr(embeddings, 'cached_documents'):
+            results = await asyncio.to_thread(embeddings.cached_documents, texts)
+            self.cache_hits += sum(1 for vector in results if vector is not None)
+
+        # Positions of each distinct text still missing; only these are packed and sent
+        missing: Dict[str, List[int]] = {}
+        for position, (text, vector) in enumerate(zip(texts, results)):
+            if vector is None:
+                missing.setdefault(text, []).append(position)
+        pending = list(missing)
+        if not pending:
+            return results
+
+        batches = self.pack(pending)
+        condition = asyncio.Condition()
+        in_flight = 0
+        concurrency = self.max_concurrency
+        successes = 0
+
+        async def run(start: int, end: int):
+            nonlocal in_flight, concurrency, successes
+            attempt = 0
+            while True:
+                async with condition:
+                    await condition.wait_for(lambda: in_flight < concurrency)
+                    in_flight += 1
+                try:
+                    vectors = await asyncio.to_thread(embeddings.embed_documents, pending[start:end])
+                    error = None
+                except Exception as e:
+                    error = e
+                finally:
+                    async with condition:
+                        in_flight -= 1
+                        condition.notify_all()
+
+                if error is None:
+                    for text, vector in zip(pending[start:end], vectors):
+                        for position in missing[text]:
+                            results[position] = vector
+                    successes += 1
+                    if successes >= concurrency and concurrency < self.max_concurrency:
+                        concurrency += 1
+                        successes = 0
+                    return
+
+                retry_after = self._retry_after(error)
+                if retry_after is None or attempt >= self.max_retries:
+                    raise error
+                self.rate_limited += 1
+                concurrency = max(1, concurrency // 2)
+                successes = 0
+                delay = retry_after or min(self.max_delay, self.base_delay * 2 ** attempt) * (0.5 + random.random())
+                print(f"Embedding rate limited; retrying {end - start} texts in {delay:.1f}s at concurrency {concurrency}")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+        tasks = [asyncio.ensure_future(run(start, end)) for start, end in batches]
+        try:
+            await asyncio.gather(*tasks)
+        except Exception:
+            for task in tasks:
+                task.cancel()
+            raise
+        return results
+
+    def get_stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_batch_tokens": self.max_batch_tokens,
+            "rate_limited": self.rate_limited,
+            "cache_hits": self.cache_hits,
+        }
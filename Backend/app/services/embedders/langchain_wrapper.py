@@ -1,15 +1,61 @@
-from typing import List
+from typing import List, Optional
+import asyncio
 from langchain_core.embeddings import Embeddings
 from .base_embedder import BaseEmbedder
+from .query_embedding_cache import QueryEmbeddingCache
+from .cached_embedder import CachedEmbedder
+from app.config.settings import settings
+
+# Shared by every wrapper in the process, so all retrieval paths reuse question embeddings
+query_embedding_cache = QueryEmbeddingCache(
+    max_entries=settings.QUERY_EMBEDDING_CACHE_SIZE,
+    ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS
+)
 
 
 class LangChainEmbeddingWrapper(Embeddings):
     
-    def __init__(self, embedder: BaseEmbedder):
+    def __init__(self, embedder: BaseEmbedder, query_cache: Optional[QueryEmbeddingCache] = None):
         self.embedder = embedder
+        # Questions are one-off texts: they go through the query LRU only, never into the persistent cache
+        self.query_embedder = embedder.uncached if hasattr(embedder, 'uncached') else embedder
+        self.query_cache = query_cache or query_embedding_cache
     
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         return self.embedder.embed(texts)
     
+    def cached_documents(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Vectors the persistent cache already holds for these texts, None for the rest"""
+        if hasattr(self.embedder, 'lookup'):
+            return self.embedder.lookup(texts)
+        return [None] * len(texts)
+    
     def embed_query(self, text: str) -> List[float]:
-        return self.embedder.embed_single(text)
+        return self.embed_queries([text])[0]
+    
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed questions through the query LRU; distinct misses go out in one request"""
+        model, dimensions = self.query_embedder.model_name, self.query_embedder.dimension
+        embeddings = [self.query_cache.get(model, dimensions, query) for query in queries]
+        pending = list(dict.fromkeys(
+            CachedEmbedder.normalize(query)
+            for query, embedding in zip(queries, embeddings) if embedding is None
+        ))
+        if pending:
+            fetched = dict(zip(pending, self.query_embedder.embed(pending)))
+            for text, embedding in fetched.items():
+                self.query_cache.put(model, dimensions, text, embedding)
+            embeddings = [
+                embedding if embedding is not None else fetched[CachedEmbedder.normalize(query)]
+                for query, embedding in zip(queries, embeddings)
+            ]
+        return embeddings
+    
+    async def aembed_queries(self, queries: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_queries, queries)
+    
+    def get_cache_stats(self) -> dict:
+        return {
+            "persistent": self.embedder.get_stats() if hasattr(self.embedder, 'get_stats') else None,
+            "queries": self.query_cache.get_stats(),
+        }
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import threading
+import time
+from .cached_embedder import CachedEmbedder
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded in-process LRU of query embeddings.
+
+    Keys are (model, dimensions, normalized question text), so one cache can be shared by
+    every wrapper in the process: the dynamic-k probe and the candidate fetch,
+    the decision-tree agents and the MCP tools all reuse one embedding per
+    distinct question. Entries older than `ttl_seconds` are re-embedded
+    (0 = no expiry) and the least recently used ones are evicted past
+    `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 0):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, int, str], Tuple[List[float], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, dimensions: int, text: str) -> Tuple[str, int, str]:
+        return model, dimensions, CachedEmbedder.normalize(text)
+
+    def get(self, model: str, dimensions: int, text: str) -> Optional[List[float]]:
+        key = self.key(model, dimensions, text)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None or (self.ttl_seconds > 0 and time.monotonic() - cached[1] >= self.ttl_seconds):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached[0]
+
+    def put(self, model: str, dimensions: int, text: str, embedding: List[float]):
+        key = self.key(model, dimensions, text)
+        with self._lock:
+            self._entries[key] = (embedding, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "cached_queries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
@@ -42,6 +42,7 @@ class PipelineManager:
         traditional_retrieval_service,
         structure_aware_retrieval_service,
         settings,
+        document=None,
     ) -> Tuple[List[str], Dict[str, Any], Dict[str, Any]]:
         """
         Execute the specified RAG pipeline with the given parameters.
@@ -57,6 +58,7 @@ class PipelineManager:
             traditional_retrieval_service: Traditional retrieval service instance
             structure_aware_retrieval_service: Structure-aware retrieval service instance
             settings: Application settings
+            document: ResolvedDocument for document_url (content-hash identity and fetched bytes), if resolved
             
         Returns:
             Tuple of (answers, document_metadata, raw_response)
@@ -88,6 +90,7 @@ class PipelineManager:
             document_processor=document_processor,
             retrieval_service=retrieval_service,
             settings=settings,
+            document=document,
         )
     
     @classmethod
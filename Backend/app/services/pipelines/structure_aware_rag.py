@@ -10,6 +10,7 @@ async def structure_aware_rag(
     document_processor,
     retrieval_service,
     settings,
+    document=None,
 ) -> Tuple[List[str], Dict[str, Any], Dict[str, Any]]:
     """Run the structure-aware RAG flow optimized for insurance documents.
     
@@ -24,7 +25,8 @@ async def structure_aware_rag(
     # Process document - caching is handled internally by the vector store
     processing_result = await document_processor.process_document_from_url_async(
         url=document_url,
-        metadata={"document_id": document_id}
+        metadata={"document_id": document_id},
+        document=document
     )
 
     if not processing_result["success"]:
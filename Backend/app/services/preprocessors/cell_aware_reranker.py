@@ -3,7 +3,7 @@ Cell-Aware Reranker for structure-aware retrieval
 """
 from typing import List, Dict, Any, Optional, Tuple
 from langchain_core.documents import Document
-from collections import defaultdict
+from collections import defaultdict, Counter
 import re
 import hashlib
 
@@ -182,10 +182,14 @@ class CellAwareReranker:
         self, 
         documents: List[Document], 
         question: str, 
-        top_k: int
+        top_k: int,
+        content_diversity: bool = True
     ) -> List[Document]:
         """
-        Cell-aware reranking that considers structure and relationships
+        Cell-aware reranking that considers structure and relationships.
+        
+        `content_diversity` adds a word-overlap penalty against earlier candidates;
+        callers that already ran MMR over the candidates' embeddings can turn it off.
         """
         
         if not documents:
@@ -206,6 +210,8 @@ class CellAwareReranker:
         
         # Step 4: Apply structure-aware scoring
         final_scores = []
+        type_counts = Counter()
+        table_counts = Counter()
         for i, (doc, base_score) in enumerate(zip(documents, base_scores)):
             metadata = doc.metadata
             element_type = metadata.get('element_type', 'text')
@@ -225,8 +231,12 @@ class CellAwareReranker:
             )
             
             # Add diversity penalty for similar elements
-            diversity_penalty = self._calculate_diversity_penalty(doc, documents[:i])
+            diversity_penalty = self._calculate_diversity_penalty(
+                doc, type_counts, table_counts, documents[:i] if content_diversity else []
+            )
             final_score *= (1 - diversity_penalty)
+            type_counts[element_type] += 1
+            table_counts[metadata.get('table_id', 'none')] += 1
             
             final_scores.append((doc, base_score, final_score, {
                 'element_type': element_type,
@@ -256,33 +266,33 @@ class CellAwareReranker:
         
         return intersection / union if union > 0 else 0.0
     
-    def _calculate_diversity_penalty(self, current_doc: Document, previous_docs: List[Document]) -> float:
-        """Calculate penalty for similar documents to promote diversity"""
-        if not previous_docs:
-            return 0.0
+    def _calculate_diversity_penalty(
+        self, 
+        current_doc: Document, 
+        type_counts: Counter, 
+        table_counts: Counter, 
+        previous_docs: List[Document]
+    ) -> float:
+        """Calculate penalty for similar documents to promote diversity.
         
+        Element type and table repeats are read from running counts; content
+        similarity is only scanned against `previous_docs`, which is empty when
+        MMR has already removed near-duplicates.
+        """
         current_type = current_doc.metadata.get('element_type', 'text')
         current_table = current_doc.metadata.get('table_id', 'none')
         
-        penalty = 0.0
+        # Penalty for same element type (but allow some duplication)
+        penalty = 0.02 * type_counts[current_type]
+        
+        # Higher penalty for same table elements
+        if current_table != 'none':
+            penalty += 0.05 * table_counts[current_table]
+        
+        # Content similarity penalty
+        current_content = current_doc.page_content[:200]
         for prev_doc in previous_docs:
-            prev_type = prev_doc.metadata.get('element_type', 'text')
-            prev_table = prev_doc.metadata.get('table_id', 'none')
-            
-            # Penalty for same element type (but allow some duplication)
-            if current_type == prev_type:
-                penalty += 0.02
-            
-            # Higher penalty for same table elements
-            if current_table != 'none' and current_table == prev_table:
-                penalty += 0.05
-            
-            # Content similarity penalty
-            content_similarity = self._simple_similarity(
-                current_doc.page_content[:200], 
-                prev_doc.page_content[:200]
-            )
-            penalty += content_similarity * 0.1
+            penalty += self._simple_similarity(current_content, prev_doc.page_content[:200]) * 0.1
         
         return min(penalty, 0.3)  # Cap penalty at 30%
     
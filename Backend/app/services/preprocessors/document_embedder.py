@@ -3,8 +3,10 @@ from pathlib import Path
 import uuid
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from app.services.preprocessors.azure import AzureDocumentProcessor
+from app.services.preprocessors.document_identity import ResolvedDocument
 from app.services.preprocessors.Markdown_chunker import InsuranceDocumentChunker
 from app.services.vector_stores.base_vector_store import BaseVectorStore
+from app.services.embedders.embedding_scheduler import EmbeddingScheduler
 from app.config.settings import settings
 
 
@@ -43,6 +45,15 @@ class DocumentEmbedder:
         else:
             self.advanced_chunker = None
         
+        # Async ingestion embeds each document's chunks up front as token-packed concurrent requests
+        self.embedding_scheduler = EmbeddingScheduler(
+            model_name=settings.EMBEDDING_MODEL,
+            max_batch_tokens=settings.EMBEDDING_BATCH_MAX_TOKENS,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_concurrency=settings.EMBEDDING_MAX_CONCURRENCY,
+            max_retries=settings.EMBEDDING_MAX_RETRIES
+        )
+        
         # Initialize fallback text splitter
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
@@ -224,6 +235,9 @@ class DocumentEmbedder:
         total_chunks = len(chunks)
         cache_used_overall = False
         
+        if base_metadata.get("source"):
+            self.vector_store.begin_document(base_metadata["source"], base_metadata.get("document_id"))
+        
         for i in range(0, total_chunks, self.batch_size):
             batch_end = min(i + self.batch_size, total_chunks)
             batch_chunks = chunks[i:batch_end]
@@ -249,6 +263,9 @@ class DocumentEmbedder:
             if batch_cache_used:
                 cache_used_overall = True
         
+        if base_metadata.get("source"):
+            self.vector_store.finalize_document(base_metadata["source"], base_metadata.get("document_id"))
+        
         return all_ids, cache_used_overall
     
     def _embed_advanced_chunks_in_batches(self, chunks_with_metadata: List[Tuple], base_metadata: Dict) -> tuple[List[str], bool]:
@@ -257,6 +274,9 @@ class DocumentEmbedder:
         total_chunks = len(chunks_with_metadata)
         cache_used_overall = False
         
+        if base_metadata.get("source"):
+            self.vector_store.begin_document(base_metadata["source"], base_metadata.get("document_id"))
+        
         for i in range(0, total_chunks, self.batch_size):
             batch_end = min(i + self.batch_size, total_chunks)
             batch_chunks = chunks_with_metadata[i:batch_end]
@@ -319,12 +339,26 @@ class DocumentEmbedder:
             if batch_cache_used:
                 cache_used_overall = True
         
+        if base_metadata.get("source"):
+            self.vector_store.finalize_document(base_metadata["source"], base_metadata.get("document_id"))
+        
         return all_ids, cache_used_overall
     
+    async def _aembed_all(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Vectors for all of a document's chunks, in order; None leaves embedding to the store's add calls"""
+        embeddings = getattr(self.vector_store, 'embeddings', None)
+        if embeddings is None:
+            return None
+        return await self.embedding_scheduler.aembed(embeddings, texts)
+    
     async def _embed_chunks_in_batches_async(self, chunks: List[str], base_metadata: Dict) -> tuple[List[str], bool]:
         all_ids = []
         total_chunks = len(chunks)
         cache_used_overall = False
+        vectors = await self._aembed_all(chunks)
+        
+        if base_metadata.get("source"):
+            await self.vector_store.abegin_document(base_metadata["source"], base_metadata.get("document_id"))
         
         for i in range(0, total_chunks, self.batch_size):
             batch_end = min(i + self.batch_size, total_chunks)
@@ -342,21 +376,27 @@ class DocumentEmbedder:
                 }
                 batch_metadatas.append(chunk_metadata)
             
+            batch_vectors = vectors[i:batch_end] if vectors is not None else None
             if hasattr(self.vector_store, 'aadd_documents'):
                 batch_ids, batch_cache_used = await self.vector_store.aadd_documents(
                     texts=batch_chunks,
-                    metadatas=batch_metadatas
+                    metadatas=batch_metadatas,
+                    embeddings=batch_vectors
                 )
             else:
                 batch_ids, batch_cache_used = self.vector_store.add_documents(
                     texts=batch_chunks,
-                    metadatas=batch_metadatas
+                    metadatas=batch_metadatas,
+                    embeddings=batch_vectors
                 )
             
             all_ids.extend(batch_ids)
             if batch_cache_used:
                 cache_used_overall = True
         
+        if base_metadata.get("source"):
+            await self.vector_store.afinalize_document(base_metadata["source"], base_metadata.get("document_id"))
+        
         return all_ids, cache_used_overall
     
     async def _embed_advanced_chunks_in_batches_async(self, chunks_with_metadata: List[Tuple], base_metadata: Dict) -> tuple[List[str], bool]:
@@ -364,6 +404,10 @@ class DocumentEmbedder:
         all_ids = []
         total_chunks = len(chunks_with_metadata)
         cache_used_overall = False
+        vectors = await self._aembed_all([chunk_text for chunk_text, _ in chunks_with_metadata])
+        
+        if base_metadata.get("source"):
+            await self.vector_store.abegin_document(base_metadata["source"], base_metadata.get("document_id"))
         
         for i in range(0, total_chunks, self.batch_size):
             batch_end = min(i + self.batch_size, total_chunks)
@@ -418,21 +462,27 @@ class DocumentEmbedder:
                 batch_metadatas.append(enhanced_metadata)
             
             # Embed batch with enhanced metadata
+            batch_vectors = vectors[i:batch_end] if vectors is not None else None
             if hasattr(self.vector_store, 'aadd_documents'):
                 batch_ids, batch_cache_used = await self.vector_store.aadd_documents(
                     texts=batch_texts,
-                    metadatas=batch_metadatas
+                    metadatas=batch_metadatas,
+                    embeddings=batch_vectors
                 )
             else:
                 batch_ids, batch_cache_used = self.vector_store.add_documents(
                     texts=batch_texts,
-                    metadatas=batch_metadatas
+                    metadatas=batch_metadatas,
+                    embeddings=batch_vectors
                 )
             
             all_ids.extend(batch_ids)
             if batch_cache_used:
                 cache_used_overall = True
         
+        if base_metadata.get("source"):
+            await self.vector_store.afinalize_document(base_metadata["source"], base_metadata.get("document_id"))
+        
         return all_ids, cache_used_overall
     
     async def process_and_embed_file_async(self, file_path: str, metadata: Optional[Dict] = None) -> Dict[str, Any]:
@@ -440,9 +490,9 @@ class DocumentEmbedder:
             raise ValueError(f"Unsupported file format: {Path(file_path).suffix}")
         
         # Check if we already have this file cached in the vector store
-        if self.vector_store.has_cache(file_path):
+        if await self.vector_store.ahas_cache(file_path):
             print(f"Cache found for file: {file_path}")
-            if self.vector_store.load_from_cache(file_path):
+            if await self.vector_store.aload_from_cache(file_path):
                 # Return cache hit response - no new processing needed
                 return {
                     "success": True,
@@ -479,11 +529,17 @@ class DocumentEmbedder:
             }
         )
     
-    async def process_and_embed_url_async(self, url: str, metadata: Optional[Dict] = None) -> Dict[str, Any]:
-        # Check if we already have this URL cached in the vector store
-        if self.vector_store.has_cache(url):
+    async def process_and_embed_url_async(
+        self,
+        url: str,
+        metadata: Optional[Dict] = None,
+        document: Optional[ResolvedDocument] = None
+    ) -> Dict[str, Any]:
+        # A resolved document is cached under its content hash, so the same bytes from any URL hit
+        source = document.content_key if document else url
+        if await self.vector_store.ahas_cache(source):
             print(f"Cache found for URL: {url}")
-            if self.vector_store.load_from_cache(url):
+            if await self.vector_store.aload_from_cache(source):
                 # Return cache hit response - no new processing needed
                 return {
                     "success": True,
@@ -497,8 +553,11 @@ class DocumentEmbedder:
                     "cache_used": True
                 }
         
-        # No cache found, proceed with Azure processing
-        documents = self.azure_processor.process_url(url)
+        # No cache found, proceed with Azure processing; reuse the bytes if they were already downloaded
+        if document and document.content is not None:
+            documents = self.azure_processor.process_bytes(document.content, document.filename)
+        else:
+            documents = self.azure_processor.process_url(url)
         extracted_data = self.azure_processor.extract_text_and_metadata(documents)
         
         safe_extracted_metadata = {}
@@ -513,7 +572,8 @@ class DocumentEmbedder:
         return await self._embed_content_async(
             content=extracted_data["text"],
             base_metadata={
-                "source": url,
+                "source": source,
+                "source_url": url,
                 "page_count": extracted_data["page_count"],
                 **(metadata or {}),
                 **safe_extracted_metadata
@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+import httpx
+
+
+@dataclass
+class ResolvedDocument:
+    """
+    Identity of the document behind a URL.
+
+    `content_key` is what the vector stores cache under (it is passed where
+    they expect a document URL), and `document_id` is derived from it the same
+    way the stores derive ids from URLs. `content` holds the downloaded bytes
+    when the server sent them, and is None when it answered 304 Not Modified
+    or when the URL could not be fetched (then the key falls back to the URL).
+    """
+    url: str
+    content_key: str
+    document_id: str
+    content: Optional[bytes] = None
+    unchanged: bool = False
+
+    @property
+    def filename(self) -> str:
+        return os.path.basename(urlparse(self.url).path) or "document"
+
+
+class DocumentIdentityResolver:
+    """
+    Identifies documents by a hash of their bytes instead of by their URL.
+
+    The same file served from two URLs, or from a signed URL whose query
+    parameters rotate, resolves to one content key, so its chunks are reused
+    instead of OCR'd and embedded again. A URL -> content hash index is kept
+    with each response's ETag/Last-Modified; repeat requests for a known URL
+    send a conditional GET, and a 304 resolves to the recorded hash without
+    downloading the file. A URL whose server sent no validators is resolved
+    from the index without any request when it was checked less than
+    `ttl_seconds` ago; with validators the conditional GET always goes out, so
+    a document updated in place is picked up at the cost of a 304 otherwise.
+
+    The index keeps the `max_entries` most recently checked URLs and drops
+    entries older than `max_age_seconds`. It is a small JSON file rewritten
+    atomically off the event loop, at most once per FLUSH_DELAY_SECONDS;
+    workers sharing it may overwrite each other's entries, which only costs a
+    full GET next time.
+    """
+
+    FLUSH_DELAY_SECONDS = 2.0
+
+    def __init__(
+        self,
+        index_path: str = "document_identity_index.json",
+        timeout: float = 60.0,
+        ttl_seconds: int = 3600,
+        max_entries: int = 10000,
+        max_age_seconds: int = 30 * 24 * 3600,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.index_path = Path(index_path)
+        self.timeout = timeout
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.max_age_seconds = max_age_seconds
+        self.transport = transport
+        # Only touched on the event loop; entries are replaced, never mutated, so flush snapshots stay consistent
+        self._index: "OrderedDict[str, Dict[str, Any]]" = OrderedDict(
+            sorted(self._read_index().items(), key=lambda item: item[1].get("checked_at", 0))
+        )
+        self._prune()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._dirty = False
+
+    @staticmethod
+    def content_key_for(content: bytes) -> str:
+        return f"sha256:{hashlib.sha256(content).hexdigest()}"
+
+    @staticmethod
+    def document_id_for(key: str) -> str:
+        # Same document_id hash the vector stores apply to the cache key
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            if self.index_path.exists():
+                with open(self.index_path, 'r') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Error reading document identity index: {e}")
+        return {}
+
+    def _prune(self):
+        if self.max_age_seconds > 0:
+            cutoff = time.time() - self.max_age_seconds
+            while self._index and next(iter(self._index.values())).get("checked_at", 0) < cutoff:
+                self._index.popitem(last=False)
+        while len(self._index) > self.max_entries:
+            self._index.popitem(last=False)
+
+    def _put(self, url: str, entry: Dict[str, Any]):
+        self._index.pop(url, None)
+        self._index[url] = entry
+        self._prune()
+        self._dirty = True
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # Keep going while entries change during a write, so the last one is never left unwritten
+        while self._dirty:
+            await asyncio.sleep(self.FLUSH_DELAY_SECONDS)
+            self._dirty = False
+            await self.flush()
+
+    async def flush(self):
+        """Write the index now; called by the debounced writer and on shutdown"""
+        await asyncio.to_thread(self._write_index, dict(self._index))
+
+    def _write_index(self, payload: Dict[str, Dict[str, Any]]):
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.index_path.with_name(f".{self.index_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+            with open(temp_path, 'w') as f:
+                json.dump(payload, f)
+            os.replace(temp_path, self.index_path)
+        except Exception as e:
+            print(f"Error writing document identity index: {e}")
+
+    def _record(self, url: str, content_key: str, response: httpx.Response):
+        self._put(url, {
+            "content_key": content_key,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "checked_at": time.time(),
+        })
+
+    def _resolved(self, url: str, entry: Dict[str, Any]) -> ResolvedDocument:
+        return ResolvedDocument(
+            url=url,
+            content_key=entry["content_key"],
+            document_id=self.document_id_for(entry["content_key"]),
+            unchanged=True
+        )
+
+    def _within_ttl(self, entry: Dict[str, Any]) -> bool:
+        """Only entries without validators skip the request; the rest always get a conditional GET"""
+        if entry.get("etag") or entry.get("last_modified"):
+            return False
+        return self.ttl_seconds > 0 and time.time() - entry.get("checked_at", 0) < self.ttl_seconds
+
+    def _conditional_headers(self, entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    async def resolve(self, url: str) -> ResolvedDocument:
+        entry = self._index.get(url)
+        if entry and self._within_ttl(entry):
+            return self._resolved(url, entry)
+        try:
+            async with httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                follow_redirects=True,
+                transport=self.transport
+            ) as client:
+                response = await client.get(url, headers=self._conditional_headers(entry))
+
+            if response.status_code == 304 and entry:
+                print(f"Document unchanged since last fetch: {url[:50]}...")
+                entry = {**entry, "checked_at": time.time()}
+                self._put(url, entry)
+                return self._resolved(url, entry)
+
+            response.raise_for_status()
+            content_key = self.content_key_for(response.content)
+            if entry and entry.get("content_key") == content_key:
+                print(f"Document content unchanged: {url[:50]}...")
+            self._record(url, content_key, response)
+            return ResolvedDocument(
+                url=url,
+                content_key=content_key,
+                document_id=self.document_id_for(content_key),
+                content=response.content,
+                unchanged=bool(entry and entry.get("content_key") == content_key)
+            )
+
+        except Exception as e:
+            print(f"Error fetching document for content hashing, using URL identity: {e}")
+            return ResolvedDocument(url=url, content_key=url, document_id=self.document_id_for(url))
+
+    def get_stats(self) -> dict:
+        return {
+            "indexed_urls": len(self._index),
+            "ttl_seconds": self.ttl_seconds,
+            "index_path": str(self.index_path),
+        }
@@ -2,6 +2,7 @@ from typing import List, Dict, Optional, Any, Union
 from app.services.preprocessors.azure import AzureDocumentProcessor
 from app.services.vector_stores.base_vector_store import BaseVectorStore
 from app.services.preprocessors.document_embedder import DocumentEmbedder
+from app.services.preprocessors.document_identity import ResolvedDocument
 from app.config.settings import settings
 
 
@@ -40,8 +41,13 @@ class UnifiedDocumentProcessor:
     async def process_document_from_path_async(self, file_path: str, metadata: Optional[Dict] = None) -> Dict[str, Any]:
         return await self.embedder.process_and_embed_file_async(file_path, metadata)
     
-    async def process_document_from_url_async(self, url: str, metadata: Optional[Dict] = None) -> Dict[str, Any]:
-        return await self.embedder.process_and_embed_url_async(url, metadata)
+    async def process_document_from_url_async(
+        self,
+        url: str,
+        metadata: Optional[Dict] = None,
+        document: Optional[ResolvedDocument] = None
+    ) -> Dict[str, Any]:
+        return await self.embedder.process_and_embed_url_async(url, metadata, document)
     
     def get_document_count(self) -> int:
         return self.embedder.get_document_count()
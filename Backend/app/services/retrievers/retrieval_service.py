@@ -1,6 +1,7 @@
 from app.services.vector_stores.base_vector_store import BaseVectorStore
 from app.providers.base import BaseLLMProvider
 from app.prompts.traditional_rag_prompt import TraditionalRagPrompt
+from app.config.settings import settings
 from typing import List, Dict, Optional
 import asyncio
 import time
@@ -103,10 +104,8 @@ class RetrievalService:
                     k_analysis = None
                 else:
                     # Dynamic k mode - analyze scores to find optimal k
-                    pre_search_results = await self.vector_store.asimilarity_search_with_score(
-                        query=question, k=15, filter={"document_id": document_id}  # Get max for analysis
-                    )
-                    if not pre_search_results:
+                    scores = batched_hits[i].scores[:15].tolist()  # Get max for analysis
+                    if not scores:
                         return {
                             "answer": "No relevant information found in the document.",
                             "debug_info": {
@@ -118,7 +117,6 @@ class RetrievalService:
                             }
                         }
                     
-                    scores = [score for _, score in pre_search_results]
                     final_k, reason, all_scores, relative_drops = self._find_optimal_k(scores)
                     retrieval_method = f"Hybrid Search (Dynamic k={final_k})"
                     k_analysis = {
@@ -132,12 +130,9 @@ class RetrievalService:
                 # Step 2: Efficient Hybrid Retrieval (Question-Specific)
                 # Vector retrieval - get semantically relevant candidates
                 vector_candidates_size = max(50, final_k * 3) # Reasonable corpus
-                vector_docs_with_scores = await self.vector_store.asimilarity_search_with_score(
-                    query=question, k=vector_candidates_size, filter={"document_id": document_id}
-                )
-                vector_docs = [doc for doc, _ in vector_docs_with_scores]
+                vector_hits = batched_hits[i].head(vector_candidates_size)
                 
-                if not vector_docs:
+                if not len(vector_hits):
                     return {
                         "answer": "No relevant information found in the document.",
                         "debug_info": {
@@ -149,32 +144,38 @@ class RetrievalService:
                         }
                     }
                 
-                # BM25 retrieval - use only the semantically relevant candidates as corpus
-                bm25_retriever = BM25Retriever.from_documents(vector_docs)
+                # BM25 retrieval - use only the semantically relevant candidates as corpus.
+                # Candidates stay row handles; only the chunks kept below become full Documents
+                candidate_texts = vector_hits.texts
+                bm25_retriever = BM25Retriever.from_texts(
+                    candidate_texts,
+                    metadatas=[{"position": position} for position in range(len(candidate_texts))]
+                )
                 bm25_retriever.k = final_k * 2  # Get top BM25 results from relevant corpus
-                bm25_docs = bm25_retriever.invoke(question)
+                bm25_positions = [doc.metadata["position"] for doc in bm25_retriever.invoke(question)]
                 
                 # Step 3: Combine and deduplicate
-                combined_docs = []
+                combined_positions = []
                 seen_content = set()
                 
                 # Add top vector docs first (semantic relevance priority)
-                top_vector_docs = vector_docs[:final_k * 2]  # Limit vector candidates
-                for doc in top_vector_docs:
-                    content_key = doc.page_content[:200]  # More robust dedup key
+                for position in range(min(final_k * 2, len(candidate_texts))):  # Limit vector candidates
+                    content_key = candidate_texts[position][:200]  # More robust dedup key
                     if content_key not in seen_content:
                         seen_content.add(content_key)
-                        combined_docs.append(doc)
+                        combined_positions.append(position)
                 
                 # Add unique BM25 docs (keyword matching diversity)
-                for doc in bm25_docs:
-                    content_key = doc.page_content[:200]
-                    if content_key not in seen_content and len(combined_docs) < final_k * 3:  # Limit total candidates
+                for position in bm25_positions:
+                    content_key = candidate_texts[position][:200]
+                    if content_key not in seen_content and len(combined_positions) < final_k * 3:  # Limit total candidates
                         seen_content.add(content_key)
-                        combined_docs.append(doc)
+                        combined_positions.append(position)
                 
-                # Step 4: Combine selected
-                final_docs = combined_docs[:final_k]
+                # Step 4: Combine selected - MMR picks the final k so near-duplicate chunks do not crowd the context;
+                # these are the only candidates hydrated into Documents
+                final_positions = vector_hits.mmr(combined_positions, final_k, settings.MMR_LAMBDA_MULT)
+                final_docs = vector_hits.hydrate(final_positions)
                 
                 if not final_docs:
                     return {
@@ -217,11 +218,11 @@ class RetrievalService:
                     "chunks_count": len(final_docs),
                     "retrieval_method": retrieval_method,
                     "hybrid_stats": {
-                        "vector_candidates_retrieved": len(vector_docs),
-                        "bm25_docs_found": len(bm25_docs),
-                        "combined_before_rerank": len(combined_docs),
+                        "vector_candidates_retrieved": len(vector_hits),
+                        "bm25_docs_found": len(bm25_positions),
+                        "combined_before_rerank": len(combined_positions),
                         "final_after_rerank": len(final_docs),
-                        "efficiency_note": f"BM25 corpus size: {len(vector_docs)} (question-specific vs 1000 global)"
+                        "efficiency_note": f"BM25 corpus size: {len(vector_hits)} (question-specific vs 1000 global)"
                     }
                 }
                 
@@ -252,6 +253,11 @@ class RetrievalService:
         print(f"Processing {len(questions)} questions in parallel with hybrid search...")
         start_time = time.time()
         
+        # One embedding request and one scan cover every question; each question slices its own candidates
+        batched_hits = await self.vector_store.asimilarity_search_hits_batch(
+            questions, k=max(50, (k or 15) * 3), filter={"document_id": document_id}
+        )
+        
         tasks = [process_single_question(i, question) for i, question in enumerate(questions)]
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
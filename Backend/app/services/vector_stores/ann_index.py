@@ -0,0 +1,235 @@
+from abc import ABC, abstractmethod
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+
+
+def rows_fingerprint(ids: List[str]) -> str:
+    """Identifies the exact row order an ANN index was built over"""
+    digest = hashlib.sha256()
+    for doc_id in ids:
+        digest.update(doc_id.encode())
+        digest.update(b"\0")
+    return f"{len(ids)}:{digest.hexdigest()[:16]}"
+
+
+class AnnIndex(ABC):
+    """
+    Candidate generator over rows [0, size) of a MatrixIndex.
+
+    search() only proposes row numbers; the caller rescores them exactly, so an
+    index only has to be good at recall, never at producing the final scores.
+    """
+
+    kind = "exact"
+
+    def __init__(self):
+        self.size = 0
+        self.fingerprint: Optional[str] = None
+
+    @abstractmethod
+    def build(self, vectors: np.ndarray, fingerprint: Optional[str] = None):
+        pass
+
+    @abstractmethod
+    def search(self, query: np.ndarray, k: int) -> np.ndarray:
+        pass
+
+    @abstractmethod
+    def save(self, path: Path):
+        pass
+
+    @classmethod
+    @abstractmethod
+    def load(cls, path: Path) -> "AnnIndex":
+        pass
+
+    @staticmethod
+    def _write_atomic(path: Path, write):
+        temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            write(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+
+class IVFIndex(AnnIndex):
+    """
+    Inverted-file index: spherical k-means centroids partition the rows, and a
+    query scans only the lists of its `nprobe` nearest centroids. Raising nprobe
+    trades speed for recall; nprobe == nlist is an exact scan.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 8, iterations: int = 10, seed: int = 0):
+        super().__init__()
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+        self.rows: Optional[np.ndarray] = None
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, block_rows: int = 8192) -> np.ndarray:
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), block_rows):
+            block = np.asarray(vectors[start:start + block_rows], dtype=np.float32)
+            assignment[start:start + block_rows] = np.argmax(block @ centroids.T, axis=1)
+        return assignment
+
+    def build(self, vectors: np.ndarray, fingerprint: Optional[str] = None):
+        n = len(vectors)
+        nlist = max(1, min(n, self.nlist or int(np.sqrt(n))))
+        rng = np.random.default_rng(self.seed)
+
+        # Train on a sample; a few dozen points per centroid is plenty for coarse routing
+        sample = np.asarray(vectors[np.sort(rng.choice(n, min(n, nlist * 64), replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignment = self._assign(sample, centroids)
+            for cluster in np.unique(assignment):
+                centroids[cluster] = sample[assignment == cluster].mean(axis=0)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids /= norms
+
+        assignment = self._assign(vectors, centroids)
+        counts = np.bincount(assignment, minlength=nlist)
+        self.centroids = centroids
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.rows = np.argsort(assignment, kind="stable").astype(np.int64)
+        self.size = n
+        self.fingerprint = fingerprint
+
+    def search(self, query: np.ndarray, k: int) -> np.ndarray:
+        nprobe = min(self.nprobe, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.rows[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+
+    def save(self, path: Path):
+        def write(temp_path: Path):
+            with open(temp_path, "wb") as f:
+                np.savez(
+                    f,
+                    centroids=self.centroids,
+                    offsets=self.offsets,
+                    rows=self.rows,
+                    meta=np.array(json.dumps({"kind": self.kind, "size": self.size, "fingerprint": self.fingerprint}))
+                )
+        self._write_atomic(path, write)
+
+    @classmethod
+    def load(cls, path: Path, nprobe: int = 8) -> "IVFIndex":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            index = cls(nlist=len(data["centroids"]), nprobe=nprobe)
+            index.centroids = data["centroids"]
+            index.offsets = data["offsets"]
+            index.rows = data["rows"]
+        index.size = meta["size"]
+        index.fingerprint = meta["fingerprint"]
+        return index
+
+
+class AnnoyAnnIndex(AnnIndex):
+    """Random-projection forest from Annoy; the saved file is memory-mapped on load"""
+
+    kind = "annoy"
+
+    def __init__(self, n_trees: int = 10, search_k: int = -1):
+        super().__init__()
+        self.n_trees = n_trees
+        self.search_k = search_k
+        self._index = None
+        self.dimension = 0
+
+    def build(self, vectors: np.ndarray, fingerprint: Optional[str] = None):
+        from annoy import AnnoyIndex
+
+        self.dimension = vectors.shape[1]
+        index = AnnoyIndex(self.dimension, "angular")
+        for row in range(len(vectors)):
+            index.add_item(row, vectors[row])
+        index.build(self.n_trees)
+        self._index = index
+        self.size = len(vectors)
+        self.fingerprint = fingerprint
+
+    def search(self, query: np.ndarray, k: int) -> np.ndarray:
+        return np.asarray(self._index.get_nns_by_vector(query, k, search_k=self.search_k), dtype=np.int64)
+
+    def save(self, path: Path):
+        self._write_atomic(path, lambda temp_path: self._index.save(str(temp_path)))
+        sidecar = {"kind": self.kind, "size": self.size, "dimension": self.dimension, "fingerprint": self.fingerprint}
+        self._write_atomic(path.with_suffix(".json"), lambda temp_path: temp_path.write_text(json.dumps(sidecar)))
+
+    @classmethod
+    def load(cls, path: Path, n_trees: int = 10, search_k: int = -1) -> "AnnoyAnnIndex":
+        from annoy import AnnoyIndex
+
+        meta = json.loads(path.with_suffix(".json").read_text())
+        index = cls(n_trees=n_trees, search_k=search_k)
+        index.dimension = meta["dimension"]
+        index._index = AnnoyIndex(index.dimension, "angular")
+        index._index.load(str(path))
+        index.size = meta["size"]
+        index.fingerprint = meta["fingerprint"]
+        return index
+
+
+class AnnIndexFactory:
+    """Builds and persists the ANN index kind selected in settings"""
+
+    SUFFIXES = {"ivf": ".ivf.npz", "annoy": ".ann"}
+
+    def __init__(self, kind: str = "ivf", min_rows: int = 20000, nprobe: int = 8, n_trees: int = 10, search_k: int = -1):
+        self.kind = (kind or "none").lower()
+        self.min_rows = min_rows
+        self.nprobe = nprobe
+        self.n_trees = n_trees
+        self.search_k = search_k
+
+        if self.kind == "annoy":
+            try:
+                import annoy  # noqa: F401
+            except ImportError:
+                print("Annoy is not installed; falling back to the IVF index")
+                self.kind = "ivf"
+
+    @property
+    def enabled(self) -> bool:
+        return self.kind in self.SUFFIXES
+
+    def wants_index(self, rows: int) -> bool:
+        return self.enabled and rows >= self.min_rows
+
+    def create(self) -> AnnIndex:
+        if self.kind == "annoy":
+            return AnnoyAnnIndex(n_trees=self.n_trees, search_k=self.search_k)
+        return IVFIndex(nprobe=self.nprobe)
+
+    def path_for(self, directory: Path, name: str) -> Path:
+        return directory / f"{name}{self.SUFFIXES[self.kind]}"
+
+    def load(self, directory: Path, name: str) -> Optional[AnnIndex]:
+        if not self.enabled:
+            return None
+        path = self.path_for(directory, name)
+        if not path.exists():
+            return None
+        try:
+            if self.kind == "annoy":
+                return AnnoyAnnIndex.load(path, n_trees=self.n_trees, search_k=self.search_k)
+            return IVFIndex.load(path, nprobe=self.nprobe)
+        except Exception as e:
+            print(f"Ignoring unreadable ANN index {path.name}: {e}")
+            return None
@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
+import asyncio
 from typing import List, Dict, Optional, Any, Tuple
 from langchain_core.documents import Document
+from app.services.vector_stores.search_hits import SearchHits
 
 class BaseVectorStore(ABC):
     @abstractmethod
@@ -8,8 +10,10 @@ class BaseVectorStore(ABC):
         self, 
         texts: List[str], 
         metadatas: List[Dict],
-        ids: Optional[List[str]] = None
+        ids: Optional[List[str]] = None,
+        embeddings: Optional[List[List[float]]] = None
     ) -> Tuple[List[str], bool]:
+        """Store texts; `embeddings`, when given, are their precomputed vectors and skip the embedding call"""
         pass
     
     @abstractmethod
@@ -21,6 +25,52 @@ class BaseVectorStore(ABC):
     ) -> List[tuple]:
         pass
     
+    async def asimilarity_search_batch(
+        self, 
+        queries: List[str], 
+        k: int = 10,
+        filter: Optional[Dict] = None
+    ) -> List[List[tuple]]:
+        """Top-k (document, score) lists for several queries; stores override this to embed and scan once"""
+        return list(await asyncio.gather(*[
+            self.asimilarity_search_with_score(query=query, k=k, filter=filter)
+            for query in queries
+        ]))
+    
+    async def asimilarity_search_hits_batch(
+        self, 
+        queries: List[str], 
+        k: int = 10,
+        filter: Optional[Dict] = None
+    ) -> List[SearchHits]:
+        """Top-k results in relevance order as SearchHits, so callers build Documents only for the rows they keep"""
+        results = await self.asimilarity_search_batch(queries, k=k, filter=filter)
+        return [SearchHits.from_documents(hits) for hits in results]
+    
+    async def amax_marginal_relevance_search_batch(
+        self, 
+        queries: List[str], 
+        k: int = 10,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict] = None
+    ) -> List[List[tuple]]:
+        """Diverse top-k per query in MMR order; stores without stored embeddings fall back to relevance order"""
+        results = await self.asimilarity_search_batch(queries, k=max(k, fetch_k), filter=filter)
+        return [hits[:k] for hits in results]
+    
+    async def amax_marginal_relevance_search_hits_batch(
+        self, 
+        queries: List[str], 
+        k: int = 10,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict] = None
+    ) -> List[SearchHits]:
+        """MMR results as SearchHits, so callers build Documents only for the rows they keep"""
+        results = await self.amax_marginal_relevance_search_batch(queries, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter)
+        return [SearchHits.from_documents(hits) for hits in results]
+    
     @abstractmethod
     def as_retriever(self, **kwargs) -> Any:
         pass
@@ -52,5 +102,28 @@ class BaseVectorStore(ABC):
     def has_cache(self, document_url: str) -> bool:
         return False
     
+    async def ahas_cache(self, document_url: str) -> bool:
+        return self.has_cache(document_url)
+    
+    async def aload_from_cache(self, document_url: str) -> bool:
+        return self.load_from_cache(document_url)
+    
     def clear_cache(self, document_url: Optional[str] = None) -> bool:
         return False
+    
+    def build_ann_index(self, document_id: Optional[str] = None) -> bool:
+        return False
+    
+    def begin_document(self, document_url: str, document_id: Optional[str] = None):
+        """Called before the first batch of a document is added; paired with finalize_document"""
+        pass
+    
+    def finalize_document(self, document_url: str, document_id: Optional[str] = None):
+        """Called once every batch of a document has been added"""
+        pass
+    
+    async def abegin_document(self, document_url: str, document_id: Optional[str] = None):
+        self.begin_document(document_url, document_id)
+    
+    async def afinalize_document(self, document_url: str, document_id: Optional[str] = None):
+        self.finalize_document(document_url, document_id)
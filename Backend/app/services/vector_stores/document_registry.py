@@ -0,0 +1,81 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple
+import threading
+import time
+
+
+class DocumentRegistry:
+    """
+    Local TTL cache over the table of fully ingested documents.
+
+    Each entry is one registry row: document_id, chunk_count, embedding_model
+    and ingested_at. Documents found to be missing are cached too, for the
+    shorter `negative_ttl_seconds`, so repeated checks for a document nobody
+    ingested do not rerun the lookup; a document ingested by another process
+    is seen once that expires. Expired entries are refetched and the oldest
+    ones are evicted past `max_entries`.
+    """
+
+    def __init__(self, ttl_seconds: int = 300, negative_ttl_seconds: int = 30, max_entries: int = 4096):
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Tuple[Optional[Dict[str, Any]], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def entry(document_id: str, chunk_count: int, embedding_model: str) -> Dict[str, Any]:
+        return {
+            "document_id": document_id,
+            "chunk_count": chunk_count,
+            "embedding_model": embedding_model,
+            "ingested_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def lookup(self, document_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """(known, entry): known is False when the registry must be queried; entry is None for a cached miss"""
+        with self._lock:
+            cached = self._entries.get(document_id)
+            if cached is not None:
+                ttl = self.ttl_seconds if cached[0] is not None else self.negative_ttl_seconds
+                if ttl > 0 and time.monotonic() - cached[1] >= ttl:
+                    cached = None
+            if cached is None:
+                self._entries.pop(document_id, None)
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(document_id)
+            self.hits += 1
+            return True, cached[0]
+
+    def _store(self, document_id: str, entry: Optional[Dict[str, Any]]):
+        with self._lock:
+            self._entries[document_id] = (entry, time.monotonic())
+            self._entries.move_to_end(document_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, entry: Dict[str, Any]):
+        self._store(entry["document_id"], entry)
+
+    def put_missing(self, document_id: str):
+        self._store(document_id, None)
+
+    def discard(self, document_id: Optional[str] = None):
+        with self._lock:
+            if document_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(document_id, None)
+
+    def get_stats(self) -> dict:
+        return {
+            "cached_documents": len(self._entries),
+            "ttl_seconds": self.ttl_seconds,
+            "negative_ttl_seconds": self.negative_ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
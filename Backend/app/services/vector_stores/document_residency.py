@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import threading
+
+
+class DocumentResidency:
+    """LRU bookkeeping of which cached documents currently have partitions loaded in memory"""
+
+    def __init__(self, max_documents: int = 32):
+        self.max_documents = max(1, max_documents)
+        self._entries: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, document_url: str) -> bool:
+        return document_url in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, document_url: str) -> Optional[List[str]]:
+        with self._lock:
+            partitions = self._entries.get(document_url)
+            if partitions is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(document_url)
+            self.hits += 1
+            return partitions
+
+    def touch(self, document_url: str, partitions: List[str]) -> List[Tuple[str, List[str]]]:
+        """Mark a document resident and return the (url, partitions) pairs evicted to stay in budget"""
+        with self._lock:
+            self._entries[document_url] = list(partitions)
+            self._entries.move_to_end(document_url)
+
+            evicted = []
+            while len(self._entries) > self.max_documents:
+                evicted.append(self._entries.popitem(last=False))
+
+            if evicted:
+                # Never hand back a partition another resident URL still points at
+                still_resident = {key for keys in self._entries.values() for key in keys}
+                evicted = [(url, [key for key in keys if key not in still_resident]) for url, keys in evicted]
+            return evicted
+
+    def discard(self, document_url: Optional[str] = None):
+        with self._lock:
+            if document_url is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(document_url, None)
+
+    def resident_urls(self) -> List[str]:
+        with self._lock:
+            return list(self._entries.keys())
+
+    def get_stats(self) -> dict:
+        return {
+            "resident_documents": len(self._entries),
+            "max_resident_documents": self.max_documents,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
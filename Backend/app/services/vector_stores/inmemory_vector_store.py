@@ -1,12 +1,15 @@
-from langchain_core.vectorstores import InMemoryVectorStore
 from app.services.vector_stores.base_vector_store import BaseVectorStore
+from app.services.vector_stores.matrix_vector_store import MatrixVectorStore
 from app.services.vector_stores.vector_store_cache import VectorStoreCache
+from app.services.vector_stores.document_residency import DocumentResidency
+from app.services.vector_stores.ann_index import AnnIndexFactory
+from app.services.vector_stores.search_hits import SearchHits
 from app.services.embedders.embedding_factory import get_embedding_model
 from app.services.embedders.langchain_wrapper import LangChainEmbeddingWrapper
 from typing import List, Dict, Optional, Any
 from langchain_core.documents import Document
 from app.config.settings import settings
-from pathlib import Path
+import asyncio
 import uuid
 
 class InMemoryVectorStoreService(BaseVectorStore):
@@ -19,11 +22,23 @@ class InMemoryVectorStoreService(BaseVectorStore):
         embedder = get_embedding_model(embedding_model)
         self.embeddings = LangChainEmbeddingWrapper(embedder)
         
-        self.vector_store = InMemoryVectorStore(embedding=self.embeddings)
+        self.ann_factory = self._create_ann_factory()
+        self.vector_store = MatrixVectorStore(
+            embedding=self.embeddings,
+            quantization=settings.INMEMORY_VECTOR_QUANTIZATION,
+            rescore_factor=settings.INMEMORY_RESCORE_FACTOR,
+            ann_factory=self.ann_factory,
+            compaction_ratio=settings.INMEMORY_COMPACTION_TOMBSTONE_RATIO
+        )
         
         self.store_type = "inmemory"
         
-        self.cache_manager = VectorStoreCache()
+        self.cache_manager = VectorStoreCache.shared()
+        
+        # Documents whose partitions are already loaded; warm cache hits never touch disk
+        self.residency = DocumentResidency(max_documents=settings.INMEMORY_MAX_RESIDENT_DOCUMENTS)
+        # Documents between begin_document and their first cached batch
+        self._fresh_documents = set()
         
         print("Initialized InMemory vector store with caching support")
     
@@ -31,15 +46,18 @@ class InMemoryVectorStoreService(BaseVectorStore):
         self, 
         texts: List[str], 
         metadatas: List[Dict],
-        ids: Optional[List[str]] = None
+        ids: Optional[List[str]] = None,
+        embeddings: Optional[List[List[float]]] = None
     ) -> tuple[List[str], bool]:
         if not ids:
             ids = [str(uuid.uuid4()) for _ in texts]
         
-        # Extract source URL for potential caching after successful addition
+        # Extract source URL and document partition for potential caching after successful addition
         source_url = None
+        document_id = None
         if metadatas and len(metadatas) > 0:
             source_url = metadatas[0].get("source")
+            document_id = metadatas[0].get("document_id")
         
         print(f"Adding {len(texts)} documents to InMemory vector store...")
         
@@ -49,12 +67,14 @@ class InMemoryVectorStoreService(BaseVectorStore):
                 for doc_id, text, metadata in zip(ids, texts, metadatas)
             ]
             
-            added_ids = self.vector_store.add_documents(documents)
+            added_ids = self.vector_store.add_documents(documents, embeddings=embeddings)
             
-            # Save to cache if we have a source URL and successfully added documents
+            # Persist only this batch if we have a source URL and successfully added documents
             if source_url and added_ids:
                 try:
-                    self.save_to_cache(source_url)
+                    # The first batch after begin_document replaces whatever was cached for the document
+                    self.append_to_cache(source_url, added_ids, document_id=document_id, reset=source_url in self._fresh_documents)
+                    self._fresh_documents.discard(source_url)
                     print(f"Cached vector store for future use: {source_url[:50]}...")
                 except Exception as cache_error:
                     print(f"Warning: Failed to cache vector store: {cache_error}")
@@ -76,7 +96,8 @@ class InMemoryVectorStoreService(BaseVectorStore):
         try:
             results = self.vector_store.similarity_search_with_score(
                 query=query, 
-                k=k
+                k=k,
+                filter=filter
             )
             return results
             
@@ -99,7 +120,7 @@ class InMemoryVectorStoreService(BaseVectorStore):
     
     def get_document_count(self) -> int:
         try:
-            count = len(self.vector_store.store)
+            count = len(self.vector_store)
             return count
             
         except Exception as e:
@@ -108,9 +129,8 @@ class InMemoryVectorStoreService(BaseVectorStore):
     
     def delete_all_documents(self) -> bool:
         try:
-            all_ids = list(self.vector_store.store.keys())
-            if all_ids:
-                self.vector_store.delete(ids=all_ids)
+            self.vector_store.clear()
+            self.residency.discard()
             
             print(f"Deleted all documents from InMemory vector store")
             return True
@@ -123,15 +143,18 @@ class InMemoryVectorStoreService(BaseVectorStore):
         self, 
         texts: List[str], 
         metadatas: List[Dict],
-        ids: Optional[List[str]] = None
+        ids: Optional[List[str]] = None,
+        embeddings: Optional[List[List[float]]] = None
     ) -> tuple[List[str], bool]:
         if not ids:
             ids = [str(uuid.uuid4()) for _ in texts]
         
-        # Extract source URL for potential caching after successful addition
+        # Extract source URL and document partition for potential caching after successful addition
         source_url = None
+        document_id = None
         if metadatas and len(metadatas) > 0:
             source_url = metadatas[0].get("source")
+            document_id = metadatas[0].get("document_id")
         
         print(f"Adding {len(texts)} documents to InMemory vector store (async)...")
         
@@ -141,12 +164,14 @@ class InMemoryVectorStoreService(BaseVectorStore):
                 for doc_id, text, metadata in zip(ids, texts, metadatas)
             ]
             
-            added_ids = await self.vector_store.aadd_documents(documents)
+            added_ids = await self.vector_store.aadd_documents(documents, embeddings=embeddings)
             
-            # Save to cache if we have a source URL and successfully added documents
+            # Persist only this batch if we have a source URL and successfully added documents
             if source_url and added_ids:
                 try:
-                    self.save_to_cache(source_url)
+                    # The first batch after begin_document replaces whatever was cached for the document
+                    self.append_to_cache(source_url, added_ids, document_id=document_id, reset=source_url in self._fresh_documents)
+                    self._fresh_documents.discard(source_url)
                     print(f"Cached vector store for future use: {source_url[:50]}...")
                 except Exception as cache_error:
                     print(f"Warning: Failed to cache vector store: {cache_error}")
@@ -169,7 +194,8 @@ class InMemoryVectorStoreService(BaseVectorStore):
         try:
             results = await self.vector_store.asimilarity_search(
                 query=query, 
-                k=k
+                k=k,
+                filter=filter
             )
             return results
             
@@ -186,7 +212,8 @@ class InMemoryVectorStoreService(BaseVectorStore):
         try:
             results = await self.vector_store.asimilarity_search_with_score(
                 query=query, 
-                k=k
+                k=k,
+                filter=filter
             )
             return results
             
@@ -194,6 +221,82 @@ class InMemoryVectorStoreService(BaseVectorStore):
             print(f"Error during similarity search with score: {e}")
             return []
     
+    async def asimilarity_search_batch(
+        self, 
+        queries: List[str], 
+        k: int = 10,
+        filter: Optional[Dict] = None
+    ) -> List[List[tuple]]:
+        try:
+            return await self.vector_store.asimilarity_search_batch(
+                queries=queries, 
+                k=k,
+                filter=filter
+            )
+            
+        except Exception as e:
+            print(f"Error during batched similarity search: {e}")
+            return [[] for _ in queries]
+    
+    async def asimilarity_search_hits_batch(
+        self, 
+        queries: List[str], 
+        k: int = 10,
+        filter: Optional[Dict] = None
+    ) -> List[SearchHits]:
+        try:
+            return await self.vector_store.asimilarity_search_hits_batch(
+                queries=queries, 
+                k=k,
+                filter=filter
+            )
+            
+        except Exception as e:
+            print(f"Error during batched similarity search: {e}")
+            return [SearchHits.empty() for _ in queries]
+    
+    async def amax_marginal_relevance_search_batch(
+        self, 
+        queries: List[str], 
+        k: int = 10,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict] = None
+    ) -> List[List[tuple]]:
+        try:
+            return await self.vector_store.amax_marginal_relevance_search_batch(
+                queries=queries, 
+                k=k,
+                fetch_k=fetch_k,
+                lambda_mult=lambda_mult,
+                filter=filter
+            )
+            
+        except Exception as e:
+            print(f"Error during batched MMR search: {e}")
+            return [[] for _ in queries]
+    
+    async def amax_marginal_relevance_search_hits_batch(
+        self, 
+        queries: List[str], 
+        k: int = 10,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict] = None
+    ) -> List[SearchHits]:
+        try:
+            return await self.vector_store.amax_marginal_relevance_search_hits_batch(
+                queries=queries, 
+                k=k,
+                fetch_k=fetch_k,
+                lambda_mult=lambda_mult,
+                filter=filter
+            )
+            
+        except Exception as e:
+            print(f"Error during batched MMR search: {e}")
+            return [SearchHits.empty() for _ in queries]
+    
     async def adelete_documents(
         self, 
         ids: List[str]
@@ -209,7 +312,7 @@ class InMemoryVectorStoreService(BaseVectorStore):
     
     async def aget_document_count(self) -> int:
         try:
-            count = len(self.vector_store.store)
+            count = len(self.vector_store)
             return count
             
         except Exception as e:
@@ -218,9 +321,8 @@ class InMemoryVectorStoreService(BaseVectorStore):
     
     async def adelete_all_documents(self) -> bool:
         try:
-            all_ids = list(self.vector_store.store.keys())
-            if all_ids:
-                await self.vector_store.adelete(ids=all_ids)
+            self.vector_store.clear()
+            self.residency.discard()
             
             print(f"Deleted all documents from InMemory vector store (async)")
             return True
@@ -232,9 +334,9 @@ class InMemoryVectorStoreService(BaseVectorStore):
     def as_retriever(self, **kwargs) -> Any:
         return self.vector_store.as_retriever(**kwargs)
     
-    def dump_to_file(self, file_path: str) -> bool:
+    def dump_to_file(self, file_path: str, document_id: Optional[str] = None) -> bool:
         try:
-            self.vector_store.dump(file_path)
+            self.vector_store.dump(file_path, document_id=document_id)
             print(f"Dumped vector store to: {file_path}")
             return True
         except Exception as e:
@@ -247,13 +349,25 @@ class InMemoryVectorStoreService(BaseVectorStore):
             embedder = get_embedding_model(embedding_model)
             embeddings = LangChainEmbeddingWrapper(embedder)
             
-            vector_store = InMemoryVectorStore.load(file_path, embedding=embeddings)
+            ann_factory = cls._create_ann_factory()
+            vector_store = MatrixVectorStore.load(
+                file_path,
+                embedding=embeddings,
+                quantization=settings.INMEMORY_VECTOR_QUANTIZATION,
+                rescore_factor=settings.INMEMORY_RESCORE_FACTOR,
+                ann_factory=ann_factory,
+                compaction_ratio=settings.INMEMORY_COMPACTION_TOMBSTONE_RATIO
+            )
             
             service = cls.__new__(cls)
             service.embedding_model = embedding_model
             service.embeddings = embeddings
+            service.ann_factory = ann_factory
             service.vector_store = vector_store
             service.store_type = "inmemory"
+            service.cache_manager = VectorStoreCache.shared()
+            service.residency = DocumentResidency(max_documents=settings.INMEMORY_MAX_RESIDENT_DOCUMENTS)
+            service._fresh_documents = set()
             
             print(f"Loaded vector store from: {file_path}")
             return service
@@ -263,22 +377,101 @@ class InMemoryVectorStoreService(BaseVectorStore):
             raise
     
     def get_temp_dump_path(self) -> str:
-        cache_dir = Path("vector_store_cache")
-        cache_dir.mkdir(exist_ok=True)
-        temp_file = f"temp_vector_store_{uuid.uuid4().hex[:8]}.vs"
-        return str(cache_dir / temp_file)
+        # Named so the cache's startup sweep can reclaim dumps left by killed ingestions
+        return str(self.cache_manager.get_temp_dump_path())
     
     def supports_caching(self) -> bool:
         return True
     
+    @staticmethod
+    def _create_ann_factory() -> AnnIndexFactory:
+        return AnnIndexFactory(
+            kind=settings.VECTOR_ANN_INDEX,
+            min_rows=settings.VECTOR_ANN_MIN_ROWS,
+            nprobe=settings.VECTOR_ANN_NPROBE,
+            n_trees=settings.VECTOR_ANN_TREES,
+            search_k=settings.VECTOR_ANN_SEARCH_K
+        )
+    
+    def build_ann_index(self, document_id: Optional[str] = None) -> bool:
+        partitions = [document_id] if document_id is not None else list(self.vector_store.partitions)
+        built = [p for p in partitions if self.vector_store.build_ann_index(p) is not None]
+        return len(built) > 0
+    
+    def _attach_ann_indexes(self, document_url: str, partitions: List[str]):
+        """Reuse ANN indexes persisted with the cache entry; missing ones are built in the background and saved"""
+        for partition in partitions:
+            index = self.vector_store.partitions.get(partition)
+            if index is None or not self.ann_factory.wants_index(len(index)):
+                continue
+            ann = self.cache_manager.load_ann(document_url, partition, self.ann_factory)
+            if ann is not None and self.vector_store.attach_ann(partition, ann):
+                continue
+            self.vector_store.schedule_ann_build(
+                partition,
+                on_built=lambda ann, partition=partition: self.cache_manager.save_ann(document_url, partition, ann, self.ann_factory)
+            )
+    
+    def _mark_resident(self, document_url: str, partitions: List[str]):
+        with self.vector_store.writing():
+            for evicted_url, evicted_partitions in self.residency.touch(document_url, partitions):
+                for partition in evicted_partitions:
+                    self.vector_store.drop_partition(partition)
+                print(f"Evicted resident vector store for: {evicted_url[:50]}...")
+    
+    def _attach_from_cache(self, document_url: str):
+        """
+        Replace the document's partitions with the cached snapshot's read-only mappings.
+        
+        The swap happens inside one writing() block: concurrent searches keep
+        reading the previous partitions and see the new ones only once complete.
+        """
+        segments = self.cache_manager.load_segments(document_url) or []
+        with self.vector_store.writing():
+            for partition in {key for segment in segments for key in MatrixVectorStore.partition_keys(segment.metadatas)}:
+                self.vector_store.drop_partition(partition)
+            partitions = set()
+            for segment in segments:
+                partitions.update(self.vector_store.add_segment(segment))
+            self._attach_ann_indexes(document_url, sorted(partitions))
+            self._mark_resident(document_url, sorted(partitions))
+    
+    def begin_document(self, document_url: str, document_id: Optional[str] = None):
+        """Start a fresh ingestion: the next cached batch resets the document's cache entry instead of appending"""
+        self._fresh_documents.add(document_url)
+    
+    def finalize_document(self, document_url: str, document_id: Optional[str] = None):
+        """
+        Publish a fully ingested document as one shared snapshot.
+        
+        The private rows built during ingestion are swapped for the compacted
+        cache mapping, so this worker and any other that loads the document
+        read the same physical pages.
+        """
+        self._fresh_documents.discard(document_url)
+        try:
+            if not self.cache_manager.has_cached_store(document_url):
+                return
+            self.cache_manager.compact(document_url)
+            self._attach_from_cache(document_url)
+        except Exception as e:
+            print(f"Failed to publish cached snapshot for {document_url[:50]}...: {e}")
+    
+    async def afinalize_document(self, document_url: str, document_id: Optional[str] = None):
+        await asyncio.to_thread(self.finalize_document, document_url, document_id)
+    
     def load_from_cache(self, document_url: str) -> bool:
         try:
+            if self._is_resident(document_url):
+                print(f"Vector store already resident for: {document_url[:50]}...")
+                # Warm hits must count for LRU eviction and cold tiering too
+                self.cache_manager.touch(document_url)
+                return True
+            
             cached_path = self.cache_manager.get_cache_path(document_url)
             if cached_path:
                 print(f"Loading cached vector store for: {document_url[:50]}...")
-                
-                self.vector_store = InMemoryVectorStore.load(cached_path, embedding=self.embeddings)
-                
+                self._attach_from_cache(document_url)
                 print("Successfully loaded cached vector store")
                 return True
             return False
@@ -286,19 +479,74 @@ class InMemoryVectorStoreService(BaseVectorStore):
             print(f"Failed to load cached vector store: {e}")
             return False
     
-    def save_to_cache(self, document_url: str) -> bool:
+    def save_to_cache(self, document_url: str, document_id: Optional[str] = None) -> bool:
         try:
-            temp_path = self.get_temp_dump_path()
-            if self.dump_to_file(temp_path):
-                success = self.cache_manager.cache_vector_store(document_url, temp_path)
-                if success:
-                    print("Successfully cached vector store for future use")
-                return success
-            return False
+            # Write the whole partition as a single binary snapshot, replacing any earlier segments
+            success = self.cache_manager.append_segment(
+                document_url,
+                self.vector_store.export_segment(document_id=document_id),
+                reset=True
+            )
+            if success:
+                if document_id is not None:
+                    self._mark_resident(document_url, [document_id])
+                print("Successfully cached vector store for future use")
+            return success
         except Exception as e:
             print(f"Failed to cache vector store: {e}")
             return False
     
+    def append_to_cache(self, document_url: str, ids: List[str], document_id: Optional[str] = None, reset: bool = False) -> bool:
+        try:
+            success = self.cache_manager.append_segment(
+                document_url,
+                self.vector_store.export_segment(ids=ids),
+                reset=reset
+            )
+            if success and document_id is not None:
+                self._mark_resident(document_url, [document_id])
+            return success
+        except Exception as e:
+            print(f"Failed to append to vector store cache: {e}")
+            return False
+    
+    def _is_resident(self, document_url: str) -> bool:
+        """Resident only while every partition recorded for the document is still loaded"""
+        partitions = self.residency.get(document_url)
+        return partitions is not None and all(self.vector_store.has_partition(p) for p in partitions)
+    
     def has_cache(self, document_url: str) -> bool:
+        if self._is_resident(document_url):
+            return True
         return self.cache_manager.has_cached_store(document_url)
     
+    async def ahas_cache(self, document_url: str) -> bool:
+        return await asyncio.to_thread(self.has_cache, document_url)
+    
+    async def aload_from_cache(self, document_url: str) -> bool:
+        # Cold archives are promoted and segment files mapped here, so keep it off the event loop
+        return await asyncio.to_thread(self.load_from_cache, document_url)
+    
+    def clear_cache(self, document_url: Optional[str] = None) -> bool:
+        # Release the rows too; once residency forgets them nothing else would evict them
+        if document_url is None:
+            self.vector_store.clear()
+        else:
+            for partition in self.residency.get(document_url) or []:
+                self.vector_store.drop_partition(partition)
+        self.residency.discard(document_url)
+        self.cache_manager.clear_cache(document_url)
+        return True
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return {
+            "disk": self.cache_manager.get_cache_stats(),
+            "embeddings": self.embeddings.get_cache_stats(),
+            "memory": {
+                **self.residency.get_stats(),
+                "quantization": self.vector_store.quantization,
+                "resident_vector_mb": round(self.vector_store.resident_bytes / (1024 * 1024), 2),
+                "shared_vector_mb": round(self.vector_store.mapped_bytes / (1024 * 1024), 2),
+            },
+        }
+    
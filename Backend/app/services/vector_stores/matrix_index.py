@@ -0,0 +1,434 @@
+from typing import List, Dict, Optional, Tuple
+import mmap
+import numpy as np
+from app.services.vector_stores.scalar_quantizer import ScalarQuantizer
+from app.services.vector_stores.ann_index import AnnIndex, rows_fingerprint
+from app.services.vector_stores.metadata_columns import MetadataColumns
+
+
+class MatrixIndex:
+    """
+    Row-aligned records over one contiguous float32 matrix of L2-normalized embeddings.
+
+    With quantization enabled, searches scan compact codes kept alongside the
+    matrix and only the best `k * rescore_factor` candidates are rescored in
+    full precision, so the float32 matrix can stay a read-only memory mapping.
+    An attached ANN index proposes candidates for the rows it was built over;
+    rows appended since are always scanned.
+
+    Deletes only tombstone rows: searches skip them, row numbers stay stable
+    (so an ANN index survives), and re-adding an id tombstones the old row and
+    appends the new one. compact() rewrites the live rows once enough
+    tombstones pile up.
+
+    Every mutation ends by publishing a new IndexSnapshot. Published row blocks
+    and lists are never written again: appends land past the snapshot's size,
+    and compaction builds fresh arrays.
+    """
+
+    def __init__(
+        self,
+        dimension: Optional[int] = None,
+        initial_capacity: int = 256,
+        quantization: str = "none",
+        rescore_factor: int = 4
+    ):
+        self.dimension = dimension
+        self.initial_capacity = initial_capacity
+        self._matrix: Optional[np.ndarray] = None
+        self._size = 0
+
+        self.quantizer = ScalarQuantizer(quantization)
+        self.rescore_factor = max(1, rescore_factor)
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self.ann: Optional[AnnIndex] = None
+
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas = MetadataColumns()
+        self._row_by_id: Dict[str, int] = {}
+        self._dead = np.empty(0, dtype=np.int64)
+        self.snapshot = IndexSnapshot(self)
+
+    def __len__(self) -> int:
+        return self._size - len(self._dead)
+
+    @property
+    def tombstone_ratio(self) -> float:
+        return len(self._dead) / self._size if self._size else 0.0
+
+    def live_ids(self) -> List[str]:
+        return list(self._row_by_id)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self._matrix is None:
+            return np.empty((0, self.dimension or 0), dtype=np.float32)
+        return self._matrix[:self._size]
+
+    @property
+    def codes(self) -> Optional[np.ndarray]:
+        return self._codes[:self._size] if self._codes is not None else None
+
+    @property
+    def scales(self) -> Optional[np.ndarray]:
+        return self._scales[:self._size] if self._scales is not None else None
+
+    @staticmethod
+    def is_mapped(array: np.ndarray) -> bool:
+        """True when the array is a view onto a memory-mapped file (np.asarray drops the memmap type)"""
+        base = array
+        while base is not None:
+            if isinstance(base, (np.memmap, mmap.mmap)):
+                return True
+            base = getattr(base, "base", None)
+        return False
+
+    @property
+    def resident_bytes(self) -> int:
+        """Bytes of vector data held in process memory; memory-mapped blocks are not counted"""
+        arrays = (self._matrix, self._codes, self._scales)
+        return sum(a.nbytes for a in arrays if a is not None and not self.is_mapped(a))
+
+    @property
+    def mapped_bytes(self) -> int:
+        """Bytes served straight from shared, read-only snapshot mappings"""
+        arrays = (self._matrix, self._codes, self._scales)
+        return sum(a.nbytes for a in arrays if a is not None and self.is_mapped(a))
+
+    @staticmethod
+    def normalize(vectors) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    @staticmethod
+    def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices and values of the k largest scores, best first, via partial sort"""
+        n = scores.shape[0]
+        if k <= 0 or n == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if k >= n:
+            order = np.argsort(-scores, kind="stable")
+        else:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+            order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return order, scores[order]
+
+    @staticmethod
+    def mmr_order(query_scores: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float = 0.5) -> np.ndarray:
+        """
+        Greedy maximal-marginal-relevance selection over normalized candidate vectors.
+
+        The candidate-to-candidate similarity matrix is computed once; each step
+        then only updates a running max-redundancy vector.
+        """
+        n = len(query_scores)
+        k = min(k, n)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        pairwise = candidates @ candidates.T
+        relevance = lambda_mult * np.asarray(query_scores, dtype=np.float32)
+        selected = [int(np.argmax(query_scores))]
+        redundancy = pairwise[selected[0]].copy()
+        available = np.ones(n, dtype=bool)
+        available[selected[0]] = False
+
+        while len(selected) < k:
+            marginal = relevance - (1 - lambda_mult) * redundancy
+            marginal[~available] = -np.inf
+            choice = int(np.argmax(marginal))
+            selected.append(choice)
+            available[choice] = False
+            np.maximum(redundancy, pairwise[choice], out=redundancy)
+
+        return np.array(selected, dtype=np.int64)
+
+    @staticmethod
+    def _grown(array: Optional[np.ndarray], size: int, capacity: int, shape: tuple, dtype) -> np.ndarray:
+        grown = np.empty((capacity,) + shape, dtype=dtype)
+        if size:
+            grown[:size] = array[:size]
+        return grown
+
+    def _reserve(self, extra: int):
+        required = self._size + extra
+        arrays = [self._matrix]
+        if self.quantizer.enabled:
+            arrays.append(self._codes)
+            if self.quantizer.uses_scales:
+                arrays.append(self._scales)
+        if all(a is not None and required <= a.shape[0] and a.flags.writeable for a in arrays):
+            return
+
+        capacity = max(self.initial_capacity, required)
+        if self._matrix is not None:
+            # Grow geometrically so repeated batch appends stay amortized O(1) per row
+            capacity = max(capacity, self._matrix.shape[0] * 2)
+
+        self._matrix = self._grown(self._matrix, self._size, capacity, (self.dimension,), np.float32)
+        if self.quantizer.enabled:
+            self._codes = self._grown(self._codes, self._size, capacity, (self.dimension,), self.quantizer.code_dtype)
+            if self.quantizer.uses_scales:
+                self._scales = self._grown(self._scales, self._size, capacity, (), np.float32)
+
+    @property
+    def ann_stale(self) -> bool:
+        """True when there is no ANN index or too many rows were appended since it was built"""
+        return self.ann is None or (self._size - self.ann.size) > self.ann.size // 4
+
+    def fingerprint(self) -> str:
+        return rows_fingerprint(self.ids)
+
+    def attach_ann(self, ann: AnnIndex) -> bool:
+        """Use a prebuilt index only if it was built over this exact row order"""
+        if ann.size > self._size or ann.fingerprint != rows_fingerprint(self.ids[:ann.size]):
+            return False
+        self.ann = ann
+        self._publish()
+        return True
+
+    def _publish(self):
+        # A single reference assignment, so readers see either the old rows or all of the new ones
+        self.snapshot = IndexSnapshot(self)
+
+    def _encode(self, vectors: np.ndarray, codes: Optional[np.ndarray], scales: Optional[np.ndarray]):
+        """Reuse precomputed codes when they match this index's mode, otherwise quantize"""
+        if codes is not None and codes.dtype == self.quantizer.code_dtype and (scales is not None) == self.quantizer.uses_scales:
+            return codes, scales
+        return self.quantizer.encode(vectors)
+
+    def add(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas,
+        embeddings,
+        normalized: bool = False,
+        codes: Optional[np.ndarray] = None,
+        scales: Optional[np.ndarray] = None
+    ) -> List[str]:
+        if not ids:
+            return []
+
+        vectors = np.asarray(embeddings, dtype=np.float32) if normalized else self.normalize(embeddings)
+        if len(vectors) != len(ids):
+            raise ValueError(f"Got {len(vectors)} embeddings for {len(ids)} ids")
+
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {self.dimension}")
+
+        if self.quantizer.enabled:
+            codes, scales = self._encode(vectors, codes, scales)
+        metadatas = MetadataColumns.coerce(metadatas)
+
+        if self._size == 0 and normalized and len(set(ids)) == len(ids):
+            # Attach the block as-is; a memory-mapped snapshot stays zero-copy until written to
+            self._matrix = vectors
+            if self.quantizer.enabled:
+                self._codes, self._scales = codes, scales
+            self._size = len(ids)
+            self.ids = list(ids)
+            self.texts = list(texts)
+            self.metadatas = metadatas.view()
+            self._row_by_id = {doc_id: row for row, doc_id in enumerate(self.ids)}
+            self._publish()
+            return list(ids)
+
+        # Same semantics as the LangChain store: re-adding an id replaces it, and the last copy in a batch wins
+        latest = {doc_id: position for position, doc_id in enumerate(ids)}
+        new_rows = sorted(latest.values())
+        replaced = [self._row_by_id[ids[p]] for p in new_rows if ids[p] in self._row_by_id]
+
+        self._reserve(len(new_rows))
+        start = self._size
+        self._matrix[start:start + len(new_rows)] = vectors[new_rows]
+        if self.quantizer.enabled:
+            self._codes[start:start + len(new_rows)] = codes[new_rows]
+            if self.quantizer.uses_scales:
+                self._scales[start:start + len(new_rows)] = scales[new_rows]
+        for offset, position in enumerate(new_rows):
+            self._row_by_id[ids[position]] = start + offset
+        # New list objects: the published snapshot keeps the old ones untouched
+        self.ids = self.ids + [ids[p] for p in new_rows]
+        self.texts = self.texts + [texts[p] for p in new_rows]
+        # Metadata codes are appended past the snapshot's rows, which it never reads
+        self.metadatas.extend(metadatas if len(new_rows) == len(ids) else metadatas.take(new_rows))
+        self._size += len(new_rows)
+        if replaced:
+            self._dead = np.union1d(self._dead, replaced)
+
+        self._publish()
+        return list(ids)
+
+    def search(self, query_vector, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.snapshot.search(query_vector, k)
+
+    def search_many(self, query_vectors, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        return self.snapshot.search_many(query_vectors, k)
+
+    def delete(self, ids: List[str]) -> int:
+        """Tombstone rows; cost is proportional to the ids deleted, not to the index"""
+        rows = [self._row_by_id.pop(doc_id) for doc_id in ids if doc_id in self._row_by_id]
+        if not rows:
+            return 0
+        self._dead = np.union1d(self._dead, rows)
+        self._publish()
+        return len(rows)
+
+    def prepare_compaction(self) -> Tuple["IndexSnapshot", dict]:
+        """Copy the live rows of the current snapshot; safe to run without holding any lock"""
+        snapshot = self.snapshot
+        live = snapshot.live_rows()
+        state = {
+            "matrix": np.array(snapshot.vectors[live], dtype=np.float32),
+            "codes": np.array(snapshot.codes[live]) if snapshot.codes is not None else None,
+            "scales": np.array(snapshot.scales[live]) if snapshot.scales is not None else None,
+            "ids": [snapshot.ids[row] for row in live],
+            "texts": [snapshot.texts[row] for row in live],
+            "metadatas": snapshot.metadatas.take(live),
+        }
+        return snapshot, state
+
+    def install_compaction(self, prepared: Tuple["IndexSnapshot", dict]) -> bool:
+        """Swap in prepared rows unless the index changed since they were copied"""
+        source, state = prepared
+        if self.snapshot is not source:
+            return False
+        self._matrix = state["matrix"]
+        self._codes = state["codes"]
+        self._scales = state["scales"]
+        self.ids = state["ids"]
+        self.texts = state["texts"]
+        self.metadatas = state["metadatas"]
+        self._size = len(self.ids)
+        self._row_by_id = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self._dead = np.empty(0, dtype=np.int64)
+        # Row numbers changed, so any ANN index no longer applies
+        self.ann = None
+        self._publish()
+        return True
+
+    def compact(self) -> bool:
+        if not len(self._dead):
+            return False
+        return self.install_compaction(self.prepare_compaction())
+
+    def row_of(self, doc_id: str) -> Optional[int]:
+        return self._row_by_id.get(doc_id)
+
+    def clear(self):
+        self.ann = None
+        self._matrix = None
+        self._codes = None
+        self._scales = None
+        self._size = 0
+        self.ids = []
+        self.texts = []
+        self.metadatas = MetadataColumns()
+        self._row_by_id = {}
+        self._dead = np.empty(0, dtype=np.int64)
+        self._publish()
+
+
+class IndexSnapshot:
+    """
+    Read-only view of a MatrixIndex as of its last completed mutation.
+
+    Queries capture one snapshot and run entirely against it, so they never
+    take a lock and never observe a half-applied batch, overwrite or delete.
+    Tombstoned rows (`dead`) are scored -inf and never returned.
+    """
+
+    __slots__ = ("size", "dead", "vectors", "codes", "scales", "ids", "texts", "metadatas", "ann", "quantizer", "rescore_factor")
+
+    def __init__(self, index: MatrixIndex):
+        self.size = index._size
+        self.dead = index._dead
+        self.vectors = index.vectors
+        self.codes = index.codes
+        self.scales = index.scales
+        self.ids = index.ids
+        self.texts = index.texts
+        self.metadatas = index.metadatas.view(index._size)
+        self.ann = index.ann
+        self.quantizer = index.quantizer
+        self.rescore_factor = index.rescore_factor
+
+    def __len__(self) -> int:
+        return self.size - len(self.dead)
+
+    def live_rows(self) -> np.ndarray:
+        if not len(self.dead):
+            return np.arange(self.size)
+        return np.setdiff1d(np.arange(self.size), self.dead, assume_unique=True)
+
+    @property
+    def ann_stale(self) -> bool:
+        return self.ann is None or (self.size - self.ann.size) > self.ann.size // 4
+
+    def fingerprint(self) -> str:
+        return rows_fingerprint(self.ids)
+
+    def _top_live(self, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """top_k over scores where tombstoned rows were set to -inf, dropping any that still surface"""
+        rows, top = MatrixIndex.top_k(scores, k)
+        if len(self.dead) and len(top) and not np.isfinite(top[-1]):
+            keep = np.isfinite(top)
+            rows, top = rows[keep], top[keep]
+        return rows, top
+
+    def search(self, query_vector, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Cosine top-k as (rows, scores) using one matrix-vector product"""
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = MatrixIndex.normalize(query_vector)[0]
+
+        candidates = k * self.rescore_factor
+        if candidates >= self.size or not (self.ann is not None or self.quantizer.enabled):
+            scores = self.vectors @ query
+            scores[self.dead] = -np.inf
+            return self._top_live(scores, k)
+
+        if self.ann is not None:
+            proposed = self.ann.search(query, candidates)
+            shortlist = np.union1d(proposed, np.arange(self.ann.size, self.size))
+            shortlist = np.setdiff1d(shortlist, self.dead, assume_unique=True)
+            if len(shortlist) >= k:
+                exact = self.vectors[shortlist] @ query
+                order, scores = MatrixIndex.top_k(exact, k)
+                return shortlist[order], scores
+            if not self.quantizer.enabled:
+                scores = self.vectors @ query
+                scores[self.dead] = -np.inf
+                return self._top_live(scores, k)
+
+        # First pass on the compact codes, then exact scores for the shortlist only
+        approximate = self.quantizer.scores(self.codes, self.scales, query)
+        approximate[self.dead] = -np.inf
+        shortlist, _ = MatrixIndex.top_k(approximate, candidates)
+        shortlist = np.setdiff1d(shortlist, self.dead)
+        exact = self.vectors[shortlist] @ query
+        order, scores = MatrixIndex.top_k(exact, k)
+        return shortlist[order], scores
+
+    def search_many(self, query_vectors, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Cosine top-k for several queries; the exact path is a single matrix-matrix product"""
+        queries = MatrixIndex.normalize(query_vectors)
+        if len(self) == 0:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+
+        if k * self.rescore_factor < self.size and (self.ann is not None or self.quantizer.enabled):
+            # Shortlisting is per query; each search still skips the full float32 scan
+            return [self.search(query, k) for query in queries]
+
+        scores = self.vectors @ queries.T
+        scores[self.dead] = -np.inf
+        return [self._top_live(scores[:, column], k) for column in range(len(queries))]
@@ -0,0 +1,730 @@
+from langchain_core.vectorstores import VectorStore
+from langchain_core.embeddings import Embeddings
+from langchain_core.documents import Document
+from app.services.vector_stores.matrix_index import MatrixIndex, IndexSnapshot
+from app.services.vector_stores.vector_segment import VectorSegment
+from app.services.vector_stores.metadata_columns import MetadataColumns
+from app.services.vector_stores.search_hits import SearchHits
+from app.services.vector_stores.ann_index import AnnIndex, AnnIndexFactory
+from typing import List, Dict, Optional, Any, Callable, Sequence, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+import threading
+import json
+import uuid
+
+
+class MatrixVectorStore(VectorStore):
+    """
+    Drop-in replacement for LangChain's InMemoryVectorStore.
+
+    Embeddings live pre-normalized in float32 matrices, so a query is one
+    matrix-vector product plus a partial sort instead of a Python loop over a dict.
+    Rows are partitioned by their metadata document_id: a {"document_id": ...}
+    filter only scores that document's matrix, while unfiltered searches merge
+    the per-partition top-k into a corpus-wide result.
+    The dump format is the same JSON layout InMemoryVectorStore writes, so existing
+    .vs cache files keep loading.
+    Metadata is held in MetadataColumns (dictionary-encoded per key) and a
+    result's metadata dict is only built when its Document is returned.
+    With `quantization` set to "int8" or "float16" each partition scans compact
+    codes first and rescores a shortlist against the float32 vectors.
+    Given an AnnIndexFactory, partitions past its row threshold get an ANN index
+    (built on the background executor after their first search, or attached
+    from the cache) and smaller ones keep the exact scan; searches never wait
+    for a build and scan exactly until the index is attached.
+
+    Readers never lock: every search captures `snapshot`, an immutable
+    {document_id: IndexSnapshot} map, and runs against it. Writers serialize on
+    a lock, mutate the partitions privately and publish a new map with one
+    reference assignment when the outermost `writing()` block exits, so a
+    multi-step change such as swapping in a cached document becomes visible
+    all at once.
+
+    Deletes and overwrites tombstone rows, so updating a document costs the
+    rows changed. Once a partition's dead fraction reaches `compaction_ratio`
+    a background thread copies its live rows from a snapshot and swaps them in
+    under the write lock; readers keep the old snapshot meanwhile.
+    """
+
+    DEFAULT_PARTITION = ""
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        quantization: str = "none",
+        rescore_factor: int = 4,
+        ann_factory: Optional[AnnIndexFactory] = None,
+        compaction_ratio: float = 0.2
+    ):
+        self.embedding = embedding
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.ann_factory = ann_factory
+        self.partitions: Dict[str, MatrixIndex] = {}
+        self._partition_by_id: Dict[str, str] = {}
+        self.snapshot: Dict[str, IndexSnapshot] = {}
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+        self.compaction_ratio = compaction_ratio
+        self._compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="matrix-compactor")
+        self._pending_compactions = set()
+        self._ann_lock = threading.Lock()
+        self._pending_ann = set()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self) -> int:
+        return sum(len(snapshot) for snapshot in self.snapshot.values())
+
+    @contextmanager
+    def writing(self):
+        """Serialize writers; readers keep the previous snapshot until the outermost block exits"""
+        with self._write_lock:
+            self._write_depth += 1
+            try:
+                yield self
+            finally:
+                self._write_depth -= 1
+                if self._write_depth == 0:
+                    self._publish()
+
+    def _publish(self):
+        self.snapshot = {key: index.snapshot for key, index in self.partitions.items() if len(index)}
+
+    @classmethod
+    def partition_key(cls, metadata: Optional[Dict]) -> str:
+        document_id = (metadata or {}).get("document_id")
+        return str(document_id) if document_id is not None else cls.DEFAULT_PARTITION
+
+    @classmethod
+    def partition_keys(cls, metadatas: MetadataColumns) -> List[str]:
+        """partition_key for every row, read from the document_id column alone"""
+        return [str(value) if value is not None else cls.DEFAULT_PARTITION for value in metadatas.get("document_id")]
+
+    def has_partition(self, document_id: str) -> bool:
+        return document_id in self.snapshot
+
+    def _prepare(self, documents: List[Document], ids: Optional[List[str]]) -> Tuple[List[str], List[str], List[Dict]]:
+        texts = [doc.page_content for doc in documents]
+        if ids and len(ids) != len(texts):
+            raise ValueError(f"ids must be the same length as texts. Got {len(ids)} ids and {len(texts)} texts.")
+
+        doc_ids = list(ids) if ids else [doc.id for doc in documents]
+        doc_ids = [doc_id or str(uuid.uuid4()) for doc_id in doc_ids]
+        metadatas = [doc.metadata for doc in documents]
+        return doc_ids, texts, metadatas
+
+    def _new_index(self) -> MatrixIndex:
+        return MatrixIndex(quantization=self.quantization, rescore_factor=self.rescore_factor)
+
+    def build_ann_index(self, document_id: str) -> Optional[AnnIndex]:
+        with self.writing():
+            index = self.partitions.get(document_id)
+            if index is None or self.ann_factory is None or not self.ann_factory.wants_index(len(index)):
+                return None
+            return self._build_ann(index)
+
+    def _build_ann(self, index: MatrixIndex) -> AnnIndex:
+        snapshot = index.snapshot
+        ann = self.ann_factory.create()
+        ann.build(snapshot.vectors, fingerprint=snapshot.fingerprint())
+        index.attach_ann(ann)
+        return ann
+
+    def attach_ann(self, document_id: str, ann: AnnIndex) -> bool:
+        with self.writing():
+            index = self.partitions.get(document_id)
+            return index is not None and index.attach_ann(ann)
+
+    def schedule_ann_build(self, document_id: str, on_built: Optional[Callable[[AnnIndex], None]] = None) -> bool:
+        """Build a partition's ANN index on the background executor; `on_built` gets it once attached"""
+        index = self.partitions.get(document_id)
+        if index is None or self.ann_factory is None or not self.ann_factory.wants_index(len(index)):
+            return False
+        with self._ann_lock:
+            if document_id in self._pending_ann:
+                return True
+            self._pending_ann.add(document_id)
+        self._compactor.submit(self._run_ann_build, document_id, on_built)
+        return True
+
+    def _run_ann_build(self, key: str, on_built: Optional[Callable[[AnnIndex], None]]):
+        try:
+            index = self.partitions.get(key)
+            if index is None or not index.ann_stale:
+                return
+            # Built from a snapshot without the lock; rows appended meanwhile are covered by the exact tail scan,
+            # and attach_ann refuses the index if a compaction renumbered the rows
+            snapshot = index.snapshot
+            ann = self.ann_factory.create()
+            ann.build(snapshot.vectors, fingerprint=snapshot.fingerprint())
+            with self.writing():
+                attached = self.partitions.get(key) is index and index.attach_ann(ann)
+            if attached and on_built is not None:
+                on_built(ann)
+        except Exception as e:
+            print(f"Error building ANN index for partition {key}: {e}")
+        finally:
+            with self._ann_lock:
+                self._pending_ann.discard(key)
+
+    def _ensure_ann(self, key: str, snapshot: IndexSnapshot) -> IndexSnapshot:
+        if self.ann_factory is not None and snapshot.ann_stale and self.ann_factory.wants_index(len(snapshot)):
+            # This query scans exactly; later ones pick the index up once it is built
+            self.schedule_ann_build(key)
+        return snapshot
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(index.resident_bytes for index in list(self.partitions.values()))
+
+    @property
+    def mapped_bytes(self) -> int:
+        return sum(index.mapped_bytes for index in list(self.partitions.values()))
+
+    def _add_rows(
+        self,
+        doc_ids: List[str],
+        texts: List[str],
+        metadatas: Union[List[Dict], MetadataColumns],
+        vectors,
+        normalized: bool = False,
+        codes: Optional[np.ndarray] = None,
+        scales: Optional[np.ndarray] = None
+    ) -> List[str]:
+        metadatas = MetadataColumns.coerce(metadatas)
+        with self.writing():
+            return self._add_grouped(doc_ids, texts, metadatas, np.asarray(vectors, dtype=np.float32), normalized, codes, scales)
+
+    def _add_grouped(
+        self,
+        doc_ids: List[str],
+        texts: List[str],
+        metadatas: MetadataColumns,
+        vectors: np.ndarray,
+        normalized: bool,
+        codes: Optional[np.ndarray],
+        scales: Optional[np.ndarray]
+    ) -> List[str]:
+        grouped: Dict[str, List[int]] = {}
+        for position, (doc_id, key) in enumerate(zip(doc_ids, self.partition_keys(metadatas))):
+            previous = self._partition_by_id.get(doc_id)
+            if previous is not None and previous != key:
+                # The id moved to another document; drop the stale row first
+                self.partitions[previous].delete([doc_id])
+                self._maybe_compact(previous)
+            grouped.setdefault(key, []).append(position)
+
+        for key, positions in grouped.items():
+            index = self.partitions.get(key)
+            if index is None:
+                index = self.partitions[key] = self._new_index()
+            if len(grouped) == 1:
+                # Whole batch belongs to one document: hand the block over without slicing
+                index.add(doc_ids, texts, metadatas, vectors, normalized=normalized, codes=codes, scales=scales)
+            else:
+                index.add(
+                    [doc_ids[p] for p in positions],
+                    [texts[p] for p in positions],
+                    metadatas.take(positions),
+                    vectors[positions],
+                    normalized=normalized,
+                    codes=codes[positions] if codes is not None else None,
+                    scales=scales[positions] if scales is not None else None
+                )
+            for p in positions:
+                self._partition_by_id[doc_ids[p]] = key
+
+        for key in grouped:
+            self._maybe_compact(key)
+        return doc_ids
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        doc_ids, texts, metadatas = self._prepare(documents, ids)
+        if not texts:
+            return []
+        vectors = kwargs.get("embeddings")
+        if vectors is None:
+            vectors = self.embedding.embed_documents(texts)
+        return self._add_rows(doc_ids, texts, metadatas, vectors)
+
+    async def aadd_documents(self, documents: List[Document], ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        doc_ids, texts, metadatas = self._prepare(documents, ids)
+        if not texts:
+            return []
+        vectors = kwargs.get("embeddings")
+        if vectors is None:
+            vectors = await self.embedding.aembed_documents(texts)
+        return self._add_rows(doc_ids, texts, metadatas, vectors)
+
+    async def _aembed_queries(self, queries: Sequence[str]) -> List[List[float]]:
+        # Wrappers with a query cache embed each distinct question once
+        if hasattr(self.embedding, 'aembed_queries'):
+            return await self.embedding.aembed_queries(list(queries))
+        return await self.embedding.aembed_documents(list(queries))
+
+    def delete(self, ids: Optional[Sequence[str]] = None, **kwargs: Any) -> None:
+        if not ids:
+            return
+        with self.writing():
+            grouped: Dict[str, List[str]] = {}
+            for doc_id in ids:
+                key = self._partition_by_id.pop(doc_id, None)
+                if key is not None:
+                    grouped.setdefault(key, []).append(doc_id)
+            for key, partition_ids in grouped.items():
+                self.partitions[key].delete(partition_ids)
+                if not len(self.partitions[key]):
+                    del self.partitions[key]
+                else:
+                    self._maybe_compact(key)
+
+    async def adelete(self, ids: Optional[Sequence[str]] = None, **kwargs: Any) -> None:
+        self.delete(ids)
+
+    def _maybe_compact(self, key: str):
+        """Queue a background compaction once a partition's tombstone ratio crosses the threshold"""
+        index = self.partitions.get(key)
+        if index is None or self.compaction_ratio <= 0 or index.tombstone_ratio < self.compaction_ratio:
+            return
+        if key in self._pending_compactions:
+            return
+        self._pending_compactions.add(key)
+        self._compactor.submit(self._run_compaction, key)
+
+    def _run_compaction(self, key: str):
+        retry = False
+        try:
+            index = self.partitions.get(key)
+            if index is None:
+                return
+            # The copy runs without the lock; the install is skipped if a writer got in first
+            prepared = index.prepare_compaction()
+            with self.writing():
+                retry = self.partitions.get(key) is index and not index.install_compaction(prepared)
+        except Exception as e:
+            print(f"Error compacting partition {key}: {e}")
+        finally:
+            with self._write_lock:
+                self._pending_compactions.discard(key)
+                if retry:
+                    self._maybe_compact(key)
+
+    def compact(self, document_id: Optional[str] = None) -> int:
+        """Synchronously reclaim tombstoned rows; returns the number of partitions rewritten"""
+        with self.writing():
+            keys = [document_id] if document_id is not None else list(self.partitions)
+            return sum(1 for key in keys if key in self.partitions and self.partitions[key].compact())
+
+    def drop_partition(self, document_id: str) -> int:
+        with self.writing():
+            index = self.partitions.pop(document_id, None)
+            if index is None:
+                return 0
+            for doc_id in index.live_ids():
+                self._partition_by_id.pop(doc_id, None)
+            return len(index)
+
+    def clear(self):
+        with self.writing():
+            self.partitions = {}
+            self._partition_by_id = {}
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        return [self._document(snapshot, row) for snapshot, row in self._locate(ids)]
+
+    @staticmethod
+    def _document(snapshot: IndexSnapshot, row: int) -> Document:
+        return Document(
+            id=snapshot.ids[row],
+            page_content=snapshot.texts[row],
+            metadata=snapshot.metadatas[row]
+        )
+
+    def _resolve_filter(self, filter) -> Tuple[List[Tuple[str, IndexSnapshot]], Optional[Union[Dict, Callable[[Document], bool]]]]:
+        """
+        Split a filter into the (key, snapshot) partitions to scan and a residual
+        predicate: either metadata equality conditions, matched on the columns,
+        or a callable over Documents.
+        """
+        view = self.snapshot
+        if filter is None:
+            return list(view.items()), None
+
+        if callable(filter):
+            return list(view.items()), filter
+
+        conditions = dict(filter)
+        if "document_id" in conditions:
+            key = str(conditions.pop("document_id"))
+            indexes = [(key, view[key])] if key in view else []
+        else:
+            indexes = list(view.items())
+
+        return indexes, conditions or None
+
+    def _search_partition(
+        self,
+        snapshot: IndexSnapshot,
+        embedding: List[float],
+        k: int,
+        predicate: Optional[Union[Dict, Callable[[Document], bool]]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if predicate is None:
+            return snapshot.search(embedding, k)
+
+        # Walk the full ranking until enough rows pass the predicate
+        rows, scores = snapshot.search(embedding, snapshot.size)
+        if isinstance(predicate, dict):
+            keep = np.flatnonzero(snapshot.metadatas.mask(predicate)[rows])[:k]
+        else:
+            keep = [i for i, row in enumerate(rows) if predicate(self._document(snapshot, row))][:k]
+        return rows[keep], scores[keep]
+
+    def _search_hits(self, embedding: List[float], k: int, filter=None) -> List[Tuple[IndexSnapshot, int, float]]:
+        indexes, predicate = self._resolve_filter(filter)
+
+        partial = []
+        for key, snapshot in indexes:
+            snapshot = self._ensure_ann(key, snapshot)
+            rows, scores = self._search_partition(snapshot, embedding, k, predicate)
+            partial.extend((snapshot, int(row), float(score)) for row, score in zip(rows, scores))
+
+        if len(indexes) <= 1:
+            return partial
+
+        # Corpus-wide view: merge the per-partition winners into one top-k
+        merged_scores = np.array([score for _, _, score in partial], dtype=np.float32)
+        order, _ = MatrixIndex.top_k(merged_scores, k)
+        return [partial[i] for i in order]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Any] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return [
+            (self._document(snapshot, row), score)
+            for snapshot, row, score in self._search_hits(embedding, k, filter)
+        ]
+
+    @staticmethod
+    def _partition_hits(snapshot: IndexSnapshot, rows: np.ndarray, scores: np.ndarray) -> SearchHits:
+        return SearchHits([snapshot], np.zeros(len(rows), dtype=np.int32), rows, scores)
+
+    def similarity_search_hits_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        filter: Optional[Any] = None
+    ) -> List[SearchHits]:
+        """Top-k row handles and scores for many query vectors, scoring each partition once for the batch"""
+        indexes, predicate = self._resolve_filter(filter)
+        if predicate is not None:
+            return [SearchHits.from_hits(self._search_hits(embedding, k, filter)) for embedding in embeddings]
+
+        if len(indexes) == 1:
+            key, snapshot = indexes[0]
+            snapshot = self._ensure_ann(key, snapshot)
+            return [self._partition_hits(snapshot, rows, scores) for rows, scores in snapshot.search_many(embeddings, k)]
+
+        partial: List[List[Tuple[IndexSnapshot, int, float]]] = [[] for _ in embeddings]
+        for key, snapshot in indexes:
+            snapshot = self._ensure_ann(key, snapshot)
+            for hits, (rows, scores) in zip(partial, snapshot.search_many(embeddings, k)):
+                hits.extend((snapshot, int(row), float(score)) for row, score in zip(rows, scores))
+
+        results = []
+        for hits in partial:
+            order, _ = MatrixIndex.top_k(np.array([score for _, _, score in hits], dtype=np.float32), k)
+            results.append(SearchHits.from_hits([hits[i] for i in order]))
+        return results
+
+    def similarity_search_with_score_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        filter: Optional[Any] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        return [hits.with_scores() for hits in self.similarity_search_hits_by_vectors(embeddings, k, filter)]
+
+    async def asimilarity_search_hits_batch(
+        self,
+        queries: List[str],
+        k: int = 4,
+        filter: Optional[Any] = None
+    ) -> List[SearchHits]:
+        if not queries:
+            return []
+        embeddings = await self._aembed_queries(queries)
+        return self.similarity_search_hits_by_vectors(embeddings, k, filter)
+
+    async def asimilarity_search_batch(
+        self,
+        queries: List[str],
+        k: int = 4,
+        filter: Optional[Any] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        return [hits.with_scores() for hits in await self.asimilarity_search_hits_batch(queries, k, filter)]
+
+    @staticmethod
+    def _mmr_select(hits: SearchHits, k: int, lambda_mult: float) -> SearchHits:
+        if not len(hits):
+            return hits
+        if len(hits.sources) == 1:
+            candidates = np.asarray(hits.sources[0].vectors[hits.rows])
+        else:
+            candidates = np.vstack([hits.sources[source].vectors[row] for source, row in zip(hits.source_of, hits.rows)])
+        order = MatrixIndex.mmr_order(hits.scores, candidates.astype(np.float32, copy=False), k, lambda_mult)
+        return hits.take(order)
+
+    def max_marginal_relevance_search_hits_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Any] = None
+    ) -> List[SearchHits]:
+        """MMR for several queries as row handles; scores are each row's similarity to its query"""
+        fetch_k = max(fetch_k, k)
+        indexes, predicate = self._resolve_filter(filter)
+        if predicate is not None or len(indexes) != 1:
+            return [
+                self._mmr_select(SearchHits.from_hits(self._search_hits(embedding, fetch_k, filter)), k, lambda_mult)
+                for embedding in embeddings
+            ]
+
+        key, snapshot = indexes[0]
+        snapshot = self._ensure_ann(key, snapshot)
+        return [
+            self._mmr_select(self._partition_hits(snapshot, rows, scores), k, lambda_mult)
+            for rows, scores in snapshot.search_many(embeddings, fetch_k)
+        ]
+
+    def max_marginal_relevance_search_with_score_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Any] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """MMR for several queries; scores are each document's similarity to its query"""
+        return [
+            hits.with_scores()
+            for hits in self.max_marginal_relevance_search_hits_by_vectors(embeddings, k, fetch_k, lambda_mult, filter)
+        ]
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        **kwargs: Any
+    ) -> List[Document]:
+        results = self.max_marginal_relevance_search_with_score_by_vectors(
+            [embedding], k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=kwargs.get("filter")
+        )
+        return [doc for doc, _ in results[0]]
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        **kwargs: Any
+    ) -> List[Document]:
+        embedding = self.embedding.embed_query(query)
+        return self.max_marginal_relevance_search_by_vector(embedding, k, fetch_k, lambda_mult, **kwargs)
+
+    async def amax_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        **kwargs: Any
+    ) -> List[Document]:
+        embedding = await self.embedding.aembed_query(query)
+        return self.max_marginal_relevance_search_by_vector(embedding, k, fetch_k, lambda_mult, **kwargs)
+
+    async def amax_marginal_relevance_search_hits_batch(
+        self,
+        queries: List[str],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Any] = None
+    ) -> List[SearchHits]:
+        if not queries:
+            return []
+        embeddings = await self._aembed_queries(queries)
+        return self.max_marginal_relevance_search_hits_by_vectors(embeddings, k, fetch_k, lambda_mult, filter)
+
+    async def amax_marginal_relevance_search_batch(
+        self,
+        queries: List[str],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Any] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        return [
+            hits.with_scores()
+            for hits in await self.amax_marginal_relevance_search_hits_batch(queries, k, fetch_k, lambda_mult, filter)
+        ]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        embedding = self.embedding.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        embedding = await self.embedding.aembed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k, **kwargs)]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        **kwargs: Any
+    ) -> "MatrixVectorStore":
+        store = cls(embedding=embedding)
+        store.add_texts(texts=texts, metadatas=metadatas, **kwargs)
+        return store
+
+    @staticmethod
+    def _record(snapshot: IndexSnapshot, row: int) -> Dict[str, Any]:
+        return {
+            "id": snapshot.ids[row],
+            "vector": snapshot.vectors[row].tolist(),
+            "text": snapshot.texts[row],
+            "metadata": snapshot.metadatas[row],
+        }
+
+    def _locate(self, ids: Sequence[str]) -> List[Tuple[IndexSnapshot, int]]:
+        """(snapshot, row) for each known id; row numbers come from the writer-side maps"""
+        with self.writing():
+            located = []
+            for doc_id in ids:
+                key = self._partition_by_id.get(doc_id)
+                if key is not None:
+                    index = self.partitions[key]
+                    located.append((index.snapshot, index.row_of(doc_id)))
+            return located
+
+    def _snapshots(self, document_id: Optional[str] = None) -> List[IndexSnapshot]:
+        view = self.snapshot
+        if document_id is not None:
+            return [view[document_id]] if document_id in view else []
+        return list(view.values())
+
+    def to_records(self, document_id: Optional[str] = None, ids: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, Any]]:
+        if ids is not None:
+            return {snapshot.ids[row]: self._record(snapshot, row) for snapshot, row in self._locate(ids)}
+
+        return {
+            snapshot.ids[row]: self._record(snapshot, int(row))
+            for snapshot in self._snapshots(document_id)
+            for row in snapshot.live_rows()
+        }
+
+    def add_segment(self, segment: VectorSegment) -> List[str]:
+        """Insert a cache segment and return the partition keys it landed in"""
+        if not len(segment):
+            return []
+        self._add_rows(
+            segment.ids,
+            segment.texts,
+            segment.metadatas,
+            segment.vectors,
+            normalized=True,
+            codes=segment.codes,
+            scales=segment.scales
+        )
+        return sorted(set(self.partition_keys(segment.metadatas)))
+
+    def export_segment(self, document_id: Optional[str] = None, ids: Optional[Sequence[str]] = None) -> VectorSegment:
+        if ids is not None:
+            located = self._locate(ids)
+            if not located:
+                return VectorSegment(ids=[], texts=[], metadatas=[], vectors=np.empty((0, 0), dtype=np.float32))
+            # Group rows by partition so metadata columns are sliced once per partition
+            grouped: Dict[int, Tuple[IndexSnapshot, List[int]]] = {}
+            for snapshot, row in located:
+                grouped.setdefault(id(snapshot), (snapshot, []))[1].append(row)
+            located = [(snapshot, row) for snapshot, rows in grouped.values() for row in rows]
+            quantized = all(snapshot.codes is not None for snapshot, _ in located)
+            scaled = quantized and all(snapshot.scales is not None for snapshot, _ in located)
+            return VectorSegment(
+                ids=[snapshot.ids[row] for snapshot, row in located],
+                texts=[snapshot.texts[row] for snapshot, row in located],
+                metadatas=MetadataColumns.concat([snapshot.metadatas.take(rows) for snapshot, rows in grouped.values()]),
+                vectors=np.vstack([snapshot.vectors[row] for snapshot, row in located]),
+                codes=np.vstack([snapshot.codes[row] for snapshot, row in located]) if quantized else None,
+                scales=np.array([snapshot.scales[row] for snapshot, row in located], dtype=np.float32) if scaled else None,
+            )
+
+        return VectorSegment.concat([self._live_segment(snapshot) for snapshot in self._snapshots(document_id)])
+
+    @staticmethod
+    def _live_segment(snapshot: IndexSnapshot) -> VectorSegment:
+        if not len(snapshot.dead):
+            return VectorSegment(
+                ids=snapshot.ids,
+                texts=snapshot.texts,
+                metadatas=snapshot.metadatas,
+                vectors=snapshot.vectors,
+                codes=snapshot.codes,
+                scales=snapshot.scales
+            )
+        live = snapshot.live_rows()
+        return VectorSegment(
+            ids=[snapshot.ids[row] for row in live],
+            texts=[snapshot.texts[row] for row in live],
+            metadatas=snapshot.metadatas.take(live),
+            vectors=snapshot.vectors[live],
+            codes=snapshot.codes[live] if snapshot.codes is not None else None,
+            scales=snapshot.scales[live] if snapshot.scales is not None else None
+        )
+
+    def add_records(self, records: Dict[str, Dict[str, Any]]) -> List[str]:
+        """Insert records in the InMemoryVectorStore JSON layout"""
+        return self.add_segment(VectorSegment.from_records(records))
+
+    @staticmethod
+    def read_records(path: str) -> Dict[str, Dict[str, Any]]:
+        with Path(path).open("r") as f:
+            return json.load(f)
+
+    def dump(self, path: str, document_id: Optional[str] = None) -> None:
+        path_ = Path(path)
+        path_.parent.mkdir(exist_ok=True, parents=True)
+        with path_.open("w") as f:
+            json.dump(self.to_records(document_id), f)
+
+    @classmethod
+    def load(cls, path: str, embedding: Embeddings, **kwargs: Any) -> "MatrixVectorStore":
+        store = cls(embedding=embedding, **kwargs)
+        store.add_records(cls.read_records(path))
+        return store
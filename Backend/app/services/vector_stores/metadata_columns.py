@@ -0,0 +1,233 @@
+import copy
+import json
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+import numpy as np
+
+
+class _Column:
+    """Per-row int32 codes into a table of distinct values; -1 marks rows without the key"""
+
+    __slots__ = ("codes", "values", "lookup")
+
+    def __init__(self, codes: np.ndarray, values: List[Any], lookup: Optional[Dict[Any, int]] = None):
+        self.codes = codes
+        self.values = values
+        self.lookup = lookup
+
+
+class MetadataColumns:
+    """
+    Chunk metadata stored column by column with dictionary-encoded values.
+
+    Every key keeps one int32 code per row pointing into that key's table of
+    distinct values, so strings repeated across thousands of chunks (source,
+    document_id, section headers, table headers) are held once. Rows are only
+    materialized as dicts when a caller indexes them, which is how search
+    results get their Document metadata.
+
+    Value tables and code arrays are append-only: `view()` returns a
+    fixed-length reader that stays valid while the owner keeps appending,
+    and `copy()` gives a writer private codes before rows are rewritten.
+    """
+
+    MISSING = -1
+
+    def __init__(self, size: int = 0, columns: Optional[Dict[str, _Column]] = None):
+        self._size = size
+        self._columns: Dict[str, _Column] = columns if columns is not None else {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, row: int) -> Dict[str, Any]:
+        if row < 0:
+            row += self._size
+        if not 0 <= row < self._size:
+            raise IndexError(f"Metadata row {row} out of range for {self._size} rows")
+        metadata = {}
+        for key, column in self._columns.items():
+            code = int(column.codes[row])
+            if code != self.MISSING:
+                value = column.values[code]
+                # Tables are shared by every row; hand out copies of containers
+                metadata[key] = copy.deepcopy(value) if isinstance(value, (list, dict)) else value
+        return metadata
+
+    def __iter__(self):
+        for row in range(self._size):
+            yield self[row]
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._columns)
+
+    @staticmethod
+    def _token(value: Any) -> Any:
+        # Plain strings are the common case; everything else is tagged so 1, 1.0 and True stay distinct
+        if type(value) is str:
+            return value
+        if value is None or isinstance(value, (bool, int, float)):
+            return (type(value).__name__, value)
+        return ("json", json.dumps(value, sort_keys=True, default=str))
+
+    def _encode(self, column: _Column, value: Any) -> int:
+        if column.lookup is None:
+            column.lookup = {self._token(existing): code for code, existing in enumerate(column.values)}
+        token = self._token(value)
+        code = column.lookup.get(token)
+        if code is None:
+            code = len(column.values)
+            column.values.append(value)
+            column.lookup[token] = code
+        return code
+
+    @staticmethod
+    def _missing(capacity: int) -> np.ndarray:
+        return np.full(capacity, MetadataColumns.MISSING, dtype=np.int32)
+
+    def _capacity(self) -> int:
+        return max((column.codes.shape[0] for column in self._columns.values()), default=self._size)
+
+    def _reserve(self, extra: int):
+        required = self._size + extra
+        for column in self._columns.values():
+            if required <= column.codes.shape[0] and column.codes.flags.writeable:
+                continue
+            grown = self._missing(max(required, column.codes.shape[0] * 2, 64))
+            grown[:self._size] = column.codes[:self._size]
+            column.codes = grown
+
+    def _column_for(self, key: str) -> _Column:
+        column = self._columns.get(key)
+        if column is None:
+            column = _Column(self._missing(self._capacity()), [], {})
+            # Copy-on-write: views iterating the old key set are never disturbed
+            columns = dict(self._columns)
+            columns[key] = column
+            self._columns = columns
+        return column
+
+    def append(self, metadatas: Sequence[Dict[str, Any]]):
+        if not len(metadatas):
+            return
+        self._reserve(len(metadatas))
+        for row, metadata in enumerate(metadatas, start=self._size):
+            for key, value in (metadata or {}).items():
+                column = self._column_for(key)
+                if row >= column.codes.shape[0]:
+                    self._reserve(len(metadatas))
+                column.codes[row] = self._encode(column, value)
+        self._size += len(metadatas)
+
+    def extend(self, other: "MetadataColumns"):
+        """Append another column set, remapping its codes through this set's value tables"""
+        if not len(other):
+            return
+        self._reserve(len(other))
+        start = self._size
+        for key, other_column in other._columns.items():
+            column = self._column_for(key)
+            if start + len(other) > column.codes.shape[0]:
+                self._reserve(len(other))
+            codes = np.asarray(other_column.codes[:len(other)])
+            if column.values is other_column.values:
+                column.codes[start:start + len(other)] = codes
+                continue
+            used = np.unique(codes[codes != self.MISSING])
+            remap = np.full(len(other_column.values) + 1, self.MISSING, dtype=np.int32)
+            for code in used:
+                remap[code] = self._encode(column, other_column.values[code])
+            # Index -1 lands on the trailing MISSING slot
+            column.codes[start:start + len(other)] = remap[codes]
+        self._size += len(other)
+
+    def set(self, row: int, metadata: Dict[str, Any]):
+        for column in self._columns.values():
+            column.codes[row] = self.MISSING
+        for key, value in (metadata or {}).items():
+            column = self._column_for(key)
+            column.codes[row] = self._encode(column, value)
+
+    def get(self, key: str, default: Any = None) -> List[Any]:
+        """One key's value for every row, without materializing the other keys"""
+        column = self._columns.get(key)
+        if column is None:
+            return [default] * self._size
+        return [column.values[code] if code != self.MISSING else default for code in column.codes[:self._size].tolist()]
+
+    def mask(self, conditions: Dict[str, Any]) -> np.ndarray:
+        """Rows whose metadata equals every condition (a missing key compares as None)"""
+        keep = np.ones(self._size, dtype=bool)
+        for key, expected in conditions.items():
+            column = self._columns.get(key)
+            if column is None:
+                if expected is not None:
+                    keep[:] = False
+                continue
+            codes = column.codes[:self._size]
+            matching = [code for code, value in enumerate(column.values) if value == expected]
+            if expected is None:
+                matching.append(self.MISSING)
+            keep &= np.isin(codes, matching)
+        return keep
+
+    def view(self, size: Optional[int] = None) -> "MetadataColumns":
+        """Read-only view of the first `size` rows that later appends do not affect"""
+        return MetadataColumns(self._size if size is None else size, self._columns)
+
+    def copy(self) -> "MetadataColumns":
+        columns = {
+            key: _Column(np.array(column.codes, dtype=np.int32), column.values, column.lookup)
+            for key, column in self._columns.items()
+        }
+        return MetadataColumns(self._size, columns)
+
+    def take(self, rows) -> "MetadataColumns":
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = {
+            key: _Column(np.asarray(column.codes[:self._size])[rows].astype(np.int32), column.values, column.lookup)
+            for key, column in self._columns.items()
+        }
+        return MetadataColumns(len(rows), columns)
+
+    @classmethod
+    def from_dicts(cls, metadatas: Sequence[Dict[str, Any]]) -> "MetadataColumns":
+        columns = cls()
+        columns.append(metadatas)
+        return columns
+
+    @classmethod
+    def coerce(cls, metadatas) -> "MetadataColumns":
+        return metadatas if isinstance(metadatas, cls) else cls.from_dicts(list(metadatas))
+
+    @classmethod
+    def concat(cls, parts: List["MetadataColumns"]) -> "MetadataColumns":
+        merged = cls()
+        for part in parts:
+            merged.extend(part)
+        return merged
+
+    def to_parts(self) -> Tuple[List[str], List[List[Any]], np.ndarray]:
+        """(keys, used values per key, codes as a [keys, rows] int32 block) for persistence"""
+        keys, tables = [], []
+        codes = np.empty((len(self._columns), self._size), dtype=np.int32)
+        for position, (key, column) in enumerate(self._columns.items()):
+            column_codes = np.asarray(column.codes[:self._size])
+            used = np.unique(column_codes[column_codes != self.MISSING])
+            remap = np.full(len(column.values) + 1, self.MISSING, dtype=np.int32)
+            remap[used] = np.arange(len(used), dtype=np.int32)
+            codes[position] = remap[column_codes]
+            keys.append(key)
+            tables.append([column.values[code] for code in used.tolist()])
+        return keys, tables, codes
+
+    @classmethod
+    def from_parts(cls, keys: List[str], tables: List[List[Any]], codes: np.ndarray) -> "MetadataColumns":
+        """Inverse of to_parts; a memory-mapped codes block is used without copying"""
+        size = codes.shape[1] if codes.ndim == 2 else 0
+        columns = {key: _Column(codes[position], list(table)) for position, (key, table) in enumerate(zip(keys, tables))}
+        return cls(size, columns)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.codes.nbytes for column in self._columns.values())
@@ -0,0 +1,53 @@
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: locking degrades to threads within one process
+    fcntl = None
+
+
+class ProcessLock:
+    """
+    Exclusive lock shared by threads and by every worker process on the host.
+
+    A thread lock serializes callers inside the process and an flock() on
+    `path` serializes processes. Re-entrant within a thread, so helpers that
+    take the lock can call each other.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._handle = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                self._handle = open(self.path, "a+")
+                fcntl.flock(self._handle.fileno(), fcntl.LOCK_EX)
+            except Exception:
+                if self._handle is not None:
+                    self._handle.close()
+                    self._handle = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and self._handle is not None:
+            fcntl.flock(self._handle.fileno(), fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+        self._thread_lock.release()
+
+    def __enter__(self) -> "ProcessLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -0,0 +1,58 @@
+from typing import Optional, Tuple
+import numpy as np
+
+
+class ScalarQuantizer:
+    """
+    Scalar quantization of L2-normalized embeddings for a cheap first-pass scan.
+
+    "float16" halves the footprint of each row; "int8" stores one signed byte per
+    dimension plus a float32 scale per row (about 4x smaller than float32).
+    Scores computed on the codes are approximate and are meant to pick candidates
+    that get rescored against the full-precision vectors.
+    """
+
+    MODES = ("none", "float16", "int8")
+
+    def __init__(self, mode: str = "none", block_rows: int = 4096):
+        mode = (mode or "none").lower()
+        if mode not in self.MODES:
+            raise ValueError(f"Unsupported quantization mode '{mode}'. Expected one of {self.MODES}")
+        self.mode = mode
+        self.block_rows = block_rows
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "none"
+
+    @property
+    def code_dtype(self):
+        return np.int8 if self.mode == "int8" else np.float16
+
+    @property
+    def uses_scales(self) -> bool:
+        return self.mode == "int8"
+
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Return (codes, scales); scales is None unless the mode is int8"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.mode == "float16":
+            return vectors.astype(np.float16), None
+
+        scales = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.empty(0, dtype=np.float32)
+        scales = scales.astype(np.float32)
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+
+    def scores(self, codes: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+        """Approximate dot products, decoding a block of rows at a time to bound temporaries"""
+        query = np.asarray(query, dtype=np.float32)
+        n = codes.shape[0]
+        scores = np.empty(n, dtype=np.float32)
+        for start in range(0, n, self.block_rows):
+            stop = min(start + self.block_rows, n)
+            scores[start:stop] = codes[start:stop].astype(np.float32) @ query
+        if scales is not None:
+            scores *= scales[:n]
+        return scores
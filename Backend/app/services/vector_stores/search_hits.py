@@ -0,0 +1,108 @@
+from typing import List, Any, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from app.services.vector_stores.matrix_index import MatrixIndex
+
+
+class SearchHits:
+    """
+    Ranked search result kept as compact arrays until a caller needs Documents.
+
+    Each hit is a (source, row) handle plus a score. A source is either an
+    IndexSnapshot, whose texts are read by reference and whose metadata dicts
+    are only built on demand, or a plain list of Documents for backends that
+    already return them. Callers prune on `scores` and `texts` and `hydrate()`
+    only the rows that make it into the final context.
+    """
+
+    def __init__(self, sources: List[Any], source_of: np.ndarray, rows: np.ndarray, scores: np.ndarray):
+        self.sources = sources
+        self.source_of = source_of
+        self.rows = rows
+        self.scores = scores
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def empty(cls) -> "SearchHits":
+        return cls([], np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+
+    @classmethod
+    def from_hits(cls, hits: Sequence[Tuple[Any, int, float]]) -> "SearchHits":
+        """Build from (source, row, score) triples, keeping their order"""
+        sources, positions, source_of = [], {}, []
+        for source, _, _ in hits:
+            position = positions.get(id(source))
+            if position is None:
+                position = positions[id(source)] = len(sources)
+                sources.append(source)
+            source_of.append(position)
+        return cls(
+            sources,
+            np.array(source_of, dtype=np.int32),
+            np.array([row for _, row, _ in hits], dtype=np.int64),
+            np.array([score for _, _, score in hits], dtype=np.float32)
+        )
+
+    @classmethod
+    def from_documents(cls, documents_with_scores: Sequence[Tuple[Document, float]]) -> "SearchHits":
+        documents = [doc for doc, _ in documents_with_scores]
+        return cls(
+            [documents],
+            np.zeros(len(documents), dtype=np.int32),
+            np.arange(len(documents), dtype=np.int64),
+            np.array([score for _, score in documents_with_scores], dtype=np.float32)
+        )
+
+    def _row(self, position: int) -> Tuple[Any, int]:
+        return self.sources[self.source_of[position]], int(self.rows[position])
+
+    def text(self, position: int) -> str:
+        source, row = self._row(position)
+        return source[row].page_content if isinstance(source, list) else source.texts[row]
+
+    @property
+    def texts(self) -> List[str]:
+        return [self.text(position) for position in range(len(self))]
+
+    def take(self, positions) -> "SearchHits":
+        positions = np.asarray(positions, dtype=np.int64)
+        return SearchHits(self.sources, self.source_of[positions], self.rows[positions], self.scores[positions])
+
+    def head(self, n: int) -> "SearchHits":
+        return self.take(np.arange(min(n, len(self))))
+
+    @property
+    def has_vectors(self) -> bool:
+        """True when every source is an IndexSnapshot, whose stored embeddings MMR can compare"""
+        return bool(self.sources) and not any(isinstance(source, list) for source in self.sources)
+
+    def mmr(self, positions: Sequence[int], k: int, lambda_mult: float = 0.5) -> List[int]:
+        """Pick k of `positions` by maximal marginal relevance; without stored embeddings, the first k in order"""
+        positions = [int(position) for position in positions]
+        if not self.has_vectors or not positions:
+            return positions[:k]
+        candidates = np.vstack([
+            self.sources[self.source_of[position]].vectors[self.rows[position]] for position in positions
+        ]).astype(np.float32, copy=False)
+        order = MatrixIndex.mmr_order(self.scores[positions], candidates, k, lambda_mult)
+        return [positions[i] for i in order]
+
+    def by_score(self) -> "SearchHits":
+        """Same hits ranked by raw similarity, best first (MMR order is not score order)"""
+        return self.take(np.argsort(-self.scores, kind="stable"))
+
+    def document(self, position: int) -> Document:
+        source, row = self._row(position)
+        if isinstance(source, list):
+            return source[row]
+        return Document(id=source.ids[row], page_content=source.texts[row], metadata=source.metadatas[row])
+
+    def hydrate(self, positions: Optional[Sequence[int]] = None) -> List[Document]:
+        if positions is None:
+            positions = range(len(self))
+        return [self.document(int(position)) for position in positions]
+
+    def with_scores(self) -> List[Tuple[Document, float]]:
+        return [(self.document(position), float(self.scores[position])) for position in range(len(self))]
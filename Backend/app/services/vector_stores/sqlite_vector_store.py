@@ -0,0 +1,497 @@
+from app.services.vector_stores.base_vector_store import BaseVectorStore
+from app.services.vector_stores.matrix_vector_store import MatrixVectorStore
+from app.services.vector_stores.matrix_index import MatrixIndex
+from app.services.vector_stores.vector_segment import VectorSegment
+from app.services.vector_stores.document_residency import DocumentResidency
+from app.services.vector_stores.search_hits import SearchHits
+from app.services.embedders.embedding_factory import get_embedding_model
+from app.services.embedders.langchain_wrapper import LangChainEmbeddingWrapper
+from typing import List, Dict, Optional, Any, Tuple
+from langchain_core.documents import Document
+from app.config.settings import settings
+from pathlib import Path
+import numpy as np
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+class SqliteVectorStoreService(BaseVectorStore):
+    """
+    Durable single-node vector store backed by one SQLite file.
+
+    Each chunk is a row holding its text, JSON metadata and a normalized float32
+    embedding blob, indexed by document_id. Searches scoped to a document load
+    that document's rows into a MatrixVectorStore partition once and keep it
+    resident under the same LRU bound as the in-memory store; unscoped searches
+    stream the table in blocks.
+
+    A document counts as cached only once finalize_document has written its row
+    in the `documents` table, so an ingestion that died halfway is redone
+    instead of served partially. Async methods run their SQLite work in a
+    worker thread.
+    """
+
+    SCAN_BATCH_ROWS = 4096
+    DELETE_BATCH_ROWS = 500
+
+    def __init__(
+        self,
+        db_path: str = "vector_store.db",
+        embedding_model: str = "text-embedding-3-small"
+    ):
+        self.db_path = db_path
+        self.embedding_model = embedding_model
+
+        embedder = get_embedding_model(embedding_model)
+        self.embeddings = LangChainEmbeddingWrapper(embedder)
+
+        # Resident documents are served from the same matrix engine as the in-memory store
+        self.vector_store = MatrixVectorStore(embedding=self.embeddings, compaction_ratio=settings.INMEMORY_COMPACTION_TOMBSTONE_RATIO)
+        self.residency = DocumentResidency(max_documents=settings.INMEMORY_MAX_RESIDENT_DOCUMENTS)
+
+        self.store_type = "sqlite"
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._initialize_schema()
+
+        print(f"Initialized SQLite vector store at: {db_path}")
+
+    def _initialize_schema(self):
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id TEXT PRIMARY KEY,
+                    document_id TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    embedding BLOB NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_chunks_document_id ON chunks(document_id);
+                CREATE TABLE IF NOT EXISTS store_info (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS documents (
+                    document_id TEXT PRIMARY KEY,
+                    chunk_count INTEGER NOT NULL,
+                    completed_at REAL NOT NULL
+                );
+                """
+            )
+            if self._conn.execute("SELECT 1 FROM store_info WHERE key = 'completion_markers'").fetchone() is None:
+                # Stores created before completion markers existed: trust the documents already there, once
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO documents (document_id, chunk_count, completed_at) "
+                    "SELECT document_id, COUNT(*), ? FROM chunks GROUP BY document_id",
+                    (time.time(),)
+                )
+                self._conn.execute("INSERT INTO store_info (key, value) VALUES ('completion_markers', '1')")
+            row = self._conn.execute("SELECT value FROM store_info WHERE key = 'embedding_model'").fetchone()
+            if row is None:
+                self._conn.execute("INSERT INTO store_info (key, value) VALUES ('embedding_model', ?)", (self.embedding_model,))
+            elif row[0] != self.embedding_model:
+                print(f"Warning: SQLite vector store was built with '{row[0]}' but '{self.embedding_model}' is configured")
+            self._conn.commit()
+
+    @staticmethod
+    def _document_id_for_url(document_url: str) -> str:
+        # Same hash rag.py uses to derive document_id from the request URL
+        return hashlib.sha256(document_url.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _scoped_document_id(filter: Optional[Dict]) -> Optional[str]:
+        if isinstance(filter, dict) and filter.get("document_id") is not None:
+            return str(filter["document_id"])
+        return None
+
+    def _ensure_resident(self, document_id: str):
+        """Load a document's rows into the matrix engine unless they are already resident"""
+        if self.residency.get(document_id) is not None and self.vector_store.has_partition(document_id):
+            return
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, content, metadata, embedding FROM chunks WHERE document_id = ?", (document_id,)
+            ).fetchall()
+        if not rows:
+            return
+
+        segment = VectorSegment(
+            ids=[row[0] for row in rows],
+            texts=[row[1] for row in rows],
+            metadatas=[json.loads(row[2]) for row in rows],
+            vectors=np.vstack([np.frombuffer(row[3], dtype=np.float32) for row in rows]),
+        )
+        # Searches keep using the previous rows until the reloaded partition is published whole
+        with self.vector_store.writing():
+            self.vector_store.drop_partition(document_id)
+            self.vector_store.add_segment(segment)
+            for _, partitions in self.residency.touch(document_id, [document_id]):
+                for partition in partitions:
+                    self.vector_store.drop_partition(partition)
+
+    def add_documents(
+        self,
+        texts: List[str],
+        metadatas: List[Dict],
+        ids: Optional[List[str]] = None,
+        embeddings: Optional[List[List[float]]] = None
+    ) -> tuple[List[str], bool]:
+        if not ids:
+            ids = [str(uuid.uuid4()) for _ in texts]
+
+        print(f"Adding {len(texts)} documents to SQLite vector store...")
+
+        try:
+            vectors = MatrixIndex.normalize(embeddings if embeddings is not None else self.embeddings.embed_documents(texts))
+            document_ids = [MatrixVectorStore.partition_key(metadata) for metadata in metadatas]
+
+            with self._lock:
+                with self._conn:
+                    # The document is incomplete again until this ingestion is finalized
+                    self._conn.executemany(
+                        "DELETE FROM documents WHERE document_id = ?", [(document_id,) for document_id in set(document_ids)]
+                    )
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO chunks (id, document_id, content, metadata, embedding) VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (doc_id, document_id, text, json.dumps(metadata), vector.tobytes())
+                            for doc_id, document_id, text, metadata, vector in zip(ids, document_ids, texts, metadatas, vectors)
+                        ]
+                    )
+
+            # Keep resident partitions in step; other documents load on their next search
+            resident = [i for i, document_id in enumerate(document_ids) if document_id in self.residency]
+            if resident:
+                self.vector_store.add_segment(VectorSegment(
+                    ids=[ids[i] for i in resident],
+                    texts=[texts[i] for i in resident],
+                    metadatas=[metadatas[i] for i in resident],
+                    vectors=vectors[resident],
+                ))
+
+            print(f"Successfully added {len(ids)} documents to SQLite vector store")
+            return list(ids), False  # cache_used is always False since caching is handled in DocumentEmbedder
+
+        except Exception as e:
+            print(f"Error adding documents to SQLite vector store: {e}")
+            raise
+
+    async def aadd_documents(
+        self,
+        texts: List[str],
+        metadatas: List[Dict],
+        ids: Optional[List[str]] = None,
+        embeddings: Optional[List[List[float]]] = None
+    ) -> tuple[List[str], bool]:
+        return await asyncio.to_thread(self.add_documents, texts, metadatas, ids, embeddings)
+
+    def _scan(self, query_vector: np.ndarray, k: int, filter: Optional[Dict]) -> List[Tuple[Document, float]]:
+        """Exact top-k over the whole table, scoring one block of blobs at a time"""
+        query = MatrixIndex.normalize(query_vector)[0]
+        conditions = dict(filter or {})
+
+        best: List[Tuple[float, Tuple]] = []
+        with self._lock:
+            cursor = self._conn.execute("SELECT id, content, metadata, embedding FROM chunks")
+            while True:
+                block = cursor.fetchmany(self.SCAN_BATCH_ROWS)
+                if not block:
+                    break
+                if conditions:
+                    block = [
+                        row for row in block
+                        if all(json.loads(row[2]).get(key) == value for key, value in conditions.items())
+                    ]
+                    if not block:
+                        continue
+                scores = np.vstack([np.frombuffer(row[3], dtype=np.float32) for row in block]) @ query
+                order, top_scores = MatrixIndex.top_k(scores, k)
+                best.extend((float(score), block[i]) for i, score in zip(order, top_scores))
+                best = sorted(best, key=lambda hit: hit[0], reverse=True)[:k]
+
+        return [
+            (Document(id=row[0], page_content=row[1], metadata=json.loads(row[2])), score)
+            for score, row in best
+        ]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 10,
+        filter: Optional[Dict] = None
+    ) -> List[tuple]:
+        document_id = self._scoped_document_id(filter)
+        if document_id is not None:
+            self._ensure_resident(document_id)
+            return self.vector_store.similarity_search_with_score(query=query, k=k, filter=filter)
+
+        return self._scan(self.embeddings.embed_query(query), k, filter)
+
+    async def asimilarity_search_with_score(
+        self,
+        query: str,
+        k: int = 10,
+        filter: Optional[Dict] = None
+    ) -> List[tuple]:
+        try:
+            document_id = self._scoped_document_id(filter)
+            if document_id is not None:
+                await asyncio.to_thread(self._ensure_resident, document_id)
+                return await self.vector_store.asimilarity_search_with_score(query=query, k=k, filter=filter)
+
+            query_vector = await self.embeddings.aembed_query(query)
+            return await asyncio.to_thread(self._scan, query_vector, k, filter)
+
+        except Exception as e:
+            print(f"Error during similarity search with score: {e}")
+            return []
+
+    async def asimilarity_search_batch(
+        self,
+        queries: List[str],
+        k: int = 10,
+        filter: Optional[Dict] = None
+    ) -> List[List[tuple]]:
+        document_id = self._scoped_document_id(filter)
+        if document_id is None:
+            return await super().asimilarity_search_batch(queries, k=k, filter=filter)
+
+        try:
+            await asyncio.to_thread(self._ensure_resident, document_id)
+            return await self.vector_store.asimilarity_search_batch(queries=queries, k=k, filter=filter)
+
+        except Exception as e:
+            print(f"Error during batched similarity search: {e}")
+            return [[] for _ in queries]
+
+    async def asimilarity_search_hits_batch(
+        self,
+        queries: List[str],
+        k: int = 10,
+        filter: Optional[Dict] = None
+    ) -> List[SearchHits]:
+        document_id = self._scoped_document_id(filter)
+        if document_id is None:
+            return await super().asimilarity_search_hits_batch(queries, k=k, filter=filter)
+
+        try:
+            await asyncio.to_thread(self._ensure_resident, document_id)
+            return await self.vector_store.asimilarity_search_hits_batch(queries=queries, k=k, filter=filter)
+
+        except Exception as e:
+            print(f"Error during batched similarity search: {e}")
+            return [SearchHits.empty() for _ in queries]
+
+    async def amax_marginal_relevance_search_batch(
+        self,
+        queries: List[str],
+        k: int = 10,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict] = None
+    ) -> List[List[tuple]]:
+        document_id = self._scoped_document_id(filter)
+        if document_id is None:
+            return await super().amax_marginal_relevance_search_batch(queries, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter)
+
+        try:
+            await asyncio.to_thread(self._ensure_resident, document_id)
+            return await self.vector_store.amax_marginal_relevance_search_batch(
+                queries=queries,
+                k=k,
+                fetch_k=fetch_k,
+                lambda_mult=lambda_mult,
+                filter=filter
+            )
+
+        except Exception as e:
+            print(f"Error during batched MMR search: {e}")
+            return [[] for _ in queries]
+
+    async def amax_marginal_relevance_search_hits_batch(
+        self,
+        queries: List[str],
+        k: int = 10,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict] = None
+    ) -> List[SearchHits]:
+        document_id = self._scoped_document_id(filter)
+        if document_id is None:
+            return await super().amax_marginal_relevance_search_hits_batch(queries, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter)
+
+        try:
+            await asyncio.to_thread(self._ensure_resident, document_id)
+            return await self.vector_store.amax_marginal_relevance_search_hits_batch(
+                queries=queries,
+                k=k,
+                fetch_k=fetch_k,
+                lambda_mult=lambda_mult,
+                filter=filter
+            )
+
+        except Exception as e:
+            print(f"Error during batched MMR search: {e}")
+            return [SearchHits.empty() for _ in queries]
+
+    def as_retriever(self, **kwargs) -> Any:
+        # Retrievers read from the resident partitions; call load_from_cache for the documents they need
+        return self.vector_store.as_retriever(**kwargs)
+
+    def delete_documents(
+        self,
+        ids: List[str]
+    ) -> bool:
+        try:
+            deleted = 0
+            with self._lock:
+                with self._conn:
+                    for start in range(0, len(ids), self.DELETE_BATCH_ROWS):
+                        batch = ids[start:start + self.DELETE_BATCH_ROWS]
+                        placeholders = ",".join("?" for _ in batch)
+                        # Documents that lose chunks are no longer complete
+                        self._conn.execute(
+                            f"DELETE FROM documents WHERE document_id IN (SELECT DISTINCT document_id FROM chunks WHERE id IN ({placeholders}))",
+                            batch
+                        )
+                        deleted += self._conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch).rowcount
+            self.vector_store.delete(ids)
+
+            if deleted:
+                print(f"Deleted {deleted} documents from SQLite vector store")
+                return True
+            print("No documents were deleted (they may not exist)")
+            return False
+
+        except Exception as e:
+            print(f"Error deleting documents from SQLite vector store: {e}")
+            return False
+
+    def get_document_count(self) -> int:
+        try:
+            with self._lock:
+                return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        except Exception as e:
+            print(f"Error getting document count from SQLite vector store: {e}")
+            return 0
+
+    def delete_all_documents(self) -> bool:
+        try:
+            with self._lock:
+                with self._conn:
+                    self._conn.execute("DELETE FROM chunks")
+                    self._conn.execute("DELETE FROM documents")
+            self.vector_store.clear()
+            self.residency.discard()
+            print("Deleted all documents from SQLite vector store")
+            return True
+        except Exception as e:
+            print(f"Error deleting all documents from SQLite vector store: {e}")
+            return False
+
+    def supports_caching(self) -> bool:
+        """Every added chunk is durable; a document is cached once its ingestion is finalized"""
+        return True
+
+    def begin_document(self, document_url: str, document_id: Optional[str] = None):
+        """Drop the rows of any earlier attempt so a retried ingestion does not stack on top of them"""
+        document_id = document_id or self._document_id_for_url(document_url)
+        try:
+            with self._lock:
+                with self._conn:
+                    self._conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+                    self._conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+            self.vector_store.drop_partition(document_id)
+            self.residency.discard(document_id)
+        except Exception as e:
+            print(f"Error resetting document in SQLite vector store: {e}")
+
+    def finalize_document(self, document_url: str, document_id: Optional[str] = None):
+        """Mark the document complete so has_cache reports it"""
+        document_id = document_id or self._document_id_for_url(document_url)
+        try:
+            with self._lock:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO documents (document_id, chunk_count, completed_at) "
+                        "SELECT ?, COUNT(*), ? FROM chunks WHERE document_id = ?",
+                        (document_id, time.time(), document_id)
+                    )
+        except Exception as e:
+            print(f"Error marking document complete in SQLite vector store: {e}")
+
+    async def abegin_document(self, document_url: str, document_id: Optional[str] = None):
+        await asyncio.to_thread(self.begin_document, document_url, document_id)
+
+    async def afinalize_document(self, document_url: str, document_id: Optional[str] = None):
+        await asyncio.to_thread(self.finalize_document, document_url, document_id)
+
+    def has_cache(self, document_url: str) -> bool:
+        document_id = self._document_id_for_url(document_url)
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT 1 FROM documents WHERE document_id = ? AND chunk_count > 0", (document_id,)
+                ).fetchone()
+            return row is not None
+        except Exception as e:
+            print(f"Error checking cache for URL: {e}")
+            return False
+
+    async def ahas_cache(self, document_url: str) -> bool:
+        return await asyncio.to_thread(self.has_cache, document_url)
+
+    def load_from_cache(self, document_url: str) -> bool:
+        try:
+            if not self.has_cache(document_url):
+                return False
+            self._ensure_resident(self._document_id_for_url(document_url))
+            print(f"Loaded stored vectors for: {document_url[:50]}...")
+            return True
+        except Exception as e:
+            print(f"Error loading from cache: {e}")
+            return False
+
+    async def aload_from_cache(self, document_url: str) -> bool:
+        return await asyncio.to_thread(self.load_from_cache, document_url)
+
+    def save_to_cache(self, document_url: str) -> bool:
+        # Rows are committed as they are added; there is nothing left to persist
+        return self.has_cache(document_url)
+
+    def clear_cache(self, document_url: Optional[str] = None) -> bool:
+        """Release resident matrices; the SQLite rows themselves are kept"""
+        if document_url is None:
+            self.vector_store.clear()
+            self.residency.discard()
+        else:
+            document_id = self._document_id_for_url(document_url)
+            self.vector_store.drop_partition(document_id)
+            self.residency.discard(document_id)
+        return True
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            documents = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {
+            "disk": {
+                "db_path": self.db_path,
+                "total_documents": documents,
+                "total_size_mb": round(Path(self.db_path).stat().st_size / (1024 * 1024), 2),
+            },
+            "memory": {
+                **self.residency.get_stats(),
+                "resident_vector_mb": round(self.vector_store.resident_bytes / (1024 * 1024), 2),
+            },
+            "embeddings": self.embeddings.get_cache_stats(),
+        }
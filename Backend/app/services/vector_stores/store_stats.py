@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+import asyncio
+import time
+
+
+class StoreStatsMonitor:
+    """
+    Vector store statistics refreshed in the background and served from memory.
+
+    Counting documents can mean a full-table count on the backend, so health
+    endpoints read the last refreshed values instead of querying per probe.
+    Every snapshot reports when it was taken and how old it is.
+    """
+
+    def __init__(self, vector_store, refresh_seconds: int = 60):
+        self.vector_store = vector_store
+        self.refresh_seconds = max(1, refresh_seconds)
+        self.document_count: Optional[int] = None
+        self.cache_stats: Optional[Dict] = None
+        self.refreshed_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def ensure_started(self):
+        """Start the refresh loop on the running event loop if it is not already going"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_seconds)
+
+    async def refresh(self):
+        try:
+            if hasattr(self.vector_store, 'aget_document_count'):
+                document_count = await self.vector_store.aget_document_count()
+            else:
+                document_count = await asyncio.to_thread(self.vector_store.get_document_count)
+            cache_stats = None
+            if hasattr(self.vector_store, 'get_cache_stats'):
+                cache_stats = await asyncio.to_thread(self.vector_store.get_cache_stats)
+
+            self.document_count = document_count
+            self.cache_stats = cache_stats
+            self.refreshed_at = time.time()
+            self.last_error = None
+
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Error refreshing vector store stats: {e}")
+
+    @property
+    def ready(self) -> bool:
+        return self.refreshed_at is not None and self.last_error is None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "document_count": self.document_count,
+            "cache_stats": self.cache_stats,
+            "stats_refreshed_at": datetime.fromtimestamp(self.refreshed_at, timezone.utc).isoformat() if self.refreshed_at else None,
+            "stats_age_seconds": round(time.time() - self.refreshed_at, 1) if self.refreshed_at else None,
+            "stats_error": self.last_error,
+        }
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,147 @@
+import asyncio
+from typing import List, Dict, Optional, Any, Tuple
+import httpx
+
+
+class SupabaseRestClient:
+    """
+    Async access to the Supabase PostgREST endpoints the vector store uses.
+
+    One pooled keep-alive httpx.AsyncClient is shared by every call, and a
+    semaphore caps how many requests are in flight, so a burst of questions
+    reuses a handful of connections instead of opening one each. Clients are
+    created lazily, one per event loop (e.g. scripts that call asyncio.run more
+    than once); clients of loops that have since closed are dropped, and
+    aclose() closes the rest.
+    Pass `transport` (such as httpx.MockTransport) to run against a stand-in server.
+    """
+
+    def __init__(
+        self,
+        supabase_url: str,
+        supabase_key: str,
+        table_name: str = "documents",
+        query_name: str = "match_documents",
+        max_connections: int = 20,
+        max_concurrency: int = 16,
+        timeout: float = 15.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.base_url = f"{supabase_url.rstrip('/')}/rest/v1"
+        self.table_name = table_name
+        self.query_name = query_name
+        self.max_connections = max_connections
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.transport = transport
+        self.headers = {
+            "apikey": supabase_key,
+            "Authorization": f"Bearer {supabase_key}",
+            "Content-Type": "application/json",
+        }
+
+        # Connections and the semaphore belong to one event loop
+        self._sessions: Dict[asyncio.AbstractEventLoop, Tuple[httpx.AsyncClient, asyncio.Semaphore]] = {}
+
+    def _session(self) -> Tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None:
+            # A closed loop's connections died with it; forget them so they are not kept reachable
+            for stale in [other for other in self._sessions if other.is_closed()]:
+                del self._sessions[stale]
+            session = self._sessions[loop] = (
+                httpx.AsyncClient(
+                    base_url=self.base_url,
+                    headers=self.headers,
+                    timeout=httpx.Timeout(self.timeout),
+                    limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                    transport=self.transport,
+                ),
+                asyncio.Semaphore(self.max_concurrency),
+            )
+        return session
+
+    async def _request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        client, semaphore = self._session()
+        async with semaphore:
+            response = await client.request(method, path, **kwargs)
+        response.raise_for_status()
+        return response
+
+    async def match(self, query_embedding: List[float], k: int, filter: Optional[Dict] = None) -> List[Dict[str, Any]]:
+        """Rows from the match RPC (id, content, metadata, similarity), best first"""
+        payload: Dict[str, Any] = {"query_embedding": query_embedding}
+        if filter:
+            payload["filter"] = filter
+        response = await self._request("POST", f"/rpc/{self.query_name}", params={"limit": k}, json=payload)
+        return response.json()
+
+    async def upsert(self, rows: List[Dict[str, Any]], chunk_size: int = 500, table: Optional[str] = None) -> int:
+        """Insert or replace rows by primary key; chunks are sent concurrently within the request cap"""
+        chunks = [rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size)]
+        await asyncio.gather(*[
+            self._request(
+                "POST",
+                f"/{table or self.table_name}",
+                json=chunk,
+                headers={"Prefer": "resolution=merge-duplicates,return=minimal"}
+            )
+            for chunk in chunks
+        ])
+        return len(rows)
+
+    async def fetch_document(self, document_id: str, page_size: int = 1000) -> List[Dict[str, Any]]:
+        """Every row (id, content, metadata, embedding) of one document, paged to stay under the API row cap"""
+        rows: List[Dict[str, Any]] = []
+        while True:
+            response = await self._request(
+                "GET",
+                f"/{self.table_name}",
+                params={
+                    "select": "id,content,metadata,embedding",
+                    "metadata->>document_id": f"eq.{document_id}",
+                    "order": "id",
+                    "limit": page_size,
+                    "offset": len(rows),
+                }
+            )
+            page = response.json()
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+
+    async def select(self, table: str, params: Dict[str, Any], count: bool = False) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Rows matching PostgREST query params, plus the exact total when `count` is set"""
+        response = await self._request(
+            "GET",
+            f"/{table}",
+            params=params,
+            headers={"Prefer": "count=exact"} if count else None
+        )
+        return response.json(), self._total(response) if count else None
+
+    async def select_all(self, table: str, params: Dict[str, Any], page_size: int = 1000) -> List[Dict[str, Any]]:
+        """Every row matching PostgREST query params, paged; params need a stable order, e.g. {"order": "id"}"""
+        rows: List[Dict[str, Any]] = []
+        while True:
+            page, _ = await self.select(table, {**params, "limit": page_size, "offset": len(rows)})
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+
+    @staticmethod
+    def _total(response: httpx.Response) -> int:
+        # Content-Range looks like "0-24/3573" or "*/0"
+        total = response.headers.get("content-range", "").rpartition("/")[2]
+        return int(total) if total.isdigit() else 0
+
+    async def aclose(self):
+        """Close every client; those of other running loops are closed on their own loop"""
+        current = asyncio.get_running_loop()
+        sessions, self._sessions = self._sessions, {}
+        for loop, (client, _) in sessions.items():
+            if loop is current:
+                await client.aclose()
+            elif loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
@@ -1,14 +1,46 @@
 from langchain_community.vectorstores import SupabaseVectorStore
 from supabase import create_client, Client
 from app.services.vector_stores.base_vector_store import BaseVectorStore
+from app.services.vector_stores.supabase_rest_client import SupabaseRestClient
+from app.services.vector_stores.matrix_vector_store import MatrixVectorStore
+from app.services.vector_stores.matrix_index import MatrixIndex
+from app.services.vector_stores.vector_segment import VectorSegment
+from app.services.vector_stores.document_residency import DocumentResidency
+from app.services.vector_stores.document_registry import DocumentRegistry
+from app.services.vector_stores.search_hits import SearchHits
 from app.services.embedders.embedding_factory import get_embedding_model
 from app.services.embedders.langchain_wrapper import LangChainEmbeddingWrapper
 from typing import List, Dict, Optional, Any
 from langchain_core.documents import Document
 from app.config.settings import settings
+import asyncio
+import hashlib
+import json
+import time
 import uuid
 
 class SupabaseVectorStoreService(BaseVectorStore):
+    """
+    Vector store backed by a Supabase (pgvector) table.
+
+    With SUPABASE_LOCAL_MIRROR enabled, async searches scoped to one
+    document_id are served from a local MatrixVectorStore: the first such
+    search pulls that document's rows and embeddings once, later ones never
+    leave the process. Mirrored documents are LRU-bounded, dropped whenever
+    this service writes or deletes their rows, and refetched after
+    SUPABASE_MIRROR_TTL_SECONDS to pick up writes from other processes.
+
+    Fully ingested documents are recorded in a registry table keyed by
+    document_id (chunk count, embedding model, ingest time) and cached
+    locally, so has_cache and per-document counts are a primary-key lookup
+    at most. A document without a registry row is not cached, even if some
+    of its chunks exist, and is remembered as missing for a short while.
+    Documents ingested before the registry existed are backfilled once by
+    the migration in the README.
+    """
+    
+    MIRROR_RETRY_SECONDS = 30  # Serve a document remotely this long after its mirror fetch failed
+
     def __init__(
         self, 
         supabase_url: str,
@@ -36,6 +68,32 @@ class SupabaseVectorStoreService(BaseVectorStore):
             chunk_size=settings.CHUNK_SIZE,
         )
         
+        # Async paths talk to PostgREST directly over one pooled connection set
+        self.rest_client = SupabaseRestClient(
+            supabase_url=supabase_url,
+            supabase_key=supabase_key,
+            table_name=table_name,
+            query_name=query_name,
+            max_connections=settings.SUPABASE_HTTP_MAX_CONNECTIONS,
+            max_concurrency=settings.SUPABASE_HTTP_MAX_CONCURRENCY,
+            timeout=settings.SUPABASE_HTTP_TIMEOUT_SECONDS,
+        )
+        
+        self.mirror = MatrixVectorStore(embedding=self.embeddings) if settings.SUPABASE_LOCAL_MIRROR else None
+        self.mirror_residency = DocumentResidency(max_documents=settings.SUPABASE_MIRROR_MAX_DOCUMENTS)
+        self._mirror_loaded_at: Dict[str, float] = {}
+        self._mirror_generation: Dict[str, int] = {}
+        self._mirror_loads: Dict[str, asyncio.Future] = {}
+        self._mirror_failed_at: Dict[str, float] = {}
+        
+        self.registry_table = settings.SUPABASE_REGISTRY_TABLE_NAME
+        self.registry = DocumentRegistry(
+            ttl_seconds=settings.SUPABASE_REGISTRY_TTL_SECONDS,
+            negative_ttl_seconds=settings.SUPABASE_REGISTRY_NEGATIVE_TTL_SECONDS
+        )
+        # Chunks added per document since its ingestion started; recorded by finalize_document
+        self._ingested_chunks: Dict[str, int] = {}
+        
         self.store_type = "supabase"
         
         self._verify_database_setup()
@@ -52,7 +110,8 @@ class SupabaseVectorStoreService(BaseVectorStore):
         self, 
         texts: List[str], 
         metadatas: List[Dict],
-        ids: Optional[List[str]] = None
+        ids: Optional[List[str]] = None,
+        embeddings: Optional[List[List[float]]] = None
     ) -> tuple[List[str], bool]:
         if not ids:
             ids = [str(uuid.uuid4()) for _ in texts]
@@ -65,7 +124,12 @@ class SupabaseVectorStoreService(BaseVectorStore):
                 for text, metadata in zip(texts, metadatas)
             ]
             
-            added_ids = self.vector_store.add_documents(documents, ids=ids)
+            if embeddings is not None:
+                added_ids = self.vector_store.add_vectors(embeddings, documents, ids=ids)
+            else:
+                added_ids = self.vector_store.add_documents(documents, ids=ids)
+            self._invalidate_mirror(metadatas)
+            self._count_ingested(metadatas)
             
             print(f"Successfully added {len(added_ids)} documents to Supabase")
             return added_ids, False  # cache_used is always False since caching is handled in DocumentEmbedder
@@ -87,6 +151,120 @@ class SupabaseVectorStoreService(BaseVectorStore):
         
         return self.vector_store.similarity_search_with_relevance_scores(query, **search_kwargs)
     
+    async def aadd_documents(
+        self, 
+        texts: List[str], 
+        metadatas: List[Dict],
+        ids: Optional[List[str]] = None,
+        embeddings: Optional[List[List[float]]] = None
+    ) -> tuple[List[str], bool]:
+        if not ids:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        
+        print(f"Adding {len(texts)} documents to Supabase (async)...")
+        
+        try:
+            if embeddings is None:
+                embeddings = await self.embeddings.aembed_documents(list(texts))
+            rows = [
+                {"id": doc_id, "content": text, "embedding": embedding, "metadata": metadata}
+                for doc_id, text, embedding, metadata in zip(ids, texts, embeddings, metadatas)
+            ]
+            await self.rest_client.upsert(rows, chunk_size=settings.CHUNK_SIZE)
+            self._invalidate_mirror(metadatas)
+            self._count_ingested(metadatas)
+            
+            print(f"Successfully added {len(ids)} documents to Supabase")
+            return ids, False
+            
+        except Exception as e:
+            print(f"Error adding documents to Supabase: {e}")
+            raise e
+    
+    def _count_ingested(self, metadatas: List[Dict]):
+        for metadata in metadatas:
+            document_id = MatrixVectorStore.partition_key(metadata)
+            self._ingested_chunks[document_id] = self._ingested_chunks.get(document_id, 0) + 1
+    
+    def _invalidate_mirror(self, metadatas: List[Dict]):
+        """Forget mirrored copies of the documents these rows belong to; the next search refetches them"""
+        if self.mirror is None:
+            return
+        for document_id in {MatrixVectorStore.partition_key(metadata) for metadata in metadatas}:
+            # Bumping the generation also voids a fetch that is still in flight
+            self._mirror_generation[document_id] = self._mirror_generation.get(document_id, 0) + 1
+            self._mirror_loaded_at.pop(document_id, None)
+            self._mirror_failed_at.pop(document_id, None)
+            self.mirror_residency.discard(document_id)
+            self.mirror.drop_partition(document_id)
+    
+    async def _amirrored(self, filter: Optional[Dict]) -> bool:
+        """True when a search with this filter can be answered from the local mirror"""
+        if self.mirror is None or not isinstance(filter, dict) or filter.get("document_id") is None:
+            return False
+        document_id = str(filter["document_id"])
+        
+        loaded_at = self._mirror_loaded_at.get(document_id)
+        ttl = settings.SUPABASE_MIRROR_TTL_SECONDS
+        if loaded_at is not None and (ttl <= 0 or time.monotonic() - loaded_at < ttl) and self.mirror_residency.get(document_id) is not None:
+            return self.mirror.has_partition(document_id)
+        
+        # A fetch that just failed is not retried by every search; those are served remotely meanwhile
+        failed_at = self._mirror_failed_at.get(document_id)
+        if failed_at is not None and time.monotonic() - failed_at < self.MIRROR_RETRY_SECONDS:
+            return False
+        
+        # Concurrent questions about the same document share one fetch
+        load = self._mirror_loads.get(document_id)
+        if load is None:
+            load = self._mirror_loads[document_id] = asyncio.ensure_future(self._load_mirror(document_id))
+            load.add_done_callback(lambda _: self._mirror_loads.pop(document_id, None))
+        try:
+            return await asyncio.shield(load)
+        except Exception as e:
+            self._mirror_failed_at[document_id] = time.monotonic()
+            print(f"Error mirroring document {document_id} from Supabase: {e}")
+            return False
+    
+    async def _load_mirror(self, document_id: str) -> bool:
+        generation = self._mirror_generation.get(document_id, 0)
+        rows = await self.rest_client.fetch_document(document_id)
+        if self._mirror_generation.get(document_id, 0) != generation:
+            # Re-ingested while we were fetching; serve remotely until the next search
+            return False
+        
+        with self.mirror.writing():
+            self.mirror.drop_partition(document_id)
+            if rows:
+                # PostgREST returns pgvector columns as "[x,y,...]" strings
+                self.mirror.add_segment(VectorSegment(
+                    ids=[row["id"] for row in rows],
+                    texts=[row["content"] for row in rows],
+                    metadatas=[row.get("metadata") or {} for row in rows],
+                    vectors=MatrixIndex.normalize([
+                        json.loads(row["embedding"]) if isinstance(row["embedding"], str) else row["embedding"]
+                        for row in rows
+                    ]),
+                ))
+            for _, partitions in self.mirror_residency.touch(document_id, [document_id]):
+                for partition in partitions:
+                    self.mirror.drop_partition(partition)
+                    self._mirror_loaded_at.pop(partition, None)
+        self._mirror_loaded_at[document_id] = time.monotonic()
+        self._mirror_failed_at.pop(document_id, None)
+        
+        print(f"Mirrored {len(rows)} rows of document {document_id} from Supabase")
+        return bool(rows)
+    
+    @staticmethod
+    def _match_results(rows: List[Dict[str, Any]]) -> List[tuple]:
+        # Same shape as SupabaseVectorStore: rows without content are skipped
+        return [
+            (Document(id=row.get("id"), page_content=row["content"], metadata=row.get("metadata") or {}), row.get("similarity", 0.0))
+            for row in rows
+            if row.get("content")
+        ]
+    
     async def asimilarity_search_with_score(
         self, 
         query: str, 
@@ -94,19 +272,113 @@ class SupabaseVectorStoreService(BaseVectorStore):
         filter: Optional[Dict] = None
     ) -> List[tuple]:
         try:
-            # Since Supabase doesn't support async operations, 
-            # we just call the sync version
-            results = self.similarity_search_with_score(
-                query=query, 
-                k=k,
-                filter=filter
-            )
-            return results
+            if await self._amirrored(filter):
+                return await self.mirror.asimilarity_search_with_score(query=query, k=k, filter=filter)
+            
+            query_embedding = await self.embeddings.aembed_query(query)
+            return self._match_results(await self.rest_client.match(query_embedding, k, filter))
             
         except Exception as e:
             print(f"Error during similarity search with score (async): {e}")
             return []
     
+    async def _aremote_search_batch(
+        self, 
+        queries: List[str], 
+        k: int,
+        filter: Optional[Dict]
+    ) -> List[List[tuple]]:
+        # One embedding request for all questions, then one match RPC per question vector
+        query_embeddings = await self.embeddings.aembed_queries(list(queries))
+        
+        matches = await asyncio.gather(*[
+            self.rest_client.match(embedding, k, filter)
+            for embedding in query_embeddings
+        ])
+        return [self._match_results(rows) for rows in matches]
+    
+    # Each batch entry point decides mirror vs. remote once and then calls that side directly,
+    # so a request never re-resolves the mirror through the base-class fallbacks
+    
+    async def asimilarity_search_batch(
+        self, 
+        queries: List[str], 
+        k: int = 10,
+        filter: Optional[Dict] = None
+    ) -> List[List[tuple]]:
+        try:
+            if await self._amirrored(filter):
+                return await self.mirror.asimilarity_search_batch(queries=queries, k=k, filter=filter)
+            return await self._aremote_search_batch(queries, k, filter)
+            
+        except Exception as e:
+            print(f"Error during batched similarity search: {e}")
+            return [[] for _ in queries]
+    
+    async def asimilarity_search_hits_batch(
+        self, 
+        queries: List[str], 
+        k: int = 10,
+        filter: Optional[Dict] = None
+    ) -> List[SearchHits]:
+        try:
+            if await self._amirrored(filter):
+                return await self.mirror.asimilarity_search_hits_batch(queries=queries, k=k, filter=filter)
+            return [SearchHits.from_documents(hits) for hits in await self._aremote_search_batch(queries, k, filter)]
+            
+        except Exception as e:
+            print(f"Error during batched similarity search: {e}")
+            return [SearchHits.empty() for _ in queries]
+    
+    async def amax_marginal_relevance_search_batch(
+        self, 
+        queries: List[str], 
+        k: int = 10,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict] = None
+    ) -> List[List[tuple]]:
+        try:
+            if await self._amirrored(filter):
+                return await self.mirror.amax_marginal_relevance_search_batch(
+                    queries=queries,
+                    k=k,
+                    fetch_k=fetch_k,
+                    lambda_mult=lambda_mult,
+                    filter=filter
+                )
+            # Remote rows carry no embeddings here, so this falls back to relevance order
+            results = await self._aremote_search_batch(queries, max(k, fetch_k), filter)
+            return [hits[:k] for hits in results]
+            
+        except Exception as e:
+            print(f"Error during batched MMR search: {e}")
+            return [[] for _ in queries]
+    
+    async def amax_marginal_relevance_search_hits_batch(
+        self, 
+        queries: List[str], 
+        k: int = 10,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict] = None
+    ) -> List[SearchHits]:
+        try:
+            if await self._amirrored(filter):
+                return await self.mirror.amax_marginal_relevance_search_hits_batch(
+                    queries=queries,
+                    k=k,
+                    fetch_k=fetch_k,
+                    lambda_mult=lambda_mult,
+                    filter=filter
+                )
+            results = await self._aremote_search_batch(queries, max(k, fetch_k), filter)
+            return [SearchHits.from_documents(hits[:k]) for hits in results]
+            
+        except Exception as e:
+            print(f"Error during batched MMR search: {e}")
+            return [SearchHits.empty() for _ in queries]
+    
     def as_retriever(self, **kwargs) -> Any:
         return self.vector_store.as_retriever(**kwargs)
     
@@ -116,6 +388,11 @@ class SupabaseVectorStoreService(BaseVectorStore):
     ) -> bool:
         try:
             result = self.supabase_client.table(self.table_name).delete().in_("id", ids).execute()
+            if self.mirror is not None:
+                self.mirror.delete(ids)
+            # Deleted rows come back with their metadata; recount only the documents they belonged to
+            for document_id in {MatrixVectorStore.partition_key(row.get("metadata")) for row in result.data or []}:
+                self._recount_registry(document_id)
             
             if result.data:
                 print(f"Deleted {len(result.data)} documents from Supabase")
@@ -129,16 +406,26 @@ class SupabaseVectorStoreService(BaseVectorStore):
             return False
     
     def get_document_count(self) -> int:
+        # Summed from the registry's per-document chunk counts instead of an exact count over the chunk table
         try:
-            query = self.supabase_client.table(self.table_name).select("id", count="exact")
-            
-            result = query.execute()
-            return result.count if result.count is not None else 0
+            total, start, page_size = 0, 0, 1000
+            while True:
+                result = self.supabase_client.table(self.registry_table).select("chunk_count").order("document_id").range(start, start + page_size - 1).execute()
+                rows = result.data or []
+                total += sum(row.get("chunk_count") or 0 for row in rows)
+                if len(rows) < page_size:
+                    return total
+                start += page_size
             
         except Exception as e:
             print(f"Error getting document count from Supabase: {e}")
             return 0
     
+    async def aget_document_count(self) -> int:
+        """Chunks across registered documents; errors reach the caller so the stats monitor can report them"""
+        rows = await self.rest_client.select_all(self.registry_table, {"select": "chunk_count", "order": "document_id"})
+        return sum(row.get("chunk_count") or 0 for row in rows)
+    
     def delete_all_documents(self) -> bool:
         try:
             print(f"Deleting all documents from Supabase table: {self.table_name}")
@@ -146,6 +433,9 @@ class SupabaseVectorStoreService(BaseVectorStore):
             result = self.supabase_client.table(self.table_name).delete().neq("id", "00000000-0000-0000-0000-000000000000").execute()
             deleted_count = len(result.data) if result.data else 0
             print(f"Deleted all {deleted_count} documents from Supabase")
+            self.supabase_client.table(self.registry_table).delete().neq("document_id", "").execute()
+            self.registry.discard()
+            self.clear_cache()
             
             return True
             
@@ -161,25 +451,118 @@ class SupabaseVectorStoreService(BaseVectorStore):
     def has_cache(self, document_url: str) -> bool:
         """Check if documents for the given URL (via document_id hash) exist in Supabase"""
         try:
-            # Generate document_id from URL hash (same logic as in rag.py)
-            import hashlib
-            document_id = hashlib.sha256(document_url.encode()).hexdigest()[:16]
-            
-            # Query for documents with this document_id
-            result = self.supabase_client.table(self.table_name).select("id").eq("metadata->>document_id", document_id).limit(1).execute()
-            
-            has_cache = len(result.data) > 0
-            if has_cache:
-                print(f"Found cached documents for URL: {document_url[:50]}...")
-            else:
-                print(f"No cached documents found for URL: {document_url[:50]}...")
+            has_cache = self._registry_entry(self._document_id(document_url)) is not None
+            self._log_cache_check(document_url, has_cache)
+            return has_cache
             
+        except Exception as e:
+            print(f"Error checking cache for URL: {e}")
+            return False
+    
+    async def ahas_cache(self, document_url: str) -> bool:
+        try:
+            has_cache = await self._aregistry_entry(self._document_id(document_url)) is not None
+            self._log_cache_check(document_url, has_cache)
             return has_cache
             
         except Exception as e:
             print(f"Error checking cache for URL: {e}")
             return False
     
+    def _registry_entry(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Registry row for a document, from the local cache or the registry table; a document without one is not cached"""
+        known, entry = self.registry.lookup(document_id)
+        if known:
+            return entry
+        
+        try:
+            result = self.supabase_client.table(self.registry_table).select("*").eq("document_id", document_id).limit(1).execute()
+        except Exception as e:
+            print(f"Warning: Could not read document registry '{self.registry_table}': {e}")
+            return None
+        if not result.data:
+            self.registry.put_missing(document_id)
+            return None
+        self.registry.put(result.data[0])
+        return result.data[0]
+    
+    async def _aregistry_entry(self, document_id: str) -> Optional[Dict[str, Any]]:
+        known, entry = self.registry.lookup(document_id)
+        if known:
+            return entry
+        
+        try:
+            rows, _ = await self.rest_client.select(self.registry_table, {"select": "*", "document_id": f"eq.{document_id}", "limit": 1})
+        except Exception as e:
+            print(f"Warning: Could not read document registry '{self.registry_table}': {e}")
+            return None
+        if not rows:
+            self.registry.put_missing(document_id)
+            return None
+        self.registry.put(rows[0])
+        return rows[0]
+    
+    def _register(self, document_id: str, chunk_count: int) -> Dict[str, Any]:
+        entry = DocumentRegistry.entry(document_id, chunk_count, self.embedding_model)
+        try:
+            self.supabase_client.table(self.registry_table).upsert(entry).execute()
+        except Exception as e:
+            print(f"Warning: Could not update document registry '{self.registry_table}': {e}")
+        self.registry.put(entry)
+        return entry
+    
+    def _recount_registry(self, document_id: str):
+        try:
+            result = self.supabase_client.table(self.table_name).select("id", count="exact").eq("metadata->>document_id", document_id).limit(1).execute()
+            if result.count:
+                self._register(document_id, result.count)
+            else:
+                self.supabase_client.table(self.registry_table).delete().eq("document_id", document_id).execute()
+                self.registry.discard(document_id)
+        except Exception as e:
+            print(f"Warning: Could not update document registry '{self.registry_table}': {e}")
+    
+    def begin_document(self, document_url: str, document_id: Optional[str] = None):
+        # Count only the chunks of this ingestion, not those of an earlier attempt that never finished
+        self._ingested_chunks.pop(document_id or self._document_id(document_url), None)
+    
+    def finalize_document(self, document_url: str, document_id: Optional[str] = None):
+        """Record a fully ingested document so later cache checks skip the chunk table"""
+        document_id = document_id or self._document_id(document_url)
+        chunk_count = self._ingested_chunks.pop(document_id, 0)
+        if chunk_count:
+            self._register(document_id, chunk_count)
+    
+    def get_document_chunk_count(self, document_url: str) -> int:
+        try:
+            entry = self._registry_entry(self._document_id(document_url))
+            return entry["chunk_count"] if entry else 0
+            
+        except Exception as e:
+            print(f"Error getting document chunk count from Supabase: {e}")
+            return 0
+    
+    async def aget_document_chunk_count(self, document_url: str) -> int:
+        try:
+            entry = await self._aregistry_entry(self._document_id(document_url))
+            return entry["chunk_count"] if entry else 0
+            
+        except Exception as e:
+            print(f"Error getting document chunk count from Supabase: {e}")
+            return 0
+    
+    @staticmethod
+    def _document_id(document_url: str) -> str:
+        # Same document_id hash as in rag.py
+        return hashlib.sha256(document_url.encode()).hexdigest()[:16]
+    
+    @staticmethod
+    def _log_cache_check(document_url: str, has_cache: bool):
+        if has_cache:
+            print(f"Found cached documents for URL: {document_url[:50]}...")
+        else:
+            print(f"No cached documents found for URL: {document_url[:50]}...")
+    
     def load_from_cache(self, document_url: str) -> bool:
         """For Supabase, loading from cache means the documents are already in the database"""
         try:
@@ -192,5 +575,48 @@ class SupabaseVectorStoreService(BaseVectorStore):
             print(f"Error loading from cache: {e}")
             return False
     
+    async def aload_from_cache(self, document_url: str) -> bool:
+        try:
+            has_cache = await self.ahas_cache(document_url)
+            if has_cache:
+                print("Documents are already available in Supabase (cached)")
+            return has_cache
+            
+        except Exception as e:
+            print(f"Error loading from cache: {e}")
+            return False
+    
+    def clear_cache(self, document_url: Optional[str] = None) -> bool:
+        """Drop mirrored documents; the Supabase rows themselves are kept"""
+        if self.mirror is None:
+            return False
+        if document_url is None:
+            self._mirror_loaded_at.clear()
+            self.mirror_residency.discard()
+            self.mirror.clear()
+        else:
+            self._invalidate_mirror([{"document_id": self._document_id(document_url)}])
+        return True
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        if self.mirror is None:
+            return {
+                "registry": self.registry.get_stats(),
+                "mirror": {"enabled": False},
+                "embeddings": self.embeddings.get_cache_stats(),
+            }
+        return {
+            "registry": self.registry.get_stats(),
+            "embeddings": self.embeddings.get_cache_stats(),
+            "mirror": {
+                "enabled": True,
+                **self.mirror_residency.get_stats(),
+                "resident_vector_mb": round(self.mirror.resident_bytes / (1024 * 1024), 2),
+            },
+        }
+    
+    async def aclose(self):
+        await self.rest_client.aclose()
+    
     
     
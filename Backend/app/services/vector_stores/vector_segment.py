@@ -0,0 +1,202 @@
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+import numpy as np
+from app.services.vector_stores.matrix_index import MatrixIndex
+from app.services.vector_stores.metadata_columns import MetadataColumns
+
+
+@dataclass
+class VectorSegment:
+    """
+    A batch of rows in the binary snapshot format.
+
+    On disk a segment is `<name>.f32`, a raw C-ordered float32 block of
+    L2-normalized vectors that is opened with np.memmap, plus `<name>.json`,
+    a sidecar with the row ids, texts and metadata. Loading therefore never
+    parses float literals; vector pages are faulted in on first use.
+    Segments written by a quantized store also carry `<name>.codes` (int8 or
+    float16) and, for int8, `<name>.scales`, so loading never re-quantizes.
+    Metadata is columnar: the sidecar holds each key's distinct values once and
+    `<name>.meta` holds the int32 [keys, rows] code block, memory-mapped on load.
+    Sidecars with a plain "metadatas" list from older versions still load.
+    """
+    ids: List[str]
+    texts: List[str]
+    metadatas: MetadataColumns
+    vectors: np.ndarray
+    codes: Optional[np.ndarray] = None
+    scales: Optional[np.ndarray] = None
+
+    VECTOR_SUFFIX = ".f32"
+    SIDECAR_SUFFIX = ".json"
+    CODES_SUFFIX = ".codes"
+    SCALES_SUFFIX = ".scales"
+    META_SUFFIX = ".meta"
+
+    def __post_init__(self):
+        self.metadatas = MetadataColumns.coerce(self.metadatas)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dimension(self) -> int:
+        return int(self.vectors.shape[1]) if self.vectors.ndim == 2 else 0
+
+    @property
+    def quantization(self) -> str:
+        if self.codes is None:
+            return "none"
+        return "int8" if self.codes.dtype == np.int8 else "float16"
+
+    @classmethod
+    def from_records(cls, records: Dict[str, Dict[str, Any]]) -> "VectorSegment":
+        """Build a segment from the legacy InMemoryVectorStore JSON layout"""
+        entries = list(records.values())
+        vectors = MatrixIndex.normalize([entry["vector"] for entry in entries]) if entries else np.empty((0, 0), dtype=np.float32)
+        return cls(
+            ids=[entry["id"] for entry in entries],
+            texts=[entry["text"] for entry in entries],
+            metadatas=[entry["metadata"] for entry in entries],
+            vectors=vectors,
+        )
+
+    @classmethod
+    def concat(cls, segments: List["VectorSegment"]) -> "VectorSegment":
+        """Merge segments in order; a later row with the same id replaces the earlier one"""
+        latest: Dict[str, tuple] = {}
+        for segment_index, segment in enumerate(segments):
+            for row, doc_id in enumerate(segment.ids):
+                latest[doc_id] = (segment_index, row)
+
+        # Codes survive a merge only if every segment was quantized the same way
+        modes = {segment.quantization for segment in segments if len(segment)}
+        keep_codes = len(modes) == 1 and "none" not in modes
+
+        ids, texts, metadata_parts, blocks, code_blocks, scale_blocks = [], [], [], [], [], []
+        for segment_index, segment in enumerate(segments):
+            keep = [row for row, doc_id in enumerate(segment.ids) if latest[doc_id] == (segment_index, row)]
+            if not keep:
+                continue
+            whole = len(keep) == len(segment)
+            ids.extend(segment.ids[row] for row in keep)
+            texts.extend(segment.texts[row] for row in keep)
+            metadata_parts.append(segment.metadatas if whole else segment.metadatas.take(keep))
+            blocks.append(segment.vectors if whole else segment.vectors[keep])
+            if keep_codes:
+                code_blocks.append(segment.codes if whole else segment.codes[keep])
+                if segment.scales is not None:
+                    scale_blocks.append(segment.scales if whole else segment.scales[keep])
+
+        if not blocks:
+            dimension = next((segment.dimension for segment in segments if segment.dimension), 0)
+            return cls(ids=[], texts=[], metadatas=[], vectors=np.empty((0, dimension), dtype=np.float32))
+        vectors = np.concatenate(blocks).astype(np.float32, copy=False)
+        codes = np.concatenate(code_blocks) if code_blocks else None
+        scales = np.concatenate(scale_blocks) if scale_blocks else None
+        metadatas = MetadataColumns.concat(metadata_parts)
+        return cls(ids=ids, texts=texts, metadatas=metadatas, vectors=vectors, codes=codes, scales=scales)
+
+    @staticmethod
+    def _replace_atomic(path: Path, write):
+        temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            write(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+    def write(self, directory: Path, name: str) -> int:
+        """Write the segment and return the number of bytes persisted"""
+        vector_path = directory / f"{name}{self.VECTOR_SUFFIX}"
+        sidecar_path = directory / f"{name}{self.SIDECAR_SUFFIX}"
+
+        vectors = np.ascontiguousarray(self.vectors, dtype=np.float32)
+        self._replace_atomic(vector_path, lambda path: vectors.tofile(path))
+
+        written = [vector_path]
+        if self.codes is not None:
+            codes_path = directory / f"{name}{self.CODES_SUFFIX}"
+            self._replace_atomic(codes_path, lambda path: np.ascontiguousarray(self.codes).tofile(path))
+            written.append(codes_path)
+        if self.scales is not None:
+            scales_path = directory / f"{name}{self.SCALES_SUFFIX}"
+            self._replace_atomic(scales_path, lambda path: np.ascontiguousarray(self.scales, dtype=np.float32).tofile(path))
+            written.append(scales_path)
+
+        metadata_keys, metadata_values, metadata_codes = self.metadatas.to_parts()
+        meta_path = directory / f"{name}{self.META_SUFFIX}"
+        self._replace_atomic(meta_path, lambda path: metadata_codes.tofile(path))
+        written.append(meta_path)
+
+        sidecar = {
+            "format": "f32",
+            "quantization": self.quantization,
+            "count": len(self.ids),
+            "dimension": self.dimension,
+            "ids": self.ids,
+            "texts": self.texts,
+            "metadata_keys": metadata_keys,
+            "metadata_values": metadata_values,
+        }
+
+        def write_sidecar(path: Path):
+            with open(path, 'w') as f:
+                json.dump(sidecar, f)
+
+        # The sidecar is written last so a present sidecar implies a complete vector block
+        self._replace_atomic(sidecar_path, write_sidecar)
+        return sum(path.stat().st_size for path in written + [sidecar_path])
+
+    @classmethod
+    def read(cls, directory: Path, name: str) -> "VectorSegment":
+        with open(directory / f"{name}{cls.SIDECAR_SUFFIX}", 'r') as f:
+            sidecar = json.load(f)
+
+        count, dimension = sidecar["count"], sidecar["dimension"]
+        if "metadata_keys" in sidecar:
+            keys = sidecar["metadata_keys"]
+            if count and keys:
+                codes = np.memmap(directory / f"{name}{cls.META_SUFFIX}", dtype=np.int32, mode="r", shape=(len(keys), count))
+            else:
+                codes = np.empty((len(keys), count), dtype=np.int32)
+            metadatas = MetadataColumns.from_parts(keys, sidecar["metadata_values"], codes)
+        else:
+            metadatas = MetadataColumns.from_dicts(sidecar["metadatas"])
+
+        if not count:
+            vectors = np.empty((0, dimension), dtype=np.float32)
+            return cls(ids=sidecar["ids"], texts=sidecar["texts"], metadatas=metadatas, vectors=vectors)
+
+        vectors = np.memmap(directory / f"{name}{cls.VECTOR_SUFFIX}", dtype=np.float32, mode="r", shape=(count, dimension))
+        codes = scales = None
+        quantization = sidecar.get("quantization", "none")
+        if quantization != "none":
+            code_dtype = np.int8 if quantization == "int8" else np.float16
+            codes = np.memmap(directory / f"{name}{cls.CODES_SUFFIX}", dtype=code_dtype, mode="r", shape=(count, dimension))
+            if quantization == "int8":
+                scales = np.memmap(directory / f"{name}{cls.SCALES_SUFFIX}", dtype=np.float32, mode="r", shape=(count,))
+
+        return cls(
+            ids=sidecar["ids"],
+            texts=sidecar["texts"],
+            metadatas=metadatas,
+            vectors=vectors,
+            codes=codes,
+            scales=scales,
+        )
+
+    @classmethod
+    def files(cls, directory: Path, name: str) -> List[Path]:
+        return [
+            directory / f"{name}{cls.VECTOR_SUFFIX}",
+            directory / f"{name}{cls.CODES_SUFFIX}",
+            directory / f"{name}{cls.SCALES_SUFFIX}",
+            directory / f"{name}{cls.META_SUFFIX}",
+            directory / f"{name}{cls.SIDECAR_SUFFIX}",
+        ]
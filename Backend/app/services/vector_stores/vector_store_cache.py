@@ -2,22 +2,118 @@ import os
 import hashlib
 import json
 import shutil
+import tarfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+import zstandard
+from app.services.vector_stores.vector_segment import VectorSegment
+from app.services.vector_stores.ann_index import AnnIndex, AnnIndexFactory
+from app.services.vector_stores.process_lock import ProcessLock
 from app.config.settings import settings
 
 class VectorStoreCache:
+    """
+    Disk cache of per-document vector records.
+
+    Entries are either a legacy single `.vs` JSON dump or a `<key>.seg/`
+    directory holding an append-only list of binary VectorSegments plus a
+    manifest. Each ingestion batch appends one segment with only its new rows,
+    and a background compaction merges segments into a single memory-mappable
+    snapshot once too many accumulate.
+    
+    The directory is kept under a byte budget and a maximum entry age: expired
+    entries are dropped first, then least-recently-accessed ones until the
+    total fits. Hit/miss/eviction counters are reported by get_cache_stats().
+    
+    Several worker processes can share one cache directory: entry and metadata
+    locks are flock()-based, metadata edits re-read the file before writing, and
+    readers pick up entries other workers registered. Because snapshots are
+    opened read-only with np.memmap, workers that load the same entry map the
+    same page-cache pages instead of holding private copies.
+    
+    Entries not accessed for `cold_after_seconds` are moved to a cold tier:
+    their files are packed into one zstd-compressed `<key>.cold.zst` archive
+    by the background thread, and unpacked back in place on the next load.
+    On startup, temp dumps and partial writes left by killed ingestions, and
+    metadata entries whose files are gone, are swept.
+    
+    Construction runs that startup maintenance and starts a background thread,
+    so services get the process-wide instance for their directory from shared().
+    """
+    
+    MANIFEST_NAME = "manifest.json"
+    COLD_SUFFIX = ".cold.zst"
+    TEMP_DUMP_PREFIX = "temp_vector_store_"
+    ORPHAN_GRACE_SECONDS = 3600  # Younger leftovers may belong to an ingestion still running in another worker
+    TIERING_INTERVAL_SECONDS = 3600
+    ACCESS_RECORD_INTERVAL_SECONDS = 60  # Throttle for persisting hits served from memory
+    
+    _shared: Dict[Path, "VectorStoreCache"] = {}
+    _shared_guard = threading.Lock()
+    
+    @classmethod
+    def shared(cls, cache_dir: str = "vector_store_cache") -> "VectorStoreCache":
+        """One cache per directory and process: the startup sweep, budget pass and compactor run once"""
+        key = Path(cache_dir).resolve()
+        with cls._shared_guard:
+            cache = cls._shared.get(key)
+            if cache is None:
+                cache = cls._shared[key] = cls(cache_dir)
+            return cache
     
-    def __init__(self, cache_dir: str = "vector_store_cache"):
+    def __init__(
+        self,
+        cache_dir: str = "vector_store_cache",
+        compaction_segments: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_age_seconds: Optional[int] = None,
+        cold_after_seconds: Optional[int] = None
+    ):
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(exist_ok=True)
         
+        self._locks_dir = self.cache_dir / ".locks"
+        self._metadata_lock = ProcessLock(self._locks_dir / "metadata.lock")
         self.metadata_file = self.cache_dir / "cache_metadata.json"
+        self._metadata_mtime = None
         self.metadata = self._load_metadata()
         
+        self.max_bytes = settings.VECTOR_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_age_seconds = settings.VECTOR_CACHE_MAX_AGE_SECONDS if max_age_seconds is None else max_age_seconds
+        self.cold_after_seconds = settings.VECTOR_CACHE_COLD_AFTER_SECONDS if cold_after_seconds is None else cold_after_seconds
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "evicted_bytes": 0, "demotions": 0, "promotions": 0}
+        
+        self.compaction_segments = compaction_segments or settings.VECTOR_CACHE_COMPACTION_SEGMENTS
+        self._locks: Dict[str, ProcessLock] = {}
+        self._locks_guard = threading.Lock()
+        self._compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vs-cache-compactor")
+        self._pending_compactions = set()
+        self._last_tiering = 0.0
+        self._last_recorded: Dict[str, float] = {}
+        self._last_used: Dict[str, float] = {}
+        
+        self.sweep_orphans()
+        self._refresh_entries()
+        self.enforce_budget()
+        self._maybe_schedule_tiering()
+        
         print(f"Vector store cache initialized at: {self.cache_dir}")
     
+    def _metadata_version(self) -> Optional[tuple]:
+        # Atomic replaces give the file a new inode, so (inode, mtime) changes on every write
+        try:
+            stat = self.metadata_file.stat()
+            return (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            return None
+    
     def _load_metadata(self) -> Dict[str, Any]:
+        self._metadata_mtime = self._metadata_version()
         if self.metadata_file.exists():
             try:
                 with open(self.metadata_file, 'r') as f:
@@ -27,35 +123,508 @@ class VectorStoreCache:
                 return {}
         return {}
     
+    def _sync_metadata(self):
+        """Pick up entries registered or dropped by other worker processes"""
+        if self._metadata_version() != self._metadata_mtime:
+            with self._metadata_lock:
+                self.metadata = self._load_metadata()
+    
     def _save_metadata(self):
         try:
-            with open(self.metadata_file, 'w') as f:
-                json.dump(self.metadata, f, indent=2)
+            with self._metadata_lock:
+                self._write_json_atomic(self.metadata_file, self.metadata, indent=2)
+                self._metadata_mtime = self._metadata_version()
         except Exception as e:
             print(f"Error saving cache metadata: {e}")
     
+    @contextmanager
+    def _editing_metadata(self):
+        """Read-modify-write of the metadata file under the cross-process lock"""
+        with self._metadata_lock:
+            self._sync_metadata()
+            yield self.metadata
+            self._save_metadata()
+    
+    def _entry_size(self, cache_key: str) -> int:
+        size = 0
+        cache_path = self._get_cache_path(cache_key)
+        if cache_path.exists():
+            size += cache_path.stat().st_size
+        segment_dir = self._get_segment_dir(cache_key)
+        if segment_dir.exists():
+            size += sum(f.stat().st_size for f in segment_dir.iterdir() if f.is_file())
+        cold_path = self._get_cold_path(cache_key)
+        if cold_path.exists():
+            size += cold_path.stat().st_size
+        return size
+    
+    def _refresh_entries(self):
+        """Backfill timestamps and sizes, e.g. for entries written before they were tracked"""
+        with self._editing_metadata() as metadata:
+            for cache_key, entry in metadata.items():
+                if not isinstance(entry.get("created_at"), (int, float)):
+                    paths = [p for p in (self._get_cache_path(cache_key), self._get_segment_dir(cache_key), self._get_cold_path(cache_key)) if p.exists()]
+                    entry["created_at"] = max((p.stat().st_mtime for p in paths), default=time.time())
+                entry.setdefault("last_accessed_at", entry["created_at"])
+                entry.setdefault("access_count", 0)
+                entry["size_bytes"] = self._entry_size(cache_key)
+    
+    def _update_entry_size(self, cache_key: str):
+        with self._editing_metadata() as metadata:
+            entry = metadata.get(cache_key)
+            if entry is not None:
+                entry["size_bytes"] = self._entry_size(cache_key)
+    
+    def _record_access(self, cache_key: str):
+        now = time.time()
+        self._last_recorded[cache_key] = now
+        with self._editing_metadata() as metadata:
+            entry = metadata.get(cache_key)
+            if entry is not None:
+                entry["last_accessed_at"] = now
+                entry["access_count"] = entry.get("access_count", 0) + 1
+    
+    def touch(self, document_url: str):
+        """Record a use served from memory, at most once per ACCESS_RECORD_INTERVAL_SECONDS per entry"""
+        cache_key = self._get_cache_key(document_url)
+        self._last_used[cache_key] = time.time()
+        if time.time() - self._last_recorded.get(cache_key, 0) < self.ACCESS_RECORD_INTERVAL_SECONDS:
+            return
+        try:
+            self._record_access(cache_key)
+        except Exception as e:
+            print(f"Error recording cache access: {e}")
+    
+    def _evict(self, cache_key: str, expired: bool = False):
+        with self._lock_for(cache_key):
+            self._drop_entry_files(cache_key)
+        with self._editing_metadata() as metadata:
+            entry = metadata.pop(cache_key, None)
+            if entry is None:
+                # Another worker already removed it
+                return
+            self.counters["expirations" if expired else "evictions"] += 1
+            self.counters["evicted_bytes"] += entry.get("size_bytes", 0)
+        print(f"{'Expired' if expired else 'Evicted'} cached vector store for URL: {entry.get('document_url', cache_key)[:50]}...")
+    
+    def enforce_budget(self, protect_url: Optional[str] = None) -> int:
+        """Drop expired entries, then least-recently-accessed ones until the byte budget fits"""
+        protected = self._get_cache_key(protect_url) if protect_url else None
+        now = time.time()
+        
+        with self._metadata_lock:
+            self._sync_metadata()
+            candidates = {key: entry for key, entry in self.metadata.items() if key != protected}
+            
+            expired = []
+            if self.max_age_seconds > 0:
+                expired = [key for key, entry in candidates.items() if now - entry.get("created_at", now) > self.max_age_seconds]
+            
+            over_budget = []
+            if self.max_bytes > 0:
+                total = sum(entry.get("size_bytes", 0) for key, entry in self.metadata.items() if key not in expired)
+                for key, entry in sorted(candidates.items(), key=lambda item: item[1].get("last_accessed_at", 0)):
+                    if total <= self.max_bytes:
+                        break
+                    if key in expired:
+                        continue
+                    over_budget.append(key)
+                    total -= entry.get("size_bytes", 0)
+        
+        for key in expired:
+            self._evict(key, expired=True)
+        for key in over_budget:
+            self._evict(key)
+        return len(expired) + len(over_budget)
+    
     def _get_cache_key(self, document_url: str) -> str:
         return hashlib.sha256(document_url.encode()).hexdigest()[:16]
     
     def _get_cache_path(self, cache_key: str) -> Path:
         return self.cache_dir / f"{cache_key}.vs"
     
+    def _get_segment_dir(self, cache_key: str) -> Path:
+        return self.cache_dir / f"{cache_key}.seg"
+    
+    def _get_cold_path(self, cache_key: str) -> Path:
+        return self.cache_dir / f"{cache_key}{self.COLD_SUFFIX}"
+    
+    def get_temp_dump_path(self) -> Path:
+        return self.cache_dir / f"{self.TEMP_DUMP_PREFIX}{uuid.uuid4().hex[:8]}.vs"
+    
+    def _lock_for(self, name: str) -> ProcessLock:
+        with self._locks_guard:
+            lock = self._locks.get(name)
+            if lock is None:
+                lock = self._locks[name] = ProcessLock(self._locks_dir / f"{name}.lock")
+            return lock
+    
+    def _entry_path(self, cache_key: str) -> Optional[Path]:
+        self._sync_metadata()
+        if cache_key not in self.metadata:
+            return None
+        segment_dir = self._get_segment_dir(cache_key)
+        if (segment_dir / self.MANIFEST_NAME).exists():
+            return segment_dir
+        cache_path = self._get_cache_path(cache_key)
+        if cache_path.exists():
+            return cache_path
+        cold_path = self._get_cold_path(cache_key)
+        if cold_path.exists():
+            return cold_path
+        return None
+    
     def has_cached_store(self, document_url: str) -> bool:
         cache_key = self._get_cache_key(document_url)
+        if self._entry_path(cache_key) is None:
+            self.counters["misses"] += 1
+            return False
+        return True
+    
+    def get_cache_path(self, document_url: str) -> Optional[str]:
+        cache_key = self._get_cache_key(document_url)
+        entry_path = self._entry_path(cache_key)
+        return str(entry_path) if entry_path else None
+    
+    @staticmethod
+    def _write_json_atomic(path: Path, payload: Any, indent: Optional[int] = None):
+        temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(temp_path, 'w') as f:
+            json.dump(payload, f, indent=indent)
+        os.replace(temp_path, path)
+    
+    def _read_manifest(self, segment_dir: Path) -> Dict[str, Any]:
+        with open(segment_dir / self.MANIFEST_NAME, 'r') as f:
+            return json.load(f)
+    
+    def _register_entry(self, document_url: str, cache_key: str, cache_path: Path):
+        now = time.time()
+        with self._editing_metadata() as metadata:
+            metadata[cache_key] = {
+                "document_url": document_url,
+                "cache_path": str(cache_path),
+                "created_at": now,
+                "last_accessed_at": now,
+                "access_count": 0,
+                "size_bytes": self._entry_size(cache_key),
+            }
+    
+    def _drop_entry_files(self, cache_key: str):
         cache_path = self._get_cache_path(cache_key)
-        
-        if cache_path.exists() and cache_key in self.metadata:
+        if cache_path.exists():
+            cache_path.unlink()
+        segment_dir = self._get_segment_dir(cache_key)
+        if segment_dir.exists():
+            shutil.rmtree(segment_dir, ignore_errors=True)
+        self._get_cold_path(cache_key).unlink(missing_ok=True)
+    
+    def _segment_files(self, segment_dir: Path, segment_name: str) -> List[Path]:
+        if segment_name.endswith(".vs"):
+            return [segment_dir / segment_name]
+        return VectorSegment.files(segment_dir, segment_name)
+    
+    def _read_segment(self, segment_dir: Path, segment_name: str) -> VectorSegment:
+        if segment_name.endswith(".vs"):
+            # JSON segment written before the binary snapshot format existed
+            with open(segment_dir / segment_name, 'r') as f:
+                return VectorSegment.from_records(json.load(f))
+        return VectorSegment.read(segment_dir, segment_name)
+    
+    def append_segment(self, document_url: str, segment: VectorSegment, reset: bool = False) -> bool:
+        """Persist only the given rows as a new segment; `reset` starts the entry over"""
+        if not len(segment):
+            return False
+        try:
+            cache_key = self._get_cache_key(document_url)
+            segment_dir = self._get_segment_dir(cache_key)
+            
+            with self._lock_for(cache_key):
+                if reset or not (segment_dir / self.MANIFEST_NAME).exists():
+                    self._drop_entry_files(cache_key)
+                    segment_dir.mkdir(parents=True, exist_ok=True)
+                    manifest = {"segments": [], "next_segment": 1}
+                    is_new_entry = True
+                else:
+                    manifest = self._read_manifest(segment_dir)
+                    self._sync_metadata()
+                    is_new_entry = cache_key not in self.metadata
+                
+                segment_name = f"seg-{manifest['next_segment']:06d}"
+                segment.write(segment_dir, segment_name)
+                
+                manifest["segments"].append(segment_name)
+                manifest["next_segment"] += 1
+                self._write_json_atomic(segment_dir / self.MANIFEST_NAME, manifest)
+                segment_count = len(manifest["segments"])
+            
+            if is_new_entry:
+                self._register_entry(document_url, cache_key, segment_dir)
+            else:
+                self._update_entry_size(cache_key)
+            self.enforce_budget(protect_url=document_url)
+            
+            if segment_count >= self.compaction_segments:
+                self.schedule_compaction(document_url)
+            self._maybe_schedule_tiering()
             return True
         
-        return False
+        except Exception as e:
+            print(f"Error appending vector store segment: {e}")
+            return False
     
-    def get_cache_path(self, document_url: str) -> Optional[str]:
+    def load_segments(self, document_url: str) -> Optional[List[VectorSegment]]:
+        """Open an entry's segments in order; binary vector blocks come back as read-only memmaps"""
         cache_key = self._get_cache_key(document_url)
-        cache_path = self._get_cache_path(cache_key)
+        entry_path = self._entry_path(cache_key)
+        if entry_path is None:
+            self.counters["misses"] += 1
+            return None
         
-        if cache_path.exists() and cache_key in self.metadata:
-            return str(cache_path)
-        return None
+        self.counters["hits"] += 1
+        self._record_access(cache_key)
+        self._maybe_schedule_tiering()
+        
+        if entry_path.name.endswith(self.COLD_SUFFIX):
+            with self._lock_for(cache_key):
+                promoted = self._promote(cache_key)
+            entry_path = self._entry_path(cache_key)
+            if not promoted or entry_path is None or entry_path.name.endswith(self.COLD_SUFFIX):
+                return None
+        
+        if entry_path.is_file():
+            with open(entry_path, 'r') as f:
+                return [VectorSegment.from_records(json.load(f))]
+        
+        with self._lock_for(cache_key):
+            segment_names = list(self._read_manifest(entry_path)["segments"])
+            segments = [self._read_segment(entry_path, name) for name in segment_names]
+        if len(segment_names) > 1:
+            # Map the segments as they are; the compactor folds them into one snapshot whose
+            # pages later loads share with every other worker
+            self.schedule_compaction(document_url)
+        return segments
+    
+    def schedule_compaction(self, document_url: str):
+        cache_key = self._get_cache_key(document_url)
+        with self._locks_guard:
+            if cache_key in self._pending_compactions:
+                return
+            self._pending_compactions.add(cache_key)
+        self._compactor.submit(self._run_compaction, document_url, cache_key)
+    
+    def _run_compaction(self, document_url: str, cache_key: str):
+        try:
+            self.compact(document_url)
+        finally:
+            with self._locks_guard:
+                self._pending_compactions.discard(cache_key)
+    
+    def compact(self, document_url: str) -> bool:
+        """Merge an entry's segments into one snapshot; batches appended meanwhile are kept after it"""
+        # One compaction per entry at a time across all workers; the next one sees the merged result
+        with self._lock_for(f"{self._get_cache_key(document_url)}.compact"):
+            return self._compact(document_url)
+    
+    def _compact(self, document_url: str) -> bool:
+        try:
+            cache_key = self._get_cache_key(document_url)
+            segment_dir = self._get_segment_dir(cache_key)
+            if not (segment_dir / self.MANIFEST_NAME).exists():
+                return False
+            
+            with self._lock_for(cache_key):
+                manifest = self._read_manifest(segment_dir)
+                merged_segments = list(manifest["segments"])
+                if len(merged_segments) <= 1 and not any(name.endswith(".vs") for name in merged_segments):
+                    return False
+                merged_name = f"seg-{manifest['next_segment']:06d}"
+                manifest["next_segment"] += 1
+                self._write_json_atomic(segment_dir / self.MANIFEST_NAME, manifest)
+            
+            # Merge outside the lock so ingestion can keep appending
+            merged = VectorSegment.concat([self._read_segment(segment_dir, name) for name in merged_segments])
+            merged.write(segment_dir, merged_name)
+            
+            with self._lock_for(cache_key):
+                manifest = self._read_manifest(segment_dir)
+                appended_since = [name for name in manifest["segments"] if name not in merged_segments]
+                manifest["segments"] = [merged_name] + appended_since
+                self._write_json_atomic(segment_dir / self.MANIFEST_NAME, manifest)
+            
+            # Open memmaps keep their pages after unlink, so resident readers are unaffected
+            for segment_name in merged_segments:
+                for path in self._segment_files(segment_dir, segment_name):
+                    path.unlink(missing_ok=True)
+            self._update_entry_size(cache_key)
+            
+            print(f"Compacted {len(merged_segments)} cache segments for URL: {document_url[:50]}...")
+            return True
+        
+        except Exception as e:
+            print(f"Error compacting vector store segments: {e}")
+            return False
+    
+    def _maybe_schedule_tiering(self):
+        if self.cold_after_seconds <= 0 or time.time() - self._last_tiering < self.TIERING_INTERVAL_SECONDS:
+            return
+        self._last_tiering = time.time()
+        with self._locks_guard:
+            if "tiering" in self._pending_compactions:
+                return
+            self._pending_compactions.add("tiering")
+        self._compactor.submit(self._run_tiering)
+    
+    def _run_tiering(self):
+        try:
+            self.demote_cold_entries()
+        finally:
+            with self._locks_guard:
+                self._pending_compactions.discard("tiering")
+    
+    def _is_cold(self, cache_key: str, entry: Dict[str, Any]) -> bool:
+        # Uses in this process that the touch throttle has not persisted yet count too
+        last_accessed = max(entry.get("last_accessed_at", time.time()), self._last_used.get(cache_key, 0))
+        idle = time.time() - last_accessed
+        return self.cold_after_seconds > 0 and idle > self.cold_after_seconds and entry.get("tier") != "cold"
+    
+    def demote_cold_entries(self) -> int:
+        """Compress every entry that has not been accessed for cold_after_seconds"""
+        self._sync_metadata()
+        cold = [key for key, entry in list(self.metadata.items()) if self._is_cold(key, entry)]
+        return sum(1 for key in cold if self._demote(key))
+    
+    def _demote(self, cache_key: str) -> bool:
+        try:
+            cold_path = self._get_cold_path(cache_key)
+            with self._lock_for(cache_key):
+                # Re-check under the lock: another worker may have loaded or dropped it meanwhile
+                self._sync_metadata()
+                entry = self.metadata.get(cache_key)
+                if entry is None or not self._is_cold(cache_key, entry):
+                    return False
+                sources = [p for p in (self._get_segment_dir(cache_key), self._get_cache_path(cache_key)) if p.exists()]
+                if not sources:
+                    return False
+                
+                temp_path = cold_path.with_name(f".{cold_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+                try:
+                    with open(temp_path, 'wb') as f:
+                        with zstandard.ZstdCompressor(level=settings.VECTOR_CACHE_ZSTD_LEVEL).stream_writer(f) as writer:
+                            with tarfile.open(fileobj=writer, mode="w|") as archive:
+                                for source in sources:
+                                    archive.add(source, arcname=source.name)
+                    os.replace(temp_path, cold_path)
+                finally:
+                    temp_path.unlink(missing_ok=True)
+                
+                # Open memmaps keep their pages after unlink, so resident readers are unaffected
+                for source in sources:
+                    if source.is_dir():
+                        shutil.rmtree(source, ignore_errors=True)
+                    else:
+                        source.unlink()
+            
+            with self._editing_metadata() as metadata:
+                entry = metadata.get(cache_key)
+                if entry is not None:
+                    entry["tier"] = "cold"
+                    entry["size_bytes"] = self._entry_size(cache_key)
+            self.counters["demotions"] += 1
+            print(f"Moved cached vector store to cold tier: {entry.get('document_url', cache_key)[:50] if entry else cache_key}...")
+            return True
+        
+        except Exception as e:
+            print(f"Error moving cache entry to cold tier: {e}")
+            return False
+    
+    def _promote(self, cache_key: str) -> bool:
+        """Unpack a cold archive back into the fast-loading layout; caller holds the entry lock"""
+        cold_path = self._get_cold_path(cache_key)
+        if not cold_path.exists():
+            return True
+        try:
+            staging = self.cache_dir / f".{cache_key}.{uuid.uuid4().hex[:8]}.promote"
+            staging.mkdir()
+            try:
+                with open(cold_path, 'rb') as f:
+                    with zstandard.ZstdDecompressor().stream_reader(f) as reader:
+                        with tarfile.open(fileobj=reader, mode="r|") as archive:
+                            archive.extractall(staging, filter="data")
+                for item in staging.iterdir():
+                    os.replace(item, self.cache_dir / item.name)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+            cold_path.unlink()
+            
+            with self._editing_metadata() as metadata:
+                entry = metadata.get(cache_key)
+                if entry is not None:
+                    entry["tier"] = "hot"
+                    entry["size_bytes"] = self._entry_size(cache_key)
+            self.counters["promotions"] += 1
+            return True
+        
+        except Exception as e:
+            print(f"Error restoring cold cache entry: {e}")
+            return False
+    
+    def sweep_orphans(self) -> int:
+        """Remove leftovers of killed ingestions and metadata entries whose files are gone"""
+        cutoff = time.time() - self.ORPHAN_GRACE_SECONDS
+        leftovers = (
+            list(self.cache_dir.glob(f"{self.TEMP_DUMP_PREFIX}*.vs"))
+            + list(self.cache_dir.glob(".*.tmp"))
+            + list(self.cache_dir.glob(".*.promote"))
+            + list(self.cache_dir.glob("*.seg/.*.tmp"))
+            + [d for d in self.cache_dir.glob("*.seg") if not (d / self.MANIFEST_NAME).exists()]
+        )
+        
+        removed = 0
+        for path in leftovers:
+            try:
+                if path.stat().st_mtime > cutoff:
+                    continue
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                continue
+        
+        with self._editing_metadata() as metadata:
+            missing = [key for key in metadata if self._entry_size(key) == 0 and not (self._get_segment_dir(key) / self.MANIFEST_NAME).exists()]
+            for key in missing:
+                metadata.pop(key)
+        
+        if removed or missing:
+            print(f"Swept {removed} orphaned cache files and {len(missing)} stale metadata entries")
+        return removed + len(missing)
+    
+    @staticmethod
+    def _ann_name(partition: str) -> str:
+        return f"ann-{partition or 'default'}"
+    
+    def load_ann(self, document_url: str, partition: str, factory: AnnIndexFactory) -> Optional[AnnIndex]:
+        segment_dir = self._get_segment_dir(self._get_cache_key(document_url))
+        if not segment_dir.exists():
+            return None
+        return factory.load(segment_dir, self._ann_name(partition))
+    
+    def save_ann(self, document_url: str, partition: str, ann: AnnIndex, factory: AnnIndexFactory) -> bool:
+        """Store a partition's ANN index beside its segments; it is reused only while the rows match"""
+        cache_key = self._get_cache_key(document_url)
+        segment_dir = self._get_segment_dir(cache_key)
+        try:
+            with self._lock_for(cache_key):
+                if not segment_dir.exists():
+                    return False
+                ann.save(factory.path_for(segment_dir, self._ann_name(partition)))
+            self._update_entry_size(cache_key)
+            return True
+        except Exception as e:
+            print(f"Error caching ANN index: {e}")
+            return False
     
     def cache_vector_store(self, document_url: str, vector_store_path: str) -> bool:
         try:
@@ -63,15 +632,12 @@ class VectorStoreCache:
             cache_path = self._get_cache_path(cache_key)
             
             if os.path.exists(vector_store_path):
-                shutil.move(vector_store_path, cache_path)
-                
-                self.metadata[cache_key] = {
-                    "document_url": document_url,
-                    "cache_path": str(cache_path),
-                    "created_at": json.dumps({"timestamp": "now"}),  
-                }
+                with self._lock_for(cache_key):
+                    self._drop_entry_files(cache_key)
+                    shutil.move(vector_store_path, cache_path)
                 
-                self._save_metadata()
+                self._register_entry(document_url, cache_key, cache_path)
+                self.enforce_budget(protect_url=document_url)
                 print(f"Cached vector store for URL: {document_url[:50]}...")
                 return True
             else:
@@ -84,6 +650,7 @@ class VectorStoreCache:
     
     def get_cache_info(self, document_url: str) -> Optional[Dict[str, Any]]:
         cache_key = self._get_cache_key(document_url)
+        self._sync_metadata()
         return self.metadata.get(cache_key)
     
     def clear_cache(self, document_url: Optional[str] = None):
@@ -91,37 +658,49 @@ class VectorStoreCache:
         try:
             if document_url:
                 cache_key = self._get_cache_key(document_url)
-                cache_path = self._get_cache_path(cache_key)
                 
-                if cache_path.exists():
-                    cache_path.unlink()
+                with self._lock_for(cache_key):
+                    self._drop_entry_files(cache_key)
                 
-                if cache_key in self.metadata:
-                    del self.metadata[cache_key]
+                with self._editing_metadata() as metadata:
+                    metadata.pop(cache_key, None)
                     
                 print(f"Cleared cache for URL: {document_url[:50]}...")
             else:
                 for cache_file in self.cache_dir.glob("*.vs"):
                     cache_file.unlink()
+                for segment_dir in self.cache_dir.glob("*.seg"):
+                    shutil.rmtree(segment_dir, ignore_errors=True)
+                for cold_path in self.cache_dir.glob(f"*{self.COLD_SUFFIX}"):
+                    cold_path.unlink()
                 
-                self.metadata.clear()
+                with self._editing_metadata() as metadata:
+                    metadata.clear()
                 print("Cleared all vector store cache")
             
-            self._save_metadata()
-            
         except Exception as e:
             print(f"Error clearing cache: {e}")
     
     def list_cached_urls(self) -> list:
+        self._sync_metadata()
         return [entry["document_url"] for entry in self.metadata.values()]
     
     def get_cache_stats(self) -> Dict[str, Any]:
-        cache_files = list(self.cache_dir.glob("*.vs"))
-        total_size = sum(f.stat().st_size for f in cache_files)
+        cache_files = list(self.cache_dir.glob("*.vs")) + list(self.cache_dir.glob("*.seg/*")) + list(self.cache_dir.glob(f"*{self.COLD_SUFFIX}"))
+        total_size = sum(f.stat().st_size for f in cache_files if f.is_file())
+        
+        lookups = self.counters["hits"] + self.counters["misses"]
+        self._sync_metadata()
         
         return {
             "total_entries": len(self.metadata),
             "total_files": len(cache_files),
+            "segmented_entries": len(list(self.cache_dir.glob("*.seg"))),
+            "cold_entries": len(list(self.cache_dir.glob(f"*{self.COLD_SUFFIX}"))),
             "total_size_mb": round(total_size / (1024 * 1024), 2),
+            "max_size_mb": round(self.max_bytes / (1024 * 1024), 2) if self.max_bytes > 0 else None,
+            "max_age_seconds": self.max_age_seconds if self.max_age_seconds > 0 else None,
+            "hit_ratio": round(self.counters["hits"] / lookups, 3) if lookups else None,
+            **self.counters,
             "cache_dir": str(self.cache_dir)
         }
@@ -1,5 +1,6 @@
 from app.services.vector_stores.supabase_vector_store import SupabaseVectorStoreService
 from app.services.vector_stores.inmemory_vector_store import InMemoryVectorStoreService
+from app.services.vector_stores.sqlite_vector_store import SqliteVectorStoreService
 from app.services.vector_stores.base_vector_store import BaseVectorStore
 from app.config.settings import Settings
 
@@ -16,6 +17,8 @@ class VectorStoreFactory:
             cache_key = f"{vector_store_type}:{settings.SUPABASE_TABLE_NAME}:{settings.SUPABASE_QUERY_NAME}:{settings.EMBEDDING_MODEL}"
         elif vector_store_type == "inmemory":
             cache_key = f"{vector_store_type}:{settings.EMBEDDING_MODEL}"
+        elif vector_store_type == "sqlite":
+            cache_key = f"{vector_store_type}:{settings.SQLITE_VECTOR_STORE_PATH}:{settings.EMBEDDING_MODEL}"
         else:
             cache_key = vector_store_type
         
@@ -26,8 +29,10 @@ class VectorStoreFactory:
             instance = VectorStoreFactory._create_supabase_store(settings)
         elif vector_store_type == "inmemory":
             instance = VectorStoreFactory._create_inmemory_store(settings)
+        elif vector_store_type == "sqlite":
+            instance = VectorStoreFactory._create_sqlite_store(settings)
         else:
-            raise ValueError(f"Unsupported vector store type: {vector_store_type}. Supported types: 'supabase', 'inmemory'")
+            raise ValueError(f"Unsupported vector store type: {vector_store_type}. Supported types: 'supabase', 'inmemory', 'sqlite'")
         
         VectorStoreFactory._instances[cache_key] = instance
         return instance
@@ -54,3 +59,17 @@ class VectorStoreFactory:
         return InMemoryVectorStoreService(
             embedding_model=settings.EMBEDDING_MODEL
         )
+    
+    @staticmethod
+    def _create_sqlite_store(settings: Settings) -> SqliteVectorStoreService:
+        return SqliteVectorStoreService(
+            db_path=settings.SQLITE_VECTOR_STORE_PATH,
+            embedding_model=settings.EMBEDDING_MODEL
+        )
+    
+    @staticmethod
+    async def aclose_all():
+        """Release pooled connections held by cached instances (called on app shutdown)"""
+        for instance in VectorStoreFactory._instances.values():
+            if hasattr(instance, 'aclose'):
+                await instance.aclose()
@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+import threading
+from typing import List, Union
+
+import numpy as np
+
+from app.services.embedders.base_embedder import BaseEmbedder
+from app.services.vector_stores import sqlite_vector_store
+from app.services.vector_stores.sqlite_vector_store import SqliteVectorStoreService
+
+
+class HashEmbedder(BaseEmbedder):
+    """Deterministic vectors so tests never call an embedding API"""
+
+    def embed(self, texts: Union[str, List[str]]) -> List[List[float]]:
+        texts = [texts] if isinstance(texts, str) else texts
+        return [
+            np.random.default_rng(int(hashlib.md5(text.encode()).hexdigest()[:8], 16)).standard_normal(16).tolist()
+            for text in texts
+        ]
+
+    @property
+    def dimension(self) -> int:
+        return 16
+
+    @property
+    def model_name(self) -> str:
+        return "hash-test"
+
+
+def make_store(tmp_path, monkeypatch) -> SqliteVectorStoreService:
+    monkeypatch.setattr(sqlite_vector_store, "get_embedding_model", lambda model: HashEmbedder())
+    return SqliteVectorStoreService(db_path=str(tmp_path / "vectors.db"), embedding_model="hash-test")
+
+
+def test_retry_after_partial_ingestion_replaces_the_partial_rows(tmp_path, monkeypatch):
+    store = make_store(tmp_path, monkeypatch)
+    url = "https://example.com/policy.pdf"
+    document_id = store._document_id_for_url(url)
+    metadata = {"document_id": document_id, "source": url}
+
+    # First attempt dies after two chunks and is never finalized
+    store.begin_document(url, document_id)
+    store.add_documents(["a", "b"], [dict(metadata) for _ in range(2)])
+    assert not store.has_cache(url)
+
+    store.begin_document(url, document_id)
+    store.add_documents(["a", "b", "c"], [dict(metadata) for _ in range(3)])
+    store.finalize_document(url, document_id)
+
+    assert store.has_cache(url)
+    assert store.get_document_count() == 3
+    results = store.similarity_search_with_score("a", k=10, filter={"document_id": document_id})
+    assert sorted(doc.page_content for doc, _ in results) == ["a", "b", "c"]
+
+
+def test_begin_document_leaves_other_documents_alone(tmp_path, monkeypatch):
+    store = make_store(tmp_path, monkeypatch)
+    first, second = "https://example.com/a.pdf", "https://example.com/b.pdf"
+    for url in (first, second):
+        document_id = store._document_id_for_url(url)
+        store.begin_document(url, document_id)
+        store.add_documents(["x", "y"], [{"document_id": document_id, "source": url} for _ in range(2)])
+        store.finalize_document(url, document_id)
+
+    store.begin_document(first, store._document_id_for_url(first))
+
+    assert not store.has_cache(first)
+    assert store.has_cache(second)
+    assert store.get_document_count() == 2
+
+
+def test_async_hooks_run_off_the_event_loop(tmp_path, monkeypatch):
+    store = make_store(tmp_path, monkeypatch)
+    url = "https://example.com/async.pdf"
+    document_id = store._document_id_for_url(url)
+    loop_thread = threading.get_ident()
+    threads = []
+    for name in ("begin_document", "finalize_document"):
+        hook = getattr(store, name)
+        monkeypatch.setattr(store, name, lambda *args, hook=hook: (threads.append(threading.get_ident()), hook(*args)))
+
+    async def ingest():
+        await store.abegin_document(url, document_id)
+        await store.aadd_documents(["a"], [{"document_id": document_id, "source": url}])
+        await store.afinalize_document(url, document_id)
+        return await store.ahas_cache(url)
+
+    assert asyncio.run(ingest())
+    assert len(threads) == 2 and loop_thread not in threads
@@ -0,0 +1,167 @@
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+
+from app.services.vector_stores.supabase_rest_client import SupabaseRestClient
+
+
+def make_client(handler, **kwargs) -> SupabaseRestClient:
+    return SupabaseRestClient("https://project.supabase.co", "service-key", transport=httpx.MockTransport(handler), **kwargs)
+
+
+def test_match_sends_limit_and_filter():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json=[{"id": "1", "content": "a", "metadata": {}, "similarity": 0.9}])
+
+    async def run():
+        client = make_client(handler)
+        rows = await client.match([0.1, 0.2], k=7, filter={"document_id": "doc"})
+        await client.aclose()
+        return rows
+
+    rows = asyncio.run(run())
+
+    assert rows[0]["id"] == "1"
+    request = requests[0]
+    assert request.method == "POST"
+    assert request.url.path == "/rest/v1/rpc/match_documents"
+    assert request.url.params["limit"] == "7"
+    assert json.loads(request.content) == {"query_embedding": [0.1, 0.2], "filter": {"document_id": "doc"}}
+    assert request.headers["apikey"] == "service-key"
+    assert request.headers["authorization"] == "Bearer service-key"
+
+
+def test_match_omits_empty_filter():
+    bodies = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(json.loads(request.content))
+        return httpx.Response(200, json=[])
+
+    async def run():
+        client = make_client(handler)
+        await client.match([0.5], k=3)
+        await client.aclose()
+
+    asyncio.run(run())
+
+    assert bodies == [{"query_embedding": [0.5]}]
+
+
+def test_upsert_chunks_rows_and_sends_prefer_header():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(201)
+
+    async def run():
+        client = make_client(handler)
+        sent = await client.upsert([{"id": str(i)} for i in range(5)], chunk_size=2, table="document_registry")
+        await client.aclose()
+        return sent
+
+    assert asyncio.run(run()) == 5
+    assert len(requests) == 3
+    assert all(request.url.path == "/rest/v1/document_registry" for request in requests)
+    assert all(request.headers["prefer"] == "resolution=merge-duplicates,return=minimal" for request in requests)
+    assert sorted(len(json.loads(request.content)) for request in requests) == [1, 2, 2]
+    assert sorted(row["id"] for request in requests for row in json.loads(request.content)) == [str(i) for i in range(5)]
+
+
+def paged_handler(rows, requests):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        offset, limit = int(request.url.params["offset"]), int(request.url.params["limit"])
+        return httpx.Response(200, json=rows[offset:offset + limit])
+    return handler
+
+
+def test_fetch_document_pages_through_rows():
+    rows = [{"id": f"{i:03}"} for i in range(5)]
+    requests = []
+
+    async def run():
+        client = make_client(paged_handler(rows, requests))
+        fetched = await client.fetch_document("doc", page_size=2)
+        await client.aclose()
+        return fetched
+
+    assert asyncio.run(run()) == rows
+    assert [request.url.params["offset"] for request in requests] == ["0", "2", "4"]
+    assert all(request.url.params["metadata->>document_id"] == "eq.doc" for request in requests)
+    assert all(request.url.params["order"] == "id" for request in requests)
+
+
+def test_select_all_stops_after_a_full_last_page():
+    rows = [{"document_id": str(i)} for i in range(4)]
+    requests = []
+
+    async def run():
+        client = make_client(paged_handler(rows, requests))
+        fetched = await client.select_all("document_registry", {"select": "*", "order": "document_id"}, page_size=2)
+        await client.aclose()
+        return fetched
+
+    assert asyncio.run(run()) == rows
+    assert [request.url.params["offset"] for request in requests] == ["0", "2", "4"]
+
+
+def test_select_count_reads_content_range():
+    prefers = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        prefers.append(request.headers.get("prefer"))
+        return httpx.Response(200, json=[{"id": "1"}], headers={"Content-Range": "0-0/3573"})
+
+    async def run():
+        client = make_client(handler)
+        result = await client.select("documents", {"select": "id", "limit": 1}, count=True)
+        await client.aclose()
+        return result
+
+    assert asyncio.run(run()) == ([{"id": "1"}], 3573)
+    assert prefers == ["count=exact"]
+
+
+def test_total_handles_missing_and_unknown_ranges():
+    assert SupabaseRestClient._total(httpx.Response(200, headers={"Content-Range": "0-24/3573"})) == 3573
+    assert SupabaseRestClient._total(httpx.Response(200, headers={"Content-Range": "*/0"})) == 0
+    assert SupabaseRestClient._total(httpx.Response(200, headers={"Content-Range": "0-24/*"})) == 0
+    assert SupabaseRestClient._total(httpx.Response(200)) == 0
+
+
+def test_aclose_closes_the_client_of_every_loop():
+    client = make_client(lambda request: httpx.Response(200, json=[]))
+
+    other_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=other_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(client.select("documents", {}), other_loop).result(timeout=5)
+        other_client = client._sessions[other_loop][0]
+
+        async def run():
+            await client.select("documents", {})
+            own_client = client._sessions[asyncio.get_running_loop()][0]
+            await client.aclose()
+            return own_client
+
+        own_client = asyncio.run(run())
+
+        deadline = time.monotonic() + 5
+        while not other_client.is_closed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert own_client.is_closed
+        assert other_client.is_closed
+        assert client._sessions == {}
+    finally:
+        other_loop.call_soon_threadsafe(other_loop.stop)
+        thread.join(timeout=5)
+        other_loop.close()